@@ -0,0 +1,632 @@
+"""
+异步日报采集模块
+基于 httpx.AsyncClient 的原生异步采集器，复用连接池并支持 HTTP/2 多路复用
+"""
+import asyncio
+import queue
+import time
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+from cassette import Cassette
+from http_cache import HttpCache
+from io_executor import run_blocking
+from markdown_writer import MarkdownWriter
+from metrics import get_metrics
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from retry_policy import CircuitBreaker, RETRYABLE_STATUS_CODES
+from report_collector import ReportCollector
+from report_record import Report
+
+try:
+    import httpx
+except ImportError:
+    httpx = None  # 未安装 httpx 时无法使用异步采集器
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport if httpx is not None else object):
+    """经过熔断器和限流器发送请求的 httpx 传输层"""
+
+    def __init__(self, transport: 'httpx.AsyncBaseTransport', rate_limiter: AdaptiveRateLimiter,
+                 circuit_breaker: CircuitBreaker):
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+
+    async def handle_async_request(self, request):
+        token = self.circuit_breaker.before_call()
+        try:
+            with get_metrics().span('ratelimit.wait'):
+                await self.rate_limiter.acquire_async()
+        except BaseException:
+            # 等待期间被取消：还没有占用并发名额
+            self.circuit_breaker.record_cancelled(token)
+            raise
+        started = time.monotonic()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            self.rate_limiter.release(None, time.monotonic() - started)
+            self.circuit_breaker.record(None)
+            get_metrics().record('http.request', time.monotonic() - started, error=True)
+            raise
+        except BaseException:
+            # 被取消（asyncio.CancelledError）不是服务器的问题：释放名额，但不计为失败
+            self.rate_limiter.cancel()
+            self.circuit_breaker.record_cancelled(token)
+            raise
+        # 收到响应头的耗时（正文的下载计入各阶段自己的耗时）
+        latency = time.monotonic() - started
+        get_metrics().record('http.request', latency, error=response.status_code >= 400)
+        self.rate_limiter.release(response.status_code, latency,
+                                  parse_retry_after(response.headers.get('Retry-After')))
+        self.circuit_breaker.record(response.status_code)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class CassetteTransport(httpx.AsyncBaseTransport if httpx is not None else object):
+    """httpx 传输层的录制回放：录制时发送请求并保存响应，回放时用录制的响应应答，不访问网络"""
+
+    def __init__(self, cassette: Cassette, transport: Optional['httpx.AsyncBaseTransport'] = None):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        if self.cassette.replaying:
+            status, headers, body = self.cassette.replay(request.method, str(request.url), request.headers)
+            return httpx.Response(status, headers=headers, content=body, request=request)
+
+        response = await self.transport.handle_async_request(request)
+        # 读取完整正文（已解压），以不带压缩相关响应头的新响应返回给客户端
+        body = await response.aread()
+        secrets = self.cassette.cookie_values(request.headers.get('Cookie'), response.headers.get_list('Set-Cookie'))
+        await run_blocking(self.cassette.record, request.method, str(request.url), response.status_code,
+                           response.headers, body, secrets)
+        headers = [(name, value) for name, value in response.headers.multi_items()
+                   if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request,
+                              extensions=response.extensions)
+
+    async def aclose(self):
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+class ChunkPipe:
+    """
+    把事件循环中收到的数据块依次交给线程池中的单个解析线程
+
+    有界：解析线程跟不上时，事件循环一侧的 put 等待空位（暂停读取响应），内存中最多保留 maxsize 块
+    """
+
+    _END = object()
+
+    def __init__(self, maxsize: int = 4):
+        """
+        初始化（需要在事件循环中创建）
+
+        Args:
+            maxsize: 最多缓存的数据块数
+        """
+        self._queue: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._slots = asyncio.Semaphore(maxsize)
+        self._loop = asyncio.get_running_loop()
+        self._finished = False
+
+    async def put(self, chunk: bytes) -> bool:
+        """
+        交给解析线程一块数据（事件循环一侧）
+
+        Returns:
+            解析线程是否仍在接收（解析线程已出错退出时返回 False，调用方应停止读取）
+        """
+        await self._slots.acquire()
+        if self._finished:
+            # 唤醒其他可能在等待的 put
+            self._slots.release()
+            return False
+        self._queue.put(chunk)
+        return True
+
+    def close(self, error: Optional[BaseException] = None):
+        """
+        数据已全部交出（事件循环一侧）
+
+        Args:
+            error: 接收中断时的异常：解析线程取到后抛出，放弃写入缓存
+        """
+        self._queue.put(self._END if error is None else error)
+
+    def finish(self):
+        """解析线程结束（线程池一侧，无论成功与否都需要调用）：唤醒等待空位的 put"""
+        self._finished = True
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    def __iter__(self):
+        """逐块取出数据（线程池一侧）"""
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            self._wake()
+            yield item
+
+
+class AsyncReportCollector(ReportCollector):
+    """
+    异步日报采集器
+
+    接口与 ReportCollector 一致，其中 check_login_status、fetch_month_reports、
+    fetch_months 和 collect 为协程，可以在 MCP 工具中直接 await。
+    使用完毕后调用 aclose() 关闭连接池，或使用 async with。
+    """
+
+    # 空闲连接的保活时间（秒）
+    KEEPALIVE_EXPIRY = 60
+
+    # 接收和解析之间最多缓存的数据块数（每块 CHUNK_SIZE 字节）
+    PIPE_CHUNKS = 4
+
+    def __init__(self, max_workers: int = ReportCollector.DEFAULT_MAX_WORKERS, http2: bool = True, **kwargs):
+        """
+        初始化异步采集器
+
+        Args:
+            max_workers: 同时进行的月份请求数（默认 4）
+            http2: 服务端支持时是否启用 HTTP/2（需要安装 h2）
+            **kwargs: 其余参数同 ReportCollector（如 use_cache、immutable_after_days）
+        """
+        self.http2 = http2 and HTTP2_AVAILABLE
+        super().__init__(max_workers=max_workers, **kwargs)
+
+    def _create_session(self) -> 'httpx.AsyncClient':
+        """
+        创建异步 HTTP 客户端
+
+        Returns:
+            配置好连接池、保活、限流和请求头的 httpx.AsyncClient
+        """
+        if httpx is None:
+            raise ImportError(
+                "AsyncReportCollector 需要 httpx，请运行：pip install 'httpx[http2]'"
+            )
+
+        pool_size = max(10, self.max_workers)
+        limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=self.KEEPALIVE_EXPIRY,
+        )
+        transport = RateLimitedTransport(
+            httpx.AsyncHTTPTransport(limits=limits, http2=self.http2),
+            self.rate_limiter,
+            self.circuit_breaker,
+        )
+        if self.cassette is not None:
+            # 录制时包在限流之外；回放时不访问网络，也不经过限流器
+            transport = CassetteTransport(self.cassette, None if self.cassette.replaying else transport)
+        # 不设置 Accept-Encoding，由 httpx 根据已安装的解码器自动协商
+        return httpx.AsyncClient(
+            headers=self.DEFAULT_HEADERS,
+            transport=transport,
+            timeout=httpx.Timeout(30.0),
+            follow_redirects=True,
+        )
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self.session.aclose()
+
+    async def __aenter__(self) -> 'AsyncReportCollector':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _cookie_jar(self):
+        """客户端的 CookieJar（http.cookiejar.CookieJar）"""
+        return self.session.cookies.jar
+
+    async def check_login_status(self, force: bool = False) -> bool:
+        """
+        检查是否已登录（优先在本地判断，见 ReportCollector.check_login_status）
+
+        Args:
+            force: 是否忽略本地判断，强制向服务器确认
+
+        Returns:
+            是否已登录
+        """
+        if not force:
+            local = self._local_login_status()
+            if local is not None:
+                get_metrics().incr('login.local_check')
+                return local
+
+        try:
+            with get_metrics().span('login.probe'):
+                valid = await self._probe_login()
+        except Exception as e:
+            print(f"检查登录状态失败: {e}")
+            return False
+        self._remember_login(valid)
+        return valid
+
+    async def _probe_login(self) -> bool:
+        """
+        向服务器确认会话是否有效（只请求响应头，不下载页面）
+
+        Returns:
+            是否已登录
+        """
+        response = await self.session.head(self.REPORT_LIST_URL, follow_redirects=False)
+        if response.status_code in (405, 501):
+            # 服务端不支持 HEAD 时退回 GET，只读取响应头
+            async with self.session.stream('GET', self.REPORT_LIST_URL, follow_redirects=False) as response:
+                pass
+        # 返回 200 说明已登录，未登录时会重定向到登录页
+        return response.status_code == 200
+
+    async def fetch_month_reports(self, month: str) -> List[Report]:
+        """
+        获取指定月份的日报列表
+
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            日报列表（获取失败时返回空列表）
+        """
+        reports = await self._fetch_month_or_none(month)
+        return reports if reports is not None else []
+
+    async def _fetch_month_or_none(self, month: str) -> Optional[List[Report]]:
+        """
+        获取指定月份的日报列表，临时错误按重试策略重试，最终失败时打印错误并返回 None
+
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            日报列表，获取失败返回 None
+        """
+        try:
+            # 包括重试在内的整个月份的耗时
+            with get_metrics().span('month.fetch'):
+                return await self._call_with_retry(self._fetch_month, month)
+        except Exception as e:
+            print(f"获取 {month} 月份日报失败: {e}")
+            return None
+
+    async def _call_with_retry(self, func, *args):
+        """
+        调用协程函数 func，遇到可重试的错误时等待后重试
+
+        Args:
+            func: 请求协程函数（出错时抛出异常）
+            *args: 参数
+
+        Returns:
+            func 的返回值
+        """
+        attempt = 1
+        while True:
+            try:
+                return await func(*args)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                print(f"  请求失败（第 {attempt} 次）: {e}，{delay:.1f} 秒后重试")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        """传输层错误（连接、超时、响应中断）以及 429 / 5xx 可以重试"""
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(exc, httpx.TransportError)
+
+    async def _fetch_month(self, month: str) -> List[Report]:
+        """
+        获取并解析指定月份的日报列表（出错时抛出异常）
+
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            日报列表
+        """
+        url = f"{self.REPORT_LIST_URL}?month={month}"
+
+        entry, fresh = await run_blocking(self._lookup_cache, url, month)
+        if fresh:
+            # 已结束的月份直接使用缓存，不访问网络
+            get_metrics().incr('month.cache_fresh')
+            return await run_blocking(self._parse_chunks, self.http_cache.iter_body(url, self.CHUNK_SIZE))
+
+        self._ensure_not_logged_out()
+        async with self.session.stream('GET', url, headers=HttpCache.conditional_headers(entry)) as response:
+            if response.status_code == 304 and entry is not None:
+                # 服务端确认内容未变化，沿用缓存正文
+                self._observe_login(response.url)
+                get_metrics().incr('month.not_modified')
+                await run_blocking(self.http_cache.touch, url, entry)
+                return await run_blocking(self._parse_chunks, self.http_cache.iter_body(url, self.CHUNK_SIZE))
+
+            response.raise_for_status()
+            # 被重定向到登录页时抛出异常，不会把登录页当作空月份缓存
+            self._observe_login(response.url)
+            get_metrics().incr('month.downloaded')
+            # 边接收边解析：事件循环只负责接收，数据块经有界队列交给线程池中的一个线程，
+            # 由它增量解析并写入缓存文件（lxml 增量解析器不能跨线程使用，整页都在同一个线程中解析）
+            pipe = ChunkPipe(self.PIPE_CHUNKS)
+            parsing = asyncio.ensure_future(
+                run_blocking(self._parse_streamed, url, response.status_code, response.headers, pipe))
+            try:
+                async for chunk in response.aiter_bytes(self.CHUNK_SIZE):
+                    if not await pipe.put(chunk):
+                        break  # 解析线程已出错，下面 await parsing 时抛出其异常
+            except BaseException as e:
+                # 接收中断或被取消：解析线程放弃写入缓存后退出
+                pipe.close(e if isinstance(e, Exception) else ConnectionAbortedError("响应接收被取消"))
+                parsing.add_done_callback(lambda f: f.cancelled() or f.exception())
+                raise
+            pipe.close()
+            return await parsing
+
+    def _parse_streamed(self, url: str, status_code: int, headers, pipe: ChunkPipe) -> List[Report]:
+        """
+        增量解析经 ChunkPipe 传来的月份正文并写入缓存（在线程池中执行）
+
+        Args:
+            url: 请求 URL
+            status_code: 响应状态码
+            headers: 响应头
+            pipe: 事件循环一侧写入数据块的队列
+
+        Returns:
+            日报列表
+        """
+        try:
+            return self._parse_chunks(pipe, self._cache_writer(url, status_code, headers))
+        finally:
+            pipe.finish()
+
+    async def iter_months(self, months: List[str],
+                          max_workers: Optional[int] = None) -> AsyncIterator[Tuple[str, Optional[List[Report]]]]:
+        """
+        并发获取多个月份的日报，并按月份顺序逐个产出结果
+
+        Args:
+            months: 月份列表，格式 YYYY-MM
+            max_workers: 同时进行的请求数（可选，默认使用初始化时的配置）
+
+        Yields:
+            (月份, 日报列表)，获取失败的月份日报列表为 None
+        """
+        workers = max(1, max_workers or self.max_workers)
+        month_iter = iter(months)
+        pending = deque()
+
+        def schedule_next():
+            month = next(month_iter, None)
+            if month is not None:
+                pending.append((month, asyncio.ensure_future(self._fetch_month_or_none(month))))
+
+        for _ in range(workers):
+            schedule_next()
+
+        try:
+            while pending:
+                month, task = pending.popleft()
+                reports = await task
+                schedule_next()
+                yield month, reports
+        finally:
+            # 提前退出时取消尚未完成的请求
+            for _, task in pending:
+                task.cancel()
+
+    async def fetch_months(self, months: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[List[Report]]]:
+        """
+        并发获取多个月份的日报
+
+        Args:
+            months: 月份列表，格式 YYYY-MM
+            max_workers: 同时进行的请求数（可选，默认使用初始化时的配置）
+
+        Returns:
+            月份 -> 日报列表 的有序字典，获取失败的月份值为 None
+        """
+        return {month: reports async for month, reports in self.iter_months(months, max_workers)}
+
+    async def fetch_report_detail(self, link: str) -> Optional[str]:
+        """
+        获取日报详情页的正文
+
+        Args:
+            link: 日报链接（列表页中的 href）
+
+        Returns:
+            正文纯文本，获取失败返回 None
+        """
+        url = self._detail_url(link)
+        try:
+            with get_metrics().span('detail.fetch'):
+                return await self._call_with_retry(self._fetch_detail, url)
+        except Exception as e:
+            print(f"获取日报详情失败 {url}: {e}")
+            return None
+
+    async def _fetch_detail(self, url: str) -> str:
+        """
+        获取并解析详情页（出错时抛出异常）
+
+        Args:
+            url: 详情页 URL
+
+        Returns:
+            正文纯文本
+        """
+        if self.http_cache is not None and await run_blocking(self.http_cache.get, url) is not None:
+            # 已缓存的详情页不再请求服务器
+            body = await run_blocking(self.http_cache.read_body, url)
+            return await run_blocking(self._parse_detail, body)
+
+        self._ensure_not_logged_out()
+        response = await self.session.get(url)
+        response.raise_for_status()
+        # 被重定向到登录页时抛出异常，避免把登录页当作正文保存
+        self._observe_login(response.url)
+        if self.http_cache is not None:
+            await run_blocking(self.http_cache.put, url, response.content, response.headers)
+        return await run_blocking(self._parse_detail, response.content)
+
+    async def enrich_reports(self, reports: List[Report], max_workers: Optional[int] = None) -> List[Report]:
+        """
+        并发获取日报详情页，将正文补充到日报记录的 content 中
+
+        Args:
+            reports: 日报列表（原地修改）
+            max_workers: 同时进行的请求数（可选，默认使用初始化时的配置）
+
+        Returns:
+            本次补充了正文的日报
+        """
+        pending = self._pending_details(reports)
+        if not pending:
+            return []
+
+        semaphore = asyncio.Semaphore(max(1, max_workers or self.max_workers))
+
+        async def fetch(link: str) -> Optional[str]:
+            async with semaphore:
+                return await self.fetch_report_detail(link)
+
+        contents = await asyncio.gather(*(fetch(report.link) for report in pending))
+        return self._apply_details(pending, contents)
+
+    async def _enrich_month(self, month: str, reports: List[Report], max_workers: Optional[int] = None) -> int:
+        """
+        补充一个月份的日报详情，并保存到本地库
+
+        Args:
+            month: 月份，格式 YYYY-MM
+            reports: 该月份的日报列表（原地修改）
+            max_workers: 同时进行的请求数
+
+        Returns:
+            本次补充的详情数
+        """
+        enriched = await self.enrich_reports(reports, max_workers)
+        if enriched and self.report_store is not None:
+            await run_blocking(self.report_store.save_contents, month, enriched)
+        return len(enriched)
+
+    async def collect(self, start_month: str, end_month: str, output_file: str = None,
+                      max_workers: Optional[int] = None, force_refresh: bool = False,
+                      include_details: bool = False) -> str:
+        """
+        采集指定月份范围的日报并保存
+
+        Args:
+            start_month: 起始月份
+            end_month: 结束月份
+            output_file: 输出文件路径（可选，默认使用自动检测的路径）
+            max_workers: 同时进行的请求数（可选，默认使用初始化时的配置）
+            force_refresh: 是否忽略本地日报库，全部重新获取（默认 False）
+            include_details: 是否并发获取日报详情页，将正文写入输出和本地库（默认 False）
+
+        Returns:
+            采集结果描述
+        """
+        output_file = self._resolve_output_file(output_file)
+
+        # 确保输出目录存在
+        output_path = Path(output_file)
+        await run_blocking(output_path.parent.mkdir, parents=True, exist_ok=True)
+
+        # 生成月份范围，只同步本地库中缺失或可能变化的月份
+        months = self.generate_month_range(start_month, end_month)
+        to_sync = await run_blocking(self._months_to_sync, months, force_refresh)
+        needs_details = include_details and await run_blocking(self._has_pending_details, months)
+
+        if to_sync or needs_details:
+            # 加载已保存的 Cookie
+            if self.cookie_manager.has_cookies():
+                await run_blocking(self.load_saved_cookies)
+
+            # 检查登录状态
+            if not await self.check_login_status():
+                return self._login_required_message()
+
+        if to_sync:
+            print(f"正在同步 {len(to_sync)} 个月份的日报（其余 {len(months) - len(to_sync)} 个月份使用本地库）...")
+        else:
+            print(f"{start_month} 到 {end_month} 共 {len(months)} 个月份均已同步，直接使用本地库")
+
+        # 并发采集需要同步的月份，按月份顺序边采集边写入 Markdown 文件
+        total_count, failed_months = await self._sync_and_write_async(months, to_sync, output_file, max_workers,
+                                                                      include_details)
+
+        return self._collect_result(months, total_count, failed_months, output_file)
+
+    async def _sync_and_write_async(self, months: List[str], to_sync: List[str], output_file: str,
+                                    max_workers: Optional[int] = None,
+                                    include_details: bool = False) -> Tuple[int, List[str]]:
+        """
+        同步月份并流式写入 Markdown（_sync_and_write 的异步版本）
+
+        Args:
+            months: 完整月份列表
+            to_sync: 需要从服务器获取的月份
+            output_file: 输出文件路径
+            max_workers: 同时进行的请求数
+            include_details: 是否获取详情页正文
+
+        Returns:
+            (写入的日报总数, 获取失败的月份)
+        """
+        to_sync_set = set(to_sync)
+        fetched_iter = self.iter_months(to_sync, max_workers)
+        failed_months = []
+        writer = await run_blocking(MarkdownWriter, output_file)
+
+        try:
+            for month in months:
+                fetched = (await anext(fetched_iter))[1] if month in to_sync_set else None
+                if month in to_sync_set and fetched is None:
+                    failed_months.append(month)
+                reports = await run_blocking(self._month_reports, month, fetched)
+                detail_count = await self._enrich_month(month, reports, max_workers) if include_details else 0
+                with get_metrics().span('markdown.write'):
+                    await run_blocking(writer.write_month, month, reports)
+                print(self._month_summary(month, reports, include_details, detail_count))
+        except BaseException:
+            # 保留 .part 部分结果
+            writer.abort()
+            raise
+        finally:
+            await fetched_iter.aclose()
+
+        await run_blocking(writer.finalize)
+        return writer.report_count, failed_months
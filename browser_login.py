@@ -2,20 +2,33 @@
 浏览器自动化登录模块
 使用 Playwright 打开浏览器，等待用户登录，然后提取 Cookie
 """
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+from browser_pool import BrowserBusyError
 from cookie_manager import CookieManager
+from io_executor import run_blocking
 from logger import logger
+from metrics import get_metrics
 import asyncio
 import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
 import platform
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, AsyncIterator, TYPE_CHECKING
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    from browser_pool import BrowserPool
 
 class BrowserLogin:
     """浏览器自动化登录"""
 
     LOGIN_URL = "https://kpi.drojian.dev/site/login"
     TARGET_URL = "https://kpi.drojian.dev/report/report-daily/my-list"
+    USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
+
+    # 无头续期时打开目标页面的超时时间（秒）
+    REFRESH_TIMEOUT = 30
 
     @staticmethod
     def _get_user_data_dir() -> str:
@@ -35,8 +48,15 @@ class BrowserLogin:
             # 开发时：使用项目目录
             return str(Path(__file__).parent / 'data' / 'browser_profile')
 
-    def __init__(self):
-        """初始化浏览器登录管理器"""
+    def __init__(self, pool: Optional['BrowserPool'] = None):
+        """
+        初始化浏览器登录管理器
+
+        Args:
+            pool: 常驻浏览器池（可选）；提供时复用其中的 Playwright 驱动和无头浏览器，
+                  否则每次操作单独启动并关闭浏览器
+        """
+        self.pool = pool
         self.cookie_manager = CookieManager()
         self.USER_DATA_DIR = self._get_user_data_dir()
         logger.info(f"初始化 BrowserLogin - 用户数据目录: {self.USER_DATA_DIR}")
@@ -98,8 +118,9 @@ class BrowserLogin:
 
         browser_args = self._get_browser_args()
 
-        async with async_playwright() as p:
+        async with self._playwright() as p:
             # 启动浏览器 - 优先使用系统 Chrome
+            launch_started = time.perf_counter()
             browser = None
             try:
                 logger.info("尝试启动系统 Chrome 浏览器...")
@@ -124,13 +145,14 @@ class BrowserLogin:
                     logger.exception("详细错误信息:")
                     print(f"❌ 启动浏览器失败: {e2}")
                     return False
+            get_metrics().record('browser.launch', time.perf_counter() - launch_started)
 
             try:
                 # 创建浏览器上下文
                 logger.info("创建浏览器上下文...")
                 context = await browser.new_context(
                     viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
+                    user_agent=self.USER_AGENT
                 )
                 logger.debug("浏览器上下文创建成功")
 
@@ -157,7 +179,8 @@ class BrowserLogin:
                 logger.info("开始等待用户登录...")
 
                 # 检测登录成功的标志
-                success = await self._wait_for_login_success(page, timeout)
+                with get_metrics().span('browser.login_wait'):
+                    success = await self._wait_for_login_success(page, timeout)
 
                 if success:
                     print("\n✓ 检测到登录成功！")
@@ -171,25 +194,16 @@ class BrowserLogin:
                     # 转换为标准格式
                     cookie_list = []
                     for cookie in cookies:
-                        cookie_list.append({
-                            'name': cookie['name'],
-                            'value': cookie['value'],
-                            'domain': cookie.get('domain', ''),
-                            'path': cookie.get('path', '/'),
-                        })
+                        cookie_list.append(CookieManager.cookie_from_playwright(cookie))
                         logger.debug(f"Cookie: {cookie['name']} (domain: {cookie.get('domain', '')})")
 
                     # 保存 Cookie
                     logger.info("保存 Cookie 到文件...")
-                    if self.cookie_manager.save_cookies(cookie_list):
+                    if await run_blocking(self.cookie_manager.save_cookies, cookie_list):
                         print("✓ Cookie 已保存到 data/cookies.json")
                         print("\n🎉 登录流程完成！现在可以使用 collect_reports 采集数据了")
                         logger.info("✓ Cookie 保存成功")
                         logger.info("登录流程完成")
-
-                        # 延迟关闭，让用户看到成功信息
-                        logger.info("等待 3 秒后关闭浏览器...")
-                        await asyncio.sleep(3)
                         return True
                     else:
                         print("❌ Cookie 保存失败")
@@ -226,40 +240,15 @@ class BrowserLogin:
         print(f"正在启动持久化浏览器...")
         print(f"用户数据将保存到: {self.USER_DATA_DIR}")
 
-        browser_args = self._get_browser_args()
-
-        async with async_playwright() as p:
-            # 使用持久化上下文启动浏览器 - 优先使用系统 Chrome
-            context = None
+        # 退出时关闭有窗口的上下文（使用浏览器池时驱动保持常驻）
+        async with AsyncExitStack() as stack:
             try:
-                logger.info("尝试启动持久化系统 Chrome...")
-                context = await p.chromium.launch_persistent_context(
-                    self.USER_DATA_DIR,
-                    channel='chrome',  # 使用系统 Chrome
-                    headless=False,
-                    args=browser_args,
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
-                )
-                logger.info("✓ 成功启动持久化系统 Chrome")
+                context = await stack.enter_async_context(self._persistent_context(headless=False))
             except Exception as e:
-                # 如果系统 Chrome 不可用，使用 Chromium
-                logger.warning(f"系统 Chrome 不可用: {e}")
-                logger.info("尝试启动持久化 Playwright Chromium...")
-                try:
-                    context = await p.chromium.launch_persistent_context(
-                        self.USER_DATA_DIR,
-                        headless=False,
-                        args=browser_args,
-                        viewport={'width': 1920, 'height': 1080},
-                        user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
-                    )
-                    logger.info("✓ 成功启动持久化 Playwright Chromium")
-                except Exception as e2:
-                    logger.error(f"启动持久化浏览器失败: {e2}")
-                    logger.exception("详细错误信息:")
-                    print(f"❌ 启动浏览器失败: {e2}")
-                    return False
+                logger.error(f"启动持久化浏览器失败: {e}")
+                logger.exception("详细错误信息:")
+                print(f"❌ 启动浏览器失败: {e}")
+                return False
 
             try:
                 logger.info("获取或创建页面...")
@@ -282,7 +271,8 @@ class BrowserLogin:
                 print("提示：登录成功后，页面会显示日报列表")
                 logger.info("开始等待用户登录...")
 
-                success = await self._wait_for_login_success(page, timeout=300)
+                with get_metrics().span('browser.login_wait'):
+                    success = await self._wait_for_login_success(page, timeout=300)
 
                 if success:
                     print("\n✓ 登录成功！")
@@ -294,25 +284,16 @@ class BrowserLogin:
 
                     cookie_list = []
                     for cookie in cookies:
-                        cookie_list.append({
-                            'name': cookie['name'],
-                            'value': cookie['value'],
-                            'domain': cookie.get('domain', ''),
-                            'path': cookie.get('path', '/'),
-                        })
+                        cookie_list.append(CookieManager.cookie_from_playwright(cookie))
                         logger.debug(f"Cookie: {cookie['name']} (domain: {cookie.get('domain', '')})")
 
                     # 保存 Cookie
                     logger.info("保存 Cookie 到文件...")
-                    self.cookie_manager.save_cookies(cookie_list)
+                    await run_blocking(self.cookie_manager.save_cookies, cookie_list)
                     print("✓ Cookie 已保存")
                     print("\n🎉 登录完成！浏览器会话已保存，下次无需重复登录")
                     logger.info("✓ Cookie 保存成功")
                     logger.info("持久化登录流程完成")
-
-                    # 等待一会儿让用户看到结果
-                    logger.info("等待 3 秒后关闭浏览器...")
-                    await asyncio.sleep(3)
                     return True
                 else:
                     print("\n❌ 登录超时")
@@ -323,21 +304,25 @@ class BrowserLogin:
                 logger.exception("持久化浏览器操作过程中发生异常:")
                 print(f"❌ 发生错误: {e}")
                 return False
-            finally:
-                # 关闭上下文
-                logger.info("关闭持久化浏览器上下文...")
-                await context.close()
-                logger.info("持久化浏览器上下文已关闭")
+
+    def _is_logged_in_url(self, url: str) -> bool:
+        """URL 是否为登录后才能访问的系统页面（在系统域名下且不是登录页）"""
+        parsed = urlparse(url)
+        return parsed.hostname == urlparse(self.TARGET_URL).hostname and \
+            not parsed.path.startswith(urlparse(self.LOGIN_URL).path)
+
+    async def _session_cookie_names(self, context: BrowserContext) -> List[str]:
+        """上下文中已存在的系统登录 Cookie 名称"""
+        cookies = await context.cookies(self.TARGET_URL)
+        return [c['name'] for c in cookies if c['name'] in CookieManager.AUTH_COOKIE_NAMES]
 
     async def _wait_for_login_success(self, page: Page, timeout: int = 300) -> bool:
         """
         等待登录成功
 
-        检测方法（满足任一即可）：
-        1. URL 包含 my-list 或 report-daily
-        2. 页面包含 #report_list 元素
-        3. 页面包含 .list-group-item 元素（日报列表项）
-        4. 页面标题包含"日报"
+        监听页面导航和响应事件，不再定时轮询：主页面导航到系统内的非登录页面，
+        且上下文中已有登录后才会设置的身份凭据 Cookie（_identity-backend）时立即返回，随后即可提取 Cookie。
+        用户关闭页面时提前结束
 
         Args:
             page: Playwright 页面对象
@@ -346,68 +331,206 @@ class BrowserLogin:
         Returns:
             是否登录成功
         """
-        import time
         start_time = time.time()
-        check_interval = 7  # 每7秒检查一次
-
-        logger.info(f"等待登录成功，超时时间: {timeout} 秒，检查间隔: {check_interval} 秒")
-        print(f"⏳ 等待登录中，每 {check_interval} 秒检查一次...")
-        print(f"提示：如果已经看到日报列表页面，说明登录成功了")
+        context = page.context
+        logged_in = asyncio.Event()
+        page_closed = asyncio.Event()
 
-        while time.time() - start_time < timeout:
+        async def check(reason: str):
+            if logged_in.is_set() or page.is_closed():
+                return
             try:
                 current_url = page.url
-                elapsed = int(time.time() - start_time)
-
-                print(f"\n[{elapsed}s] 检查中...")
-                print(f"  当前URL: {current_url}")
-                logger.debug(f"[{elapsed}s] 检查登录状态 - URL: {current_url}")
-
-                # 方法1: 检查是否已登录到系统（URL包含 kpi.drojian.dev 且不是 accounts.google.com）
-                if 'kpi.drojian.dev' in current_url and 'accounts.google.com' not in current_url:
-                    print(f"  ✓ 已登录到系统！")
-                    logger.info(f"检测到已登录系统 - URL: {current_url}")
-
-                    # 如果不在目标页面，尝试跳转（仅尝试一次）
-                    if 'my-list' not in current_url and 'report-daily' not in current_url:
-                        print(f"  → 尝试跳转到日报页面...")
-                        logger.info(f"不在目标页面，尝试跳转到: {self.TARGET_URL}")
-                        try:
-                            await page.goto(self.TARGET_URL, wait_until='domcontentloaded', timeout=10000)
-                            await asyncio.sleep(2)
-                            current_url = page.url
-                            print(f"  → 跳转后URL: {current_url}")
-                            logger.info(f"跳转成功，当前 URL: {current_url}")
-                        except Exception as e:
-                            print(f"  ⚠ 跳转失败: {str(e)[:50]}")
-                            logger.warning(f"跳转失败: {e}")
-
-                    # 只要在 kpi.drojian.dev 域名下，就认为登录成功
-                    print(f"[{elapsed}s] ✓✓✓ 登录成功（已在系统内）！✓✓✓")
-                    logger.info(f"✓ 登录成功！耗时: {elapsed} 秒")
-
-                    # 等待 Cookie 保存
-                    logger.debug("等待 2 秒确保 Cookie 完全保存...")
-                    await asyncio.sleep(2)
-                    return True
-                else:
-                    print(f"  ⏳ 等待跳转到目标页面...")
-                    print(f"  （需要URL包含: my-list 或 report-daily）")
-                    logger.debug(f"等待跳转 - 当前 URL: {current_url}")
+                if not self._is_logged_in_url(current_url):
+                    return
+                names = await self._session_cookie_names(context)
+            except Exception as e:
+                logger.debug(f"检查登录状态时出错（{reason}）: {e}")
+                return
+            # 登录页本身就会设置 PHPSESSID，只有身份凭据才能确认已登录
+            if CookieManager.IDENTITY_COOKIE_NAME not in names:
+                logger.debug(f"已进入系统页面但身份凭据 Cookie 尚未写入 - URL: {current_url}")
+                return
+
+            elapsed = time.time() - start_time
+            print(f"[{elapsed:.1f}s] ✓ 检测到登录成功: {current_url}")
+            logger.info(f"✓ 登录成功（{reason}）！耗时: {elapsed:.1f} 秒，登录 Cookie: {', '.join(names)}")
+            logged_in.set()
+
+        async def on_navigated(frame):
+            if frame == page.main_frame:
+                logger.debug(f"页面导航 - URL: {frame.url}")
+                await check('页面导航')
+
+        async def on_response(response):
+            # Set-Cookie 随系统域名的响应到达
+            if not logged_in.is_set() and self._is_logged_in_url(response.url):
+                await check('收到响应')
+
+        def on_close(_):
+            page_closed.set()
+
+        page.on('framenavigated', on_navigated)
+        context.on('response', on_response)
+        page.on('close', on_close)
+
+        logger.info(f"等待登录成功，超时时间: {timeout} 秒（监听页面导航事件）")
+        print(f"⏳ 等待登录中，登录完成后会自动检测...")
 
-                # 每7秒检查一次
-                await asyncio.sleep(check_interval)
+        try:
+            # 持久化会话可能已经登录
+            await check('当前页面')
 
-            except Exception as e:
-                print(f"  ❌ 检查出错: {e}")
-                logger.error(f"检查登录状态时出错: {e}")
-                logger.exception("详细错误信息:")
-                await asyncio.sleep(check_interval)
+            waiters = [asyncio.ensure_future(logged_in.wait()), asyncio.ensure_future(page_closed.wait())]
+            try:
+                await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+        finally:
+            page.remove_listener('framenavigated', on_navigated)
+            context.remove_listener('response', on_response)
+            page.remove_listener('close', on_close)
+
+        if logged_in.is_set():
+            return True
+        if page_closed.is_set():
+            print("\n❌ 浏览器页面已关闭，登录未完成")
+            logger.error("浏览器页面在登录完成前被关闭")
+            return False
 
         print(f"\n❌ 登录超时（{timeout}秒）")
         logger.error(f"登录超时 - 超时时间: {timeout} 秒")
         return False
 
+    @asynccontextmanager
+    async def _playwright(self) -> AsyncIterator[Playwright]:
+        """Playwright 驱动：有浏览器池时复用常驻驱动，否则临时启动"""
+        if self.pool is not None:
+            async with self.pool.playwright() as p:
+                yield p
+        else:
+            async with async_playwright() as p:
+                yield p
+
+    async def _launch_persistent_context(self, p: Playwright, headless: bool) -> BrowserContext:
+        """
+        启动持久化浏览器上下文 - 优先使用系统 Chrome，不可用时使用 Playwright Chromium
+
+        Args:
+            p: Playwright 实例
+            headless: 是否无头模式
+
+        Returns:
+            持久化浏览器上下文
+        """
+        options = dict(
+            headless=headless,
+            args=self._get_browser_args(),
+            viewport={'width': 1920, 'height': 1080},
+            user_agent=self.USER_AGENT
+        )
+        with get_metrics().span('browser.launch'):
+            try:
+                logger.info(f"尝试启动持久化系统 Chrome（无头: {headless}）...")
+                context = await p.chromium.launch_persistent_context(self.USER_DATA_DIR, channel='chrome', **options)
+                logger.info("✓ 成功启动持久化系统 Chrome")
+            except Exception as e:
+                # 如果系统 Chrome 不可用，使用 Chromium
+                logger.warning(f"系统 Chrome 不可用: {e}")
+                logger.info("尝试启动持久化 Playwright Chromium...")
+                context = await p.chromium.launch_persistent_context(self.USER_DATA_DIR, **options)
+                logger.info("✓ 成功启动持久化 Playwright Chromium")
+        return context
+
+    @asynccontextmanager
+    async def _persistent_context(self, headless: bool) -> AsyncIterator[BrowserContext]:
+        """
+        持久化浏览器上下文
+
+        有浏览器池时由池管理（无头上下文用完后保持常驻），否则用完即关闭
+        """
+        if self.pool is not None:
+            async with self.pool.persistent_context(
+                    self.USER_DATA_DIR, headless, lambda p: self._launch_persistent_context(p, headless)) as context:
+                yield context
+            return
+
+        async with async_playwright() as p:
+            context = await self._launch_persistent_context(p, headless)
+            try:
+                yield context
+            finally:
+                logger.info("关闭持久化浏览器上下文...")
+                await context.close()
+                logger.info("持久化浏览器上下文已关闭")
+
+    def has_browser_profile(self) -> bool:
+        """
+        是否存在持久化浏览器会话（之前通过 launch_persistent_browser 登录过）
+
+        Returns:
+            浏览器数据目录是否存在且非空
+        """
+        profile = Path(self.USER_DATA_DIR)
+        return profile.is_dir() and any(profile.iterdir())
+
+    async def refresh_cookies_headless(self, timeout: int = None) -> bool:
+        """
+        无头模式静默续期 Cookie
+
+        用持久化浏览器会话在后台打开日报列表页：会话仍有效时服务器直接返回页面并续期 Cookie，
+        提取后保存到 cookies.json，全程不弹出窗口。被重定向到登录页（需要重新完成 Google 登录）、
+        没有浏览器会话或浏览器会话正被其他窗口占用时返回 False
+
+        Args:
+            timeout: 打开页面的超时时间（秒），默认 REFRESH_TIMEOUT
+
+        Returns:
+            是否续期成功
+        """
+        started = time.perf_counter()
+        success = await self._refresh_cookies_headless(timeout)
+        # 续期失败（会话失效、没有浏览器会话等）计为出错
+        get_metrics().record('browser.refresh', time.perf_counter() - started, error=not success)
+        return success
+
+    async def _refresh_cookies_headless(self, timeout: int = None) -> bool:
+        """无头续期 Cookie 的实现（见 refresh_cookies_headless）"""
+        if not await run_blocking(self.has_browser_profile):
+            logger.info("没有持久化浏览器会话，跳过无头续期")
+            return False
+
+        timeout = timeout or self.REFRESH_TIMEOUT
+        logger.info(f"开始无头续期 Cookie - 用户数据目录: {self.USER_DATA_DIR}")
+        try:
+            async with self._persistent_context(headless=True) as context:
+                page = context.pages[0] if context.pages else await context.new_page()
+                await page.goto(self.TARGET_URL, wait_until='domcontentloaded', timeout=timeout * 1000)
+
+                if not self._is_logged_in_url(page.url):
+                    logger.warning(f"无头续期失败：浏览器会话已失效，被重定向到 {page.url}")
+                    return False
+                if CookieManager.IDENTITY_COOKIE_NAME not in await self._session_cookie_names(context):
+                    logger.warning("无头续期失败：未找到身份凭据 Cookie")
+                    return False
+
+                cookies = await context.cookies()
+        except BrowserBusyError as e:
+            # 用户正在登录窗口中登录，不等待
+            logger.info(f"跳过无头续期：{e}")
+            return False
+        except Exception as e:
+            logger.warning(f"无头续期失败: {e}")
+            return False
+
+        # 保存时加文件锁、fsync 并替换文件，放到线程池执行
+        cookie_list = [CookieManager.cookie_from_playwright(c) for c in cookies]
+        if not await run_blocking(self.cookie_manager.save_cookies, cookie_list):
+            return False
+        logger.info(f"✓ 无头续期成功，已保存 {len(cookies)} 个 Cookie")
+        return True
+
     async def extract_cookies_from_browser(self) -> Optional[List[Dict]]:
         """
         从持久化浏览器上下文中提取 Cookie
@@ -416,32 +539,10 @@ class BrowserLogin:
             Cookie 列表
         """
         try:
-            async with async_playwright() as p:
-                try:
-                    context = await p.chromium.launch_persistent_context(
-                        self.USER_DATA_DIR,
-                        channel='chrome',  # 使用系统 Chrome
-                        headless=True
-                    )
-                except Exception:
-                    context = await p.chromium.launch_persistent_context(
-                        self.USER_DATA_DIR,
-                        headless=True
-                    )
-
+            async with self._persistent_context(headless=True) as context:
                 cookies = await context.cookies()
-                await context.close()
-
-                cookie_list = []
-                for cookie in cookies:
-                    cookie_list.append({
-                        'name': cookie['name'],
-                        'value': cookie['value'],
-                        'domain': cookie.get('domain', ''),
-                        'path': cookie.get('path', '/'),
-                    })
 
-                return cookie_list
+            return [CookieManager.cookie_from_playwright(cookie) for cookie in cookies]
 
         except Exception as e:
             print(f"提取 Cookie 失败: {e}")
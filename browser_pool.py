@@ -0,0 +1,256 @@
+"""
+浏览器池模块
+在服务进程内保持 Playwright 驱动（以及无头的持久化浏览器上下文）常驻，
+登录和无头续期复用同一个浏览器，不必每次冷启动；空闲超时后自动关闭
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+from logger import logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Playwright
+
+
+class BrowserBusyError(RuntimeError):
+    """持久化浏览器数据目录正被有窗口的登录占用"""
+
+
+class BrowserPool:
+    """
+    常驻的 Playwright 驱动 + 持久化浏览器上下文（只能在创建它的事件循环中使用）
+
+    同一个浏览器数据目录同时只能被一个浏览器打开：有窗口的上下文独占使用、用完即关闭，
+    无头上下文可以同时被多个调用使用并保留复用；需要另一种模式时等待已打开的上下文用完后再关闭。
+    锁只在启动、切换和关闭浏览器时持有，不会在整个使用期间持有
+    """
+
+    # 空闲多久（秒）后关闭浏览器和驱动
+    IDLE_TIMEOUT = 5 * 60
+
+    def __init__(self, idle_timeout: float = None):
+        """
+        初始化浏览器池
+
+        Args:
+            idle_timeout: 空闲超时时间（秒，可选，默认 IDLE_TIMEOUT）
+        """
+        self.idle_timeout = idle_timeout or self.IDLE_TIMEOUT
+        self._manager = None
+        self._playwright: Optional['Playwright'] = None
+        self._context: Optional['BrowserContext'] = None
+        self._context_key: Optional[Tuple[str, bool]] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._evict_task: Optional[asyncio.Task] = None
+        # 正在使用驱动（包括上下文）的调用数，为 0 时才会空闲关闭
+        self._users = 0
+        # 正在使用持久化上下文的调用数，以及它们使用的 (数据目录, 是否无头)
+        self._context_users = 0
+        self._active_key: Optional[Tuple[str, bool]] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _headed_in_use(self) -> bool:
+        """有窗口的上下文正在使用（如等待用户登录）"""
+        return self._context_users > 0 and self._active_key is not None and not self._active_key[1]
+
+    def _acquire(self):
+        """登记一个使用者（调用方需持有锁）"""
+        self._users += 1
+        self._cancel_eviction()
+
+    def _release(self):
+        """注销一个使用者，没有使用者时安排空闲关闭（调用方需持有锁）"""
+        self._users -= 1
+        if self._users == 0:
+            self._schedule_eviction()
+        self._get_condition().notify_all()
+
+    async def _ensure_playwright(self) -> 'Playwright':
+        """启动 Playwright 驱动（已启动时直接复用；首次使用时才导入 Playwright）"""
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+
+            logger.info("启动常驻 Playwright 驱动...")
+            self._manager = async_playwright()
+            self._playwright = await self._manager.start()
+        return self._playwright
+
+    @asynccontextmanager
+    async def playwright(self) -> AsyncIterator['Playwright']:
+        """
+        使用常驻的 Playwright 驱动（退出时不关闭驱动，空闲超时后才关闭）
+
+        Yields:
+            Playwright 实例
+        """
+        condition = self._get_condition()
+        async with condition:
+            self._acquire()
+            try:
+                p = await self._ensure_playwright()
+            except BaseException:
+                self._release()
+                raise
+        try:
+            yield p
+        finally:
+            async with condition:
+                self._release()
+
+    @asynccontextmanager
+    async def persistent_context(
+        self,
+        user_data_dir: str,
+        headless: bool,
+        launch: Callable[['Playwright'], Awaitable['BrowserContext']],
+    ) -> AsyncIterator['BrowserContext']:
+        """
+        使用持久化浏览器上下文
+
+        无头上下文用完后保留，下次相同参数直接复用；有窗口的上下文独占使用，用完即关闭。
+        有窗口的上下文正在使用时（如等待用户登录），无头请求立即失败而不是等待
+
+        Args:
+            user_data_dir: 浏览器数据目录
+            headless: 是否无头模式
+            launch: 启动持久化上下文的函数（接收 Playwright 实例）
+
+        Yields:
+            持久化浏览器上下文
+
+        Raises:
+            BrowserBusyError: 请求无头上下文，但浏览器数据目录正被有窗口的登录占用
+        """
+        key = (user_data_dir, headless)
+
+        def ready() -> bool:
+            # 没有人在用；或者是无头请求，可以共用同一个无头上下文（或需要立即失败）
+            if self._context_users == 0:
+                return True
+            return headless and (self._active_key == key or self._headed_in_use())
+
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(ready)
+            if headless and self._headed_in_use():
+                raise BrowserBusyError("浏览器会话正被登录窗口占用")
+
+            self._acquire()
+            self._context_users += 1
+            self._active_key = key
+            try:
+                if self._context is not None and self._context_key != key:
+                    await self._close_context()
+
+                if self._context is None:
+                    p = await self._ensure_playwright()
+                    context = await launch(p)
+                    # 浏览器崩溃或窗口被用户关闭时丢弃，下次重新启动
+                    context.on('close', lambda _: self._forget_context(context))
+                    self._context = context
+                    self._context_key = key
+                    logger.info(f"已启动持久化浏览器上下文（无头: {headless}）")
+                else:
+                    logger.info("复用常驻的持久化浏览器上下文")
+                context = self._context
+            except BaseException:
+                self._release_context()
+                raise
+
+        try:
+            yield context
+        finally:
+            async with condition:
+                if not headless and self._context is context:
+                    await self._close_context()
+                self._release_context()
+
+    def _release_context(self):
+        """注销一个上下文使用者（调用方需持有锁）"""
+        self._context_users -= 1
+        if self._context_users == 0:
+            self._active_key = None
+        self._release()
+
+    def _forget_context(self, context: 'BrowserContext'):
+        """上下文已被关闭"""
+        if self._context is context:
+            self._context = self._context_key = None
+
+    async def _close_context(self):
+        """关闭已打开的持久化上下文（调用方需持有锁）"""
+        if self._context is not None:
+            context, self._context, self._context_key = self._context, None, None
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"关闭浏览器上下文失败: {e}")
+
+    async def _close_all(self):
+        """关闭上下文和驱动（调用方需持有锁）"""
+        await self._close_context()
+        if self._playwright is not None:
+            manager, self._manager, self._playwright = self._manager, None, None
+            try:
+                await manager.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"关闭 Playwright 驱动失败: {e}")
+            logger.info("常驻 Playwright 驱动已关闭")
+
+    def _cancel_eviction(self):
+        if self._evict_task is not None:
+            self._evict_task.cancel()
+            self._evict_task = None
+
+    def _schedule_eviction(self):
+        """空闲 idle_timeout 秒后关闭浏览器"""
+        self._cancel_eviction()
+        if self._playwright is not None:
+            self._evict_task = asyncio.get_running_loop().create_task(self._evict_when_idle())
+
+    async def _evict_when_idle(self):
+        await asyncio.sleep(self.idle_timeout)
+        async with self._get_condition():
+            # 等待锁期间可能又被使用过（会重新安排关闭），此时当前任务已不是最新的
+            if self._evict_task is not asyncio.current_task() or self._users:
+                return
+            self._evict_task = None
+            logger.info(f"浏览器空闲超过 {self.idle_timeout} 秒，关闭常驻浏览器")
+            await self._close_all()
+
+    async def close(self):
+        """关闭浏览器和驱动（服务退出时调用）"""
+        self._cancel_eviction()
+        async with self._get_condition():
+            await self._close_all()
+
+
+_pool: Optional[BrowserPool] = None
+_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    获取进程内共享的浏览器池（首次调用时创建，不会立即启动浏览器）
+
+    Returns:
+        浏览器池实例
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = BrowserPool()
+    return _pool
+
+
+async def close_browser_pool():
+    """关闭共享浏览器池（如已创建）"""
+    if _pool is not None:
+        await _pool.close()
@@ -67,6 +67,8 @@ a = Analysis(
         'beautifulsoup4',
         'lxml',
         'html.parser',
+        'selectolax',
+        'selectolax.lexbor',
         # 日期处理
         'dateutil',
         'dateutil.relativedelta',
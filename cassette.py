@@ -0,0 +1,408 @@
+"""
+HTTP 录制回放模块
+录制模式下把采集器收到的真实响应（去除 Cookie、CSRF 令牌和身份信息后）保存到录制目录；
+回放模式下直接用录制的响应应答请求，不访问网络。可用真实页面结构离线分析解析和输出性能、复现线上问题
+
+录制目录中每个请求（方法 + 路径 + 查询参数，与服务器地址无关）对应一个 JSON 文件，
+按顺序记录该请求收到的所有响应（例如先 503 后 200）；正文另存为同名的 .html / .bin 文件，便于直接查看。
+回放时按录制顺序返回，用完后一直返回最后一个响应
+
+启用方式：创建采集器时传入 Cassette，或设置环境变量
+    YST_CASSETTE_MODE=record|replay
+    YST_CASSETTE_DIR=<录制目录>（可选，默认 data/cassettes）
+    YST_CASSETTE_IDENTITIES=<用户名>,...（可选，录制时额外替换为占位符的身份信息；日报署名中的姓名会自动识别）
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.client import responses as HTTP_REASONS
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# 录制的响应头（其余响应头，包括 Set-Cookie，一律不保存）
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Location', 'Retry-After', 'Cache-Control')
+
+# 替换身份信息和令牌时使用的占位符
+IDENTITY_PLACEHOLDER = '用户'
+SECRET_PLACEHOLDER = 'SCRUBBED'
+
+# 录制时默认清除的内容：(正则, 替换文本)
+DEFAULT_SCRUB_PATTERNS = (
+    # CSRF 令牌（meta 标签和表单隐藏字段）
+    (r'(<meta\s+name="csrf-(?:token|param)"\s+content=")[^"]*(")', r'\g<1>' + SECRET_PLACEHOLDER + r'\g<2>'),
+    (r'(name="_csrf[^"]*"\s+value=")[^"]*(")', r'\g<1>' + SECRET_PLACEHOLDER + r'\g<2>'),
+    # 邮箱
+    (r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+', 'user@example.com'),
+    # 日报标题中的署名，如 “（#郑潇）”（只认全角括号，半角的 “(#12)” 多为正文中引用的编号）
+    (r'（#(?=[^）<]*[^\W\d_])[^）<]{1,32}）', f'（#{IDENTITY_PLACEHOLDER}）'),
+)
+
+# 日报标题中的署名：录制时记下其中的姓名（至少包含一个文字，不会把编号当作姓名），
+# 页面其他位置（如导航栏）出现的同一姓名也一并替换
+SIGNATURE_PATTERN = re.compile(r'（#((?=[^）<]*[^\W\d_])[^）<]{2,32})）')
+
+# 只对文本类型的正文做替换
+TEXT_CONTENT_TYPES = ('text/', 'application/json', 'application/xhtml+xml', 'application/xml')
+
+
+class CassetteMissError(LookupError):
+    """回放模式下请求的 URL 没有录制过（不可重试）"""
+
+
+class Cassette:
+    """录制目录（线程安全，同一个实例可供多个采集器和线程共用）"""
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    def __init__(self, directory: str, mode: str = REPLAY, identities: Iterable[str] = ()):
+        """
+        初始化录制目录
+
+        Args:
+            directory: 录制目录（录制时自动创建）
+            mode: record（录制）或 replay（回放）
+            identities: 录制时额外替换为占位符的身份信息（如用户名）；日报署名中的姓名会自动识别
+        """
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"不支持的录制模式: {mode}（可选 record / replay）")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.identities = {i for i in identities if i}
+        self._patterns = [(re.compile(pattern), replacement) for pattern, replacement in DEFAULT_SCRUB_PATTERNS]
+        self._entries: Optional[Dict[str, Dict]] = None  # 回放时加载的录制索引
+        self._bodies: Dict[str, bytes] = {}
+        self._positions: Dict[str, int] = {}
+        self._recorded: set = set()  # 本次录制过的请求：第一次录制时覆盖目录中旧的录制
+        self._lock = threading.Lock()
+        if mode == self.REPLAY and not self.directory.is_dir():
+            raise FileNotFoundError(f"录制目录不存在: {self.directory}")
+
+    @classmethod
+    def from_env(cls) -> Optional['Cassette']:
+        """
+        根据环境变量创建录制目录
+
+        Returns:
+            设置了 YST_CASSETTE_MODE 时返回 Cassette，否则返回 None
+        """
+        mode = os.environ.get('YST_CASSETTE_MODE', '').strip().lower()
+        if not mode:
+            return None
+        directory = os.environ.get('YST_CASSETTE_DIR') or str(default_cassette_dir())
+        identities = [i.strip() for i in os.environ.get('YST_CASSETTE_IDENTITIES', '').split(',')]
+        return cls(directory, mode, identities)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == self.RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == self.REPLAY
+
+    @staticmethod
+    def request_key(method: str, url: str) -> str:
+        """
+        请求的录制键：方法 + 路径 + 排序后的查询参数（不含协议和服务器地址）
+
+        Args:
+            method: 请求方法
+            url: 请求 URL
+
+        Returns:
+            如 "GET /report/report-daily/my-list?month=2025-07"
+        """
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return f"{method.upper()} {parts.path or '/'}" + (f"?{query}" if query else '')
+
+    def _entry_name(self, key: str) -> str:
+        """录制键对应的文件名（可读的路径片段 + 短哈希）"""
+        slug = re.sub(r'[^0-9A-Za-z=.-]+', '_', key).strip('_')[-80:]
+        return f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+    # ---------- 录制 ----------
+
+    def scrub_text(self, text: str, secrets: Iterable[str] = ()) -> str:
+        """
+        去除文本中的令牌和身份信息
+
+        Args:
+            text: 原始文本
+            secrets: 需要替换的 Cookie 值等敏感字符串
+
+        Returns:
+            处理后的文本
+        """
+        text = self._scrub_secrets(text, secrets)
+        found = {name.strip() for name in SIGNATURE_PATTERN.findall(text)} - {IDENTITY_PLACEHOLDER, ''}
+        with self._lock:
+            self.identities.update(found)
+            identities = sorted(self.identities, key=len, reverse=True)
+        for identity in identities:
+            text = text.replace(identity, IDENTITY_PLACEHOLDER)
+        for pattern, replacement in self._patterns:
+            text = pattern.sub(replacement, text)
+        return text
+
+    @staticmethod
+    def _scrub_secrets(text: str, secrets: Iterable[str]) -> str:
+        """只替换 Cookie 值等敏感字符串（不做身份信息替换）"""
+        for secret in sorted({s for s in secrets if len(s) >= 6}, key=len, reverse=True):
+            text = text.replace(secret, SECRET_PLACEHOLDER)
+        return text
+
+    def _scrub_body(self, body: bytes, content_type: str, secrets: List[str]) -> bytes:
+        """文本类型的正文按 UTF-8 处理后去除敏感信息，其他类型原样保存"""
+        if not body or not content_type.lower().startswith(TEXT_CONTENT_TYPES):
+            return body
+        text = body.decode('utf-8', errors='surrogateescape')
+        return self.scrub_text(text, secrets).encode('utf-8', errors='surrogateescape')
+
+    @staticmethod
+    def cookie_values(cookie_header: Optional[str], set_cookies: Iterable[str] = ()) -> List[str]:
+        """
+        提取请求 Cookie 头和响应 Set-Cookie 中的值（录制时从正文中清除）
+
+        Args:
+            cookie_header: 请求的 Cookie 头
+            set_cookies: 响应的 Set-Cookie 头列表
+
+        Returns:
+            Cookie 值列表
+        """
+        values = [item.split('=', 1)[1].strip() for item in (cookie_header or '').split(';') if '=' in item]
+        values.extend(item.split(';', 1)[0].split('=', 1)[1].strip() for item in set_cookies if '=' in item)
+        return values
+
+    def record(self, method: str, url: str, status: int, headers, body: bytes, secrets: Iterable[str] = ()):
+        """
+        保存一次响应（追加到该请求的响应列表末尾）
+
+        Args:
+            method: 请求方法
+            url: 请求 URL
+            status: 响应状态码
+            headers: 响应头（Set-Cookie 等不在 KEPT_HEADERS 中的响应头不会保存）
+            body: 已解压的响应正文
+            secrets: 需要从正文中清除的 Cookie 值等（见 cookie_values）
+        """
+        secrets = list(secrets)
+        header_map = CaseInsensitiveDict(headers)
+        kept = {}
+        for name in KEPT_HEADERS:
+            value = header_map.get(name)
+            if value is not None:
+                if name == 'Location':
+                    # 只保留路径，回放时与服务器地址无关；跳转后的请求要与录制键一致，不做身份信息替换
+                    parts = urlsplit(value)
+                    path = parts.path + (f"?{parts.query}" if parts.query else '')
+                    kept[name] = self._scrub_secrets(path, secrets)
+                else:
+                    kept[name] = self.scrub_text(value, secrets)
+
+        # 回放时按原始请求查找，录制键不做任何替换
+        key = self.request_key(method, url)
+        content_type = kept.get('Content-Type', '')
+        body = self._scrub_body(body, content_type, secrets)
+        name = self._entry_name(key)
+        entry_path = self.directory / f"{name}.json"
+
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            entry = {'request': key, 'responses': []}
+            if entry_path.exists():
+                entry = json.loads(entry_path.read_text(encoding='utf-8'))
+                if key not in self._recorded:
+                    # 重新录制：丢弃上次录制的响应
+                    for old in entry['responses']:
+                        if old.get('body'):
+                            (self.directory / old['body']).unlink(missing_ok=True)
+                    entry['responses'] = []
+            self._recorded.add(key)
+            index = len(entry['responses'])
+            body_file = None
+            if body:
+                suffix = '.html' if 'html' in content_type else '.bin'
+                body_file = f"{name}.{index}{suffix}"
+                _atomic_write(self.directory / body_file, body)
+            entry['responses'].append({
+                'status': status,
+                'headers': kept,
+                'body': body_file,
+                'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            })
+            _atomic_write(entry_path, json.dumps(entry, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    # ---------- 回放 ----------
+
+    def _load_entries(self) -> Dict[str, Dict]:
+        """读取录制索引（首次回放时读取一次）"""
+        if self._entries is None:
+            entries = {}
+            for path in self.directory.glob('*.json'):
+                try:
+                    entry = json.loads(path.read_text(encoding='utf-8'))
+                    entries[entry['request']] = entry
+                except (OSError, ValueError, KeyError):
+                    continue
+            self._entries = entries
+        return self._entries
+
+    def recorded_requests(self) -> List[str]:
+        """已录制的请求（录制键列表）"""
+        if self.recording:
+            self._entries = None  # 录制中的目录随时变化，重新读取
+        with self._lock:
+            return sorted(self._load_entries())
+
+    def _body(self, body_file: Optional[str]) -> bytes:
+        if not body_file:
+            return b''
+        body = self._bodies.get(body_file)
+        if body is None:
+            body = self._bodies[body_file] = (self.directory / body_file).read_bytes()
+        return body
+
+    def replay(self, method: str, url: str, request_headers=None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        返回录制的响应
+
+        HEAD 请求没有录制时使用同一 URL 的 GET 响应（不含正文）；请求带 If-None-Match
+        且与录制的 ETag 相同时返回 304
+
+        Args:
+            method: 请求方法
+            url: 请求 URL
+            request_headers: 请求头（可选）
+
+        Returns:
+            (状态码, 响应头, 正文)
+
+        Raises:
+            CassetteMissError: 该请求没有录制过
+        """
+        key = self.request_key(method, url)
+        with self._lock:
+            entries = self._load_entries()
+            head_fallback = False
+            if key not in entries and method.upper() == 'HEAD':
+                key = self.request_key('GET', url)
+                head_fallback = True
+            entry = entries.get(key)
+            if entry is None or not entry['responses']:
+                raise CassetteMissError(f"录制目录 {self.directory} 中没有该请求: {key}")
+
+            responses = entry['responses']
+            position = self._positions.get(key, 0)
+            if not head_fallback:
+                # 按录制顺序返回，用完后停在最后一个
+                self._positions[key] = min(position + 1, len(responses) - 1)
+            response = responses[min(position, len(responses) - 1)]
+            body = b'' if head_fallback or method.upper() == 'HEAD' else self._body(response['body'])
+
+        headers = dict(response['headers'])
+        etag = headers.get('ETag')
+        if_none_match = (request_headers or {}).get('If-None-Match')
+        if etag and if_none_match == etag and response['status'] == 200:
+            return 304, {'ETag': etag}, b''
+        return response['status'], headers, body
+
+    def rewind(self):
+        """从头开始回放（下次请求重新返回每个 URL 的第一个响应）"""
+        with self._lock:
+            self._positions.clear()
+
+    # ---------- 接入采集器 ----------
+
+    def wrap_adapter(self, adapter: BaseAdapter) -> BaseAdapter:
+        """
+        包装 requests 的连接池适配器
+
+        Args:
+            adapter: 实际发送请求的适配器
+
+        Returns:
+            录制模式下先发送再保存响应的适配器；回放模式下不访问网络的适配器
+        """
+        if self.replaying:
+            return ReplayAdapter(self)
+        return RecordingAdapter(adapter, self)
+
+
+class RecordingAdapter(BaseAdapter):
+    """发送请求后把响应保存到录制目录（采集器照常收到真实响应）"""
+
+    def __init__(self, adapter: BaseAdapter, cassette: Cassette):
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        # 读取完整正文（已解压）；之后 iter_content 从已读取的内容中分块返回
+        body = response.content
+        secrets = self.cassette.cookie_values(request.headers.get('Cookie'))
+        secrets.extend(cookie.value for cookie in response.cookies)
+        self.cassette.record(request.method, request.url, response.status_code, response.headers, body, secrets)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """用录制的响应应答请求，不访问网络"""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        status, headers, body = self.cassette.replay(request.method, request.url, request.headers)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTP_REASONS.get(status, '')
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        pass
+
+
+def default_cassette_dir() -> Path:
+    """
+    默认录制目录
+
+    打包后使用 ~/.yst_mcp/cassettes，开发时使用 ./data/cassettes
+
+    Returns:
+        目录路径
+    """
+    if getattr(sys, 'frozen', False):
+        return Path.home() / '.yst_mcp' / 'cassettes'
+    return Path(__file__).parent / 'data' / 'cassettes'
+
+
+def _atomic_write(path: Path, data: bytes):
+    """先写临时文件再替换，不会留下写了一半的文件"""
+    temp = path.with_name(path.name + '.tmp')
+    temp.write_bytes(data)
+    os.replace(temp, path)
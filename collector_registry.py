@@ -0,0 +1,116 @@
+"""
+采集器注册表模块
+在 MCP 工具调用之间复用同一个采集器：保留已建立的连接池和已加载的 Cookie，
+只有 Cookie 文件变化时才重新加载 Cookie，清除 Cookie 后才重新创建采集器
+
+安装了 httpx 时使用原生异步采集器（AsyncReportCollector），工具中直接 await 网络请求；
+否则使用基于 requests 的 ReportCollector
+"""
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from cookie_manager import CookieManager
+
+if TYPE_CHECKING:
+    # requests / BeautifulSoup 等依赖较重，首次获取采集器时才导入，不拖慢服务启动
+    from report_collector import ReportCollector
+
+# 标记采集器尚未加载过 Cookie（与“Cookie 文件不存在”的 None 区分）
+_NOT_LOADED = object()
+
+_cookie_manager: Optional[CookieManager] = None
+_collectors: Dict[bool, 'ReportCollector'] = {}
+_cookie_versions: Dict[bool, Optional[Tuple[int, int]]] = {}
+_lock = threading.Lock()
+
+
+def get_cookie_manager() -> CookieManager:
+    """
+    获取进程内共享的 Cookie 管理器
+
+    Returns:
+        Cookie 管理器实例
+    """
+    global _cookie_manager
+    if _cookie_manager is None:
+        with _lock:
+            if _cookie_manager is None:
+                _cookie_manager = CookieManager()
+    return _cookie_manager
+
+
+def get_collector(use_cache: bool = True) -> 'ReportCollector':
+    """
+    获取进程内共享的采集器（会读取 Cookie 文件，在事件循环中请通过 run_blocking 调用）
+
+    首次调用时创建并加载已保存的 Cookie；之后只在 Cookie 文件变化时
+    （例如 browser_login 保存了新 Cookie）重新加载，已建立的连接继续复用
+
+    Args:
+        use_cache: 是否使用磁盘页面缓存（两种配置各共享一个采集器）
+
+    Returns:
+        采集器实例（AsyncReportCollector 或 ReportCollector，见 is_async_collector）
+    """
+    cookie_manager = get_cookie_manager()
+    with _lock:
+        collector = _collectors.get(use_cache)
+        if collector is None:
+            from async_collector import AsyncReportCollector, httpx
+            from report_collector import ReportCollector
+
+            collector_class = AsyncReportCollector if httpx is not None else ReportCollector
+            collector = collector_class(use_cache=use_cache, cookie_manager=cookie_manager)
+            _collectors[use_cache] = collector
+            _cookie_versions[use_cache] = _NOT_LOADED
+
+        version = cookie_manager.file_version()
+        if version != _cookie_versions[use_cache]:
+            collector.reload_saved_cookies()
+            _cookie_versions[use_cache] = version
+    return collector
+
+
+def is_async_collector(collector: 'ReportCollector') -> bool:
+    """
+    采集器的 check_login_status 等方法是否为协程（异步采集器直接 await，同步采集器放到线程池执行）
+
+    Args:
+        collector: get_collector 返回的采集器
+
+    Returns:
+        是否为 AsyncReportCollector
+    """
+    return hasattr(collector, 'aclose')
+
+
+def _take_all() -> List['ReportCollector']:
+    """取出并丢弃所有共享采集器"""
+    with _lock:
+        collectors = list(_collectors.values())
+        _collectors.clear()
+        _cookie_versions.clear()
+    return collectors
+
+
+def invalidate():
+    """
+    丢弃所有共享采集器并关闭其连接（服务退出、事件循环已停止时调用）
+
+    下次调用 get_collector 时重新创建；异步采集器的连接池需要在事件循环中关闭，
+    这里只丢弃，事件循环运行期间请使用 invalidate_async
+    """
+    for collector in _take_all():
+        if not is_async_collector(collector):
+            collector.session.close()
+
+
+async def invalidate_async():
+    """丢弃所有共享采集器并关闭其连接（清除 Cookie 或服务退出时在事件循环中调用）"""
+    from io_executor import run_blocking
+
+    for collector in _take_all():
+        if is_async_collector(collector):
+            await collector.aclose()
+        else:
+            await run_blocking(collector.session.close)
@@ -1,15 +1,60 @@
 """
 Cookie 持久化管理模块
+多个服务进程可以共用同一个 Cookie 文件：写入时加文件锁并原子替换，读取时按修改时间缓存
 """
+import copy
 import json
 import os
 import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.cookiejar import Cookie
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+    import msvcrt
+
+
+@dataclass(frozen=True)
+class CookieStatus:
+    """根据本地保存的 Cookie 过期时间判断的登录状态"""
+
+    MISSING = 'missing'    # 没有登录凭据
+    UNKNOWN = 'unknown'    # 缺少过期时间，需要访问服务器确认
+    VALID = 'valid'
+    EXPIRING = 'expiring'  # 仍然有效，但即将过期
+    EXPIRED = 'expired'
+
+    state: str
+    expires_at: Optional[float] = None  # 登录凭据的过期时间戳（未知为 None）
+
+    @property
+    def is_valid(self) -> bool:
+        """本地数据是否足以判断会话有效"""
+        return self.state in (self.VALID, self.EXPIRING)
+
 
 class CookieManager:
     """管理浏览器 Cookie 的保存和加载"""
 
+    LOCK_SUFFIX = '.lock'
+
+    # 登录成功后才会设置的身份凭据（“记住我”，带过期时间）；登录页本身就会设置 PHPSESSID
+    IDENTITY_COOKIE_NAME = '_identity-backend'
+
+    # 决定登录状态的 Cookie：身份凭据和会话 Cookie（PHPSESSID）
+    AUTH_COOKIE_NAMES = (IDENTITY_COOKIE_NAME, 'PHPSESSID')
+
+    # 登录凭据剩余有效期少于该值（秒）时提示即将过期
+    EXPIRY_WARNING = 24 * 3600
+
     @staticmethod
     def _get_base_dir() -> Path:
         """
@@ -40,18 +85,51 @@ class CookieManager:
             self.cookie_file = str(base_dir / 'cookies.json')
         else:
             self.cookie_file = cookie_file
+        self.lock_file = self.cookie_file + self.LOCK_SUFFIX
+
+        # 内存缓存：文件版本不变时不重新解析
+        self._cache: Optional[List[Dict]] = None
+        self._cache_version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
         self._ensure_data_dir()
 
     def _ensure_data_dir(self):
         """确保 data 目录存在"""
         data_dir = os.path.dirname(self.cookie_file)
         if data_dir and not os.path.exists(data_dir):
-            os.makedirs(data_dir)
+            os.makedirs(data_dir, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """
+        跨进程的建议性文件锁（锁定单独的 .lock 文件）
+
+        Args:
+            exclusive: 是否排他锁（写入和删除）；读取使用共享锁（Windows 下均为排他锁）
+        """
+        with open(self.lock_file, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
 
     def save_cookies(self, cookies: List[Dict]) -> bool:
         """
         保存 Cookie 到文件
 
+        先写入同目录下的临时文件再原子替换，其他进程不会读到写了一半的文件
+
         Args:
             cookies: Cookie 列表
 
@@ -59,8 +137,21 @@ class CookieManager:
             是否保存成功
         """
         try:
-            with open(self.cookie_file, 'w', encoding='utf-8') as f:
-                json.dump(cookies, f, indent=2, ensure_ascii=False)
+            data = json.dumps(cookies, indent=2, ensure_ascii=False).encode('utf-8')
+            with self._lock, self._file_lock(exclusive=True):
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cookie_file) or '.', prefix='.cookies-')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.cookie_file)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                self._cache = copy.deepcopy(cookies)
+                self._cache_version = self.file_version()
             return True
         except Exception as e:
             print(f"保存 Cookie 失败: {e}")
@@ -70,19 +161,138 @@ class CookieManager:
         """
         从文件加载 Cookie
 
+        文件的修改时间和大小未变化时直接返回内存中的缓存
+
         Returns:
             Cookie 列表，如果文件不存在或加载失败返回 None
         """
-        if not os.path.exists(self.cookie_file):
-            return None
+        with self._lock:
+            version = self.file_version()
+            if version is None:
+                self._cache = self._cache_version = None
+                return None
+            if version == self._cache_version:
+                return copy.deepcopy(self._cache)
 
+            try:
+                with self._file_lock(exclusive=False):
+                    # 加锁后重新获取版本，保证缓存的版本与读到的内容一致
+                    version = self.file_version()
+                    with open(self.cookie_file, 'r', encoding='utf-8') as f:
+                        cookies = json.load(f)
+            except Exception as e:
+                print(f"加载 Cookie 失败: {e}")
+                return None
+
+            self._cache = cookies
+            self._cache_version = version
+            return copy.deepcopy(cookies)
+
+    def file_version(self) -> Optional[Tuple[int, int]]:
+        """
+        获取 Cookie 文件的版本，用于判断文件是否被其他调用修改
+
+        Returns:
+            (修改时间纳秒, 文件大小)，文件不存在返回 None
+        """
         try:
-            with open(self.cookie_file, 'r', encoding='utf-8') as f:
-                cookies = json.load(f)
-            return cookies
-        except Exception as e:
-            print(f"加载 Cookie 失败: {e}")
+            stat = os.stat(self.cookie_file)
+        except OSError:
             return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def cookie_status(self) -> CookieStatus:
+        """
+        根据已保存的 Cookie 判断登录状态（不访问网络）
+
+        Returns:
+            登录状态
+        """
+        return self.evaluate_cookies(self.load_cookies() or [])
+
+    @classmethod
+    def evaluate_cookies(cls, cookies: List[Dict], now: Optional[float] = None) -> CookieStatus:
+        """
+        根据 Cookie 的过期时间判断登录状态
+
+        没有 Cookie 时视为未登录；带过期时间的登录凭据仍然有效时视为已登录；
+        全部过期且没有会话 Cookie 时视为已过期；只有会话 Cookie、没有登录凭据
+        或缺少过期时间（旧版本保存的文件）时无法在本地判断
+
+        Args:
+            cookies: Cookie 列表（save_cookies 保存的格式）
+            now: 当前时间戳（可选，默认 time.time()）
+
+        Returns:
+            登录状态
+        """
+        now = time.time() if now is None else now
+        if not cookies:
+            return CookieStatus(CookieStatus.MISSING)
+
+        auth_cookies = [c for c in cookies if c.get('name') in cls.AUTH_COOKIE_NAMES]
+        if not auth_cookies or any('expires' not in c for c in auth_cookies):
+            return CookieStatus(CookieStatus.UNKNOWN)
+
+        expiries = [c['expires'] for c in auth_cookies if c['expires'] is not None]
+        if not expiries:
+            return CookieStatus(CookieStatus.UNKNOWN)
+
+        expires_at = max(expiries)
+        if expires_at <= now:
+            # 浏览器会话结束后会话 Cookie 可能仍在服务端有效，交给服务器判断
+            has_session_cookie = len(expiries) < len(auth_cookies)
+            return CookieStatus(CookieStatus.UNKNOWN if has_session_cookie else CookieStatus.EXPIRED, expires_at)
+        if expires_at - now < cls.EXPIRY_WARNING:
+            return CookieStatus(CookieStatus.EXPIRING, expires_at)
+        return CookieStatus(CookieStatus.VALID, expires_at)
+
+    @staticmethod
+    def cookie_from_playwright(cookie: Dict) -> Dict:
+        """
+        将 Playwright 的 Cookie 转换为保存格式（保留过期时间和安全属性）
+
+        Args:
+            cookie: context.cookies() 返回的 Cookie
+
+        Returns:
+            保存格式的 Cookie
+        """
+        expires = cookie.get('expires')
+        saved = {
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'domain': cookie.get('domain', ''),
+            'path': cookie.get('path', '/'),
+            # Playwright 用 -1 表示会话 Cookie
+            'expires': expires if expires is not None and expires >= 0 else None,
+            'httpOnly': bool(cookie.get('httpOnly', False)),
+            'secure': bool(cookie.get('secure', False)),
+        }
+        if cookie.get('sameSite'):
+            saved['sameSite'] = cookie['sameSite']
+        return saved
+
+    @staticmethod
+    def cookie_from_jar(cookie: Cookie) -> Dict:
+        """
+        将 cookiejar 中的 Cookie 转换为保存格式
+
+        Args:
+            cookie: http.cookiejar.Cookie
+
+        Returns:
+            保存格式的 Cookie
+        """
+        return {
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'expires': cookie.expires,
+            'httpOnly': cookie.has_nonstandard_attr('HttpOnly') or cookie.has_nonstandard_attr('httponly'),
+            'secure': bool(cookie.secure),
+        }
 
     def has_cookies(self) -> bool:
         """
@@ -100,11 +310,12 @@ class CookieManager:
         Returns:
             是否清除成功
         """
-        if os.path.exists(self.cookie_file):
-            try:
-                os.remove(self.cookie_file)
-                return True
-            except Exception as e:
-                print(f"清除 Cookie 失败: {e}")
-                return False
-        return True
+        try:
+            with self._lock, self._file_lock(exclusive=True):
+                if os.path.exists(self.cookie_file):
+                    os.remove(self.cookie_file)
+                self._cache = self._cache_version = None
+            return True
+        except Exception as e:
+            print(f"清除 Cookie 失败: {e}")
+            return False
@@ -0,0 +1,222 @@
+"""
+HTTP 响应缓存模块
+将月份列表页面缓存到磁盘，支持 ETag / Last-Modified 条件请求
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+class HttpCache:
+    """基于文件的 HTTP 响应缓存（每个 URL 一个元数据文件和一个正文文件）"""
+
+    @staticmethod
+    def _get_cache_dir() -> Path:
+        """
+        获取缓存目录
+
+        打包后使用用户主目录 ~/.yst_mcp/data/http_cache/
+        开发时使用项目目录 ./data/http_cache/
+
+        Returns:
+            缓存目录路径
+        """
+        if getattr(sys, 'frozen', False):
+            # 打包后：使用用户主目录
+            return Path.home() / '.yst_mcp' / 'data' / 'http_cache'
+        else:
+            # 开发时：使用项目目录
+            return Path(__file__).parent / 'data' / 'http_cache'
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录（可选，默认使用自动检测的路径）
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else self._get_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str):
+        """返回 URL 对应的元数据文件和正文文件路径"""
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes):
+        """先写临时文件再重命名，避免并发读取到半个文件"""
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        读取缓存元数据
+
+        Args:
+            url: 请求 URL
+
+        Returns:
+            缓存条目 {'url', 'etag', 'last_modified', 'fetched_at'}，不存在返回 None
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if body_path.exists() else None
+
+    def read_body(self, url: str) -> bytes:
+        """
+        读取缓存的完整正文
+
+        Args:
+            url: 请求 URL
+
+        Returns:
+            响应正文
+        """
+        _, body_path = self._paths(url)
+        with open(body_path, 'rb') as f:
+            return f.read()
+
+    def iter_body(self, url: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        分块读取缓存的正文，供增量解析使用
+
+        Args:
+            url: 请求 URL
+            chunk_size: 每块字节数
+
+        Yields:
+            正文数据块
+        """
+        _, body_path = self._paths(url)
+        with open(body_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def body_writer(self, url: str, headers: Dict[str, str]) -> '_BodyWriter':
+        """
+        创建流式写入器：边接收响应边写入临时文件，commit() 时才生效
+
+        Args:
+            url: 请求 URL
+            headers: 响应头
+
+        Returns:
+            正文写入器
+        """
+        return _BodyWriter(self, url, headers)
+
+    def put(self, url: str, body: bytes, headers: Dict[str, str]):
+        """
+        写入缓存
+
+        Args:
+            url: 请求 URL
+            body: 响应正文（已解压）
+            headers: 响应头
+        """
+        writer = self.body_writer(url, headers)
+        writer.write(body)
+        writer.commit()
+
+    def touch(self, url: str, entry: Dict):
+        """
+        服务端返回 304 后刷新条目的获取时间
+
+        Args:
+            url: 请求 URL
+            entry: get() 返回的缓存条目
+        """
+        meta_path, _ = self._paths(url)
+        meta = dict(entry)
+        meta['fetched_at'] = time.time()
+        self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """
+        根据缓存条目生成条件请求头
+
+        Args:
+            entry: 缓存条目（可为 None）
+
+        Returns:
+            If-None-Match / If-Modified-Since 请求头
+        """
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def clear(self) -> bool:
+        """
+        清空缓存
+
+        Returns:
+            是否清除成功
+        """
+        try:
+            if self.cache_dir.exists():
+                shutil.rmtree(self.cache_dir)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            return True
+        except Exception as e:
+            print(f"清除缓存失败: {e}")
+            return False
+
+
+class _BodyWriter:
+    """HttpCache 的流式正文写入器"""
+
+    def __init__(self, cache: HttpCache, url: str, headers: Dict[str, str]):
+        self.cache = cache
+        self.url = url
+        self.meta = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+        fd, self.tmp_path = tempfile.mkstemp(dir=str(cache.cache_dir), prefix='.tmp-')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes):
+        """写入一块正文"""
+        self._file.write(chunk)
+
+    def commit(self):
+        """正文接收完整，替换缓存条目（先正文后元数据，元数据存在即表示条目完整）"""
+        meta_path, body_path = self.cache._paths(self.url)
+        self._file.close()
+        os.replace(self.tmp_path, body_path)
+        self.meta['fetched_at'] = time.time()
+        self.cache._atomic_write(meta_path, json.dumps(self.meta, ensure_ascii=False).encode('utf-8'))
+
+    def discard(self):
+        """放弃写入（请求或解析中途失败），保留原有缓存条目"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
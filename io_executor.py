@@ -0,0 +1,60 @@
+"""
+阻塞任务执行器模块
+将同步的网络请求、HTML 解析和文件读写放到线程池中执行，避免阻塞 MCP 事件循环
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# 线程池大小：需要覆盖同时进行的多个工具调用
+MAX_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    获取进程内共享的线程池（首次调用时创建）
+
+    Returns:
+        线程池实例
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='yst-io')
+    return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在共享线程池中执行阻塞函数，并在事件循环中等待结果
+
+    Args:
+        func: 同步函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown(wait: bool = True):
+    """
+    关闭共享线程池（服务退出时调用）
+
+    Args:
+        wait: 是否等待正在执行的任务完成
+    """
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
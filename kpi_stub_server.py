@@ -0,0 +1,380 @@
+"""
+本地模拟 KPI 服务器
+在本机端口上模拟 kpi.drojian.dev 的登录页、日报列表页（my-list）和详情页，
+生成指定大小的合成月份页面，并可注入延迟和错误响应；供基准测试和离线测试使用，不访问网络
+
+用法：
+    with StubKpiServer(reports_per_month=50, latency=0.02) as stub:
+        collector = ReportCollector(use_cache=False, use_store=False)
+        stub.configure(collector)       # 把采集器指向本地服务器
+        stub.install_cookies(collector)  # 直接装入有效的会话 Cookie（或请求 /site/login 登录）
+        collector.fetch_month_reports('2025-07')
+"""
+import gzip
+import hashlib
+import random
+import secrets
+import threading
+import time
+from calendar import monthrange
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+LIST_PATH = '/report/report-daily/my-list'
+DETAIL_PATH = '/report/report-daily/view'
+LOGIN_PATH = '/site/login'
+
+# 模拟真实页面的导航和页脚（列表之外的 li 不应被解析为日报）
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="UTF-8"><title>我的日报</title>
+<meta name="csrf-param" content="_csrf-backend">
+<meta name="csrf-token" content="{csrf_token}">
+<link rel="stylesheet" href="/css/site.css"></head>
+<body><nav class="navbar"><ul class="nav"><li><a href="/">首页</a></li><li><a href="{list_path}">我的日报</a></li>
+<li class="user">{user_name}（{user_email}）</li></ul></nav>
+<div class="container"><h1>我的日报 {month}</h1>
+<ul id="report_list" class="list-group">
+{items}
+</ul>
+<div class="pagination"><li class="disabled">上一页</li><li class="disabled">下一页</li></div></div>
+<footer><p>KPI 系统</p></footer></body></html>
+"""
+
+ITEM_TEMPLATE = (
+    '<li class="list-group-item"><a href="{detail_path}?id={report_id}">{date}{kind}:{time}weather（#{user_name}）</a>'
+    '<div class="report-summary">{summary}</div></li>'
+)
+
+DETAIL_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="UTF-8"><title>日报详情</title></head>
+<body><nav class="navbar"><a href="/">首页</a></nav>
+<div class="box-body"><table class="table detail-view">
+<tr><th>编号</th><td>{report_id}</td></tr>
+<tr><th>内容</th><td>{paragraphs}</td></tr>
+</table></div></body></html>
+"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><body><form action="/site/login" method="post">
+<input name="username"><input name="password" type="password"><button type="submit">登录</button>
+</form></body></html>
+"""
+
+# 合成正文使用的词汇（包含中文，和真实日报一样是多字节字符）
+WORDS = ('冷备份数据', '继续处理', '线上服务', '开发', '接口联调', '修复问题', '代码评审', '性能优化',
+         '需求评估', '发布上线', '监控告警', '文档整理', 'weather', 'API', 'v2')
+
+
+class StubKpiServer:
+    """
+    本地模拟的 KPI 服务器（后台线程运行，支持并发请求和 HTTP/1.1 长连接）
+
+    列表页支持 ETag / If-None-Match（返回 304）和 HEAD；未登录时重定向到登录页；
+    客户端接受 gzip 时压缩响应。页面内容由月份和随机种子决定，同样的参数每次生成相同的页面
+    """
+
+    SESSION_COOKIE = 'PHPSESSID'
+    IDENTITY_COOKIE = '_identity-backend'
+
+    # 页面中出现的用户身份（录制测试检查这些信息不会被保存）
+    USER_NAME = '测试用户'
+    USER_EMAIL = 'test.user@kpi.example'
+
+    # 同一 URL 最多连续注入的错误数（低于采集器默认的最多尝试次数 3，注入错误的采集总能成功）
+    MAX_CONSECUTIVE_ERRORS = 2
+
+    def __init__(self, reports_per_month: int = 30, summary_size: int = 200, detail_size: int = 1000,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 retry_after: Optional[float] = None, require_login: bool = True, supports_head: bool = True,
+                 compress: bool = True, seed: int = 0):
+        """
+        初始化模拟服务器（调用 start() 或使用 with 语句后才开始监听）
+
+        Args:
+            reports_per_month: 每个月份页面的日报条数
+            summary_size: 列表页每条日报摘要的字符数（控制页面大小）
+            detail_size: 详情页正文的字符数
+            latency: 每个请求的固定延迟（秒）
+            jitter: 额外的随机延迟上限（秒）
+            error_rate: 列表页和详情页请求返回错误状态码的概率（0~1）；是否出错由 (seed, URL, 第几次请求) 决定，
+                与请求的并发顺序无关，同一 URL 最多连续出错 MAX_CONSECUTIVE_ERRORS 次
+            error_status: 注入的错误状态码（默认 503）
+            retry_after: 错误响应携带的 Retry-After（秒，可选）
+            require_login: 是否要求有效的会话 Cookie（否则重定向到登录页）
+            supports_head: 是否支持 HEAD 请求（不支持时返回 405）
+            compress: 客户端接受时是否 gzip 压缩响应
+            seed: 随机种子（页面内容、延迟抖动和错误注入）
+        """
+        self.reports_per_month = reports_per_month
+        self.summary_size = summary_size
+        self.detail_size = detail_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.require_login = require_login
+        self.supports_head = supports_head
+        self.compress = compress
+        self.seed = seed
+
+        self.session_id = secrets.token_hex(16)
+        self.csrf_token = secrets.token_urlsafe(24)
+        self.stats: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._attempts: Dict[str, int] = {}  # 每个 URL 收到的请求数（错误注入用）
+        self._failures: Dict[str, int] = {}  # 每个 URL 当前连续注入的错误数
+        self._pages: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """服务器根地址，如 http://127.0.0.1:54321"""
+        if self._server is None:
+            raise RuntimeError("模拟服务器尚未启动")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    def start(self) -> 'StubKpiServer':
+        """在随机空闲端口上启动服务器"""
+        if self._server is None:
+            self._server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+            self._server.daemon_threads = True
+            self._thread = threading.Thread(target=self._server.serve_forever, name='kpi-stub', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = self._thread = None
+
+    def __enter__(self) -> 'StubKpiServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def configure(self, collector):
+        """
+        将采集器的请求地址指向本服务器（只修改该实例，不影响其他采集器）
+
+        Args:
+            collector: ReportCollector 或 AsyncReportCollector 实例
+        """
+        collector.BASE_URL = self.url
+        collector.LOGIN_URL = self.url + LOGIN_PATH
+        collector.REPORT_LIST_URL = self.url + LIST_PATH
+
+    def session_cookies(self) -> Dict[str, str]:
+        """当前有效的会话 Cookie"""
+        return {self.SESSION_COOKIE: self.session_id, self.IDENTITY_COOKIE: f"stub-{self.seed}"}
+
+    def install_cookies(self, collector):
+        """
+        把有效的会话 Cookie 装入采集器的会话（相当于已经登录）
+
+        Args:
+            collector: ReportCollector 或 AsyncReportCollector 实例
+        """
+        for name, value in self.session_cookies().items():
+            collector.session.cookies.set(name, value, domain=self.host, path='/')
+        collector._login_valid = None
+
+    def expire_sessions(self):
+        """使所有已发放的会话失效（模拟登录过期）"""
+        self.session_id = secrets.token_hex(16)
+
+    def reset_stats(self):
+        """清空请求计数"""
+        with self._lock:
+            self.stats.clear()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _delay_and_fail(self, path: str, inject: bool = True) -> bool:
+        """
+        按配置等待，并决定本次请求是否返回注入的错误
+
+        Args:
+            path: 请求路径（含查询参数）
+            inject: 是否可以注入错误（HEAD 请求只注入延迟）
+
+        Returns:
+            是否返回注入的错误
+        """
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = False
+            if inject and self.error_rate > 0:
+                attempt = self._attempts.get(path, 0)
+                self._attempts[path] = attempt + 1
+                # 每次请求单独取随机数：结果只取决于 URL 和第几次请求，不受其他线程的请求影响
+                draw = random.Random(f"{self.seed}:{path}:{attempt}").random()
+                failures = self._failures.get(path, 0)
+                fail = draw < self.error_rate and failures < self.MAX_CONSECUTIVE_ERRORS
+                self._failures[path] = failures + 1 if fail else 0
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+    def month_page(self, month: str) -> bytes:
+        """
+        生成月份列表页（同一月份只生成一次）
+
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            UTF-8 编码的页面
+        """
+        page = self._pages.get(month)
+        if page is None:
+            year, mon = (int(part) for part in month.split('-'))
+            days = monthrange(year, mon)[1]
+            rng = random.Random(f"{self.seed}:{month}")
+            items = []
+            for index in range(self.reports_per_month):
+                day = days - index % days
+                items.append(ITEM_TEMPLATE.format(
+                    detail_path=DETAIL_PATH,
+                    report_id=f"{year}{mon:02d}{index:04d}",
+                    date=f"{month}-{day:02d}",
+                    kind='早报' if index % 2 == 0 else '晚报',
+                    time=f"{rng.randint(8, 20):02d}:{rng.randint(0, 59):02d}",
+                    summary=_filler(rng, self.summary_size),
+                    user_name=self.USER_NAME,
+                ))
+            page = PAGE_TEMPLATE.format(list_path=LIST_PATH, month=month, items="\n".join(items),
+                                        csrf_token=self.csrf_token, user_name=self.USER_NAME,
+                                        user_email=self.USER_EMAIL).encode('utf-8')
+            self._pages[month] = page
+        return page
+
+    def detail_page(self, report_id: str) -> bytes:
+        """生成详情页"""
+        rng = random.Random(f"{self.seed}:{report_id}")
+        paragraphs = "".join(f"<p>{i}. {_filler(rng, 80)}</p>" for i in range(1, max(1, self.detail_size // 80) + 1))
+        return DETAIL_TEMPLATE.format(report_id=report_id, paragraphs=paragraphs).encode('utf-8')
+
+
+def _filler(rng: random.Random, size: int) -> str:
+    """生成约 size 个字符的合成文本"""
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return '，'.join(parts)[:size]
+
+
+def _make_handler(stub: StubKpiServer):
+    """创建绑定到指定模拟服务器的请求处理类"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # 响应头和正文分两次写出，关闭 Nagle 算法避免与延迟 ACK 叠加产生约 40ms 的额外延迟
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass  # 不输出访问日志
+
+        def _logged_in(self) -> bool:
+            if not stub.require_login:
+                return True
+            cookies = dict(
+                item.strip().split('=', 1) for item in self.headers.get('Cookie', '').split(';') if '=' in item
+            )
+            return cookies.get(stub.SESSION_COOKIE) == stub.session_id
+
+        def _send(self, status: int, body: bytes = b'', headers: Dict[str, str] = None, head_only: bool = False):
+            headers = dict(headers or {})
+            if body and stub.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body = gzip.compress(body, compresslevel=5)
+                headers['Content-Encoding'] = 'gzip'
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body and not head_only:
+                self.wfile.write(body)
+
+        def _redirect(self, location: str, headers: Dict[str, str] = None, head_only: bool = False):
+            self._send(302, headers={'Location': location, **(headers or {})}, head_only=head_only)
+
+        def _route(self, head_only: bool = False):
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+
+            if parts.path == LOGIN_PATH:
+                stub._count('login_page')
+                self._send(200, LOGIN_PAGE.encode('utf-8'), {'Content-Type': 'text/html; charset=UTF-8'}, head_only)
+                return
+            if parts.path not in (LIST_PATH, DETAIL_PATH):
+                self._send(404, head_only=head_only)
+                return
+            if not self._logged_in():
+                stub._count('redirect')
+                self._redirect(LOGIN_PATH, head_only=head_only)
+                return
+            # 登录探测（HEAD）只注入延迟，不注入错误
+            if stub._delay_and_fail(self.path, inject=not head_only):
+                stub._count('error')
+                headers = {'Retry-After': f"{stub.retry_after:g}"} if stub.retry_after is not None else None
+                self._send(stub.error_status, headers=headers, head_only=head_only)
+                return
+
+            if parts.path == DETAIL_PATH:
+                stub._count('detail')
+                body = stub.detail_page(query.get('id', [''])[0])
+                self._send(200, body, {'Content-Type': 'text/html; charset=UTF-8'}, head_only)
+                return
+
+            month = query.get('month', [time.strftime('%Y-%m')])[0]
+            body = stub.month_page(month)
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                stub._count('not_modified')
+                self._send(304, headers={'ETag': etag}, head_only=head_only)
+                return
+            stub._count('head' if head_only else 'list')
+            self._send(200, body, {'Content-Type': 'text/html; charset=UTF-8', 'ETag': etag}, head_only)
+
+        def do_GET(self):
+            self._route()
+
+        def do_HEAD(self):
+            if not stub.supports_head:
+                self._send(405, head_only=True)
+                return
+            self._route(head_only=True)
+
+        def do_POST(self):
+            # 模拟登录：任意用户名密码均可，发放会话 Cookie 后重定向到日报列表
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            if urlsplit(self.path).path != LOGIN_PATH:
+                self._send(404)
+                return
+            stub._count('login')
+            self.send_response(302)
+            for name, value in stub.session_cookies().items():
+                self.send_header('Set-Cookie', f"{name}={value}; Path=/; HttpOnly")
+            self.send_header('Location', LIST_PATH)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    return Handler
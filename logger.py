@@ -1,18 +1,115 @@
 """
 详细日志模块
 用于记录浏览器自动化的详细调试信息，特别针对 Windows 系统调试
+
+日志经内存队列交给后台线程写入（QueueHandler + QueueListener），调用方不等待磁盘 I/O；
+日志文件按大小和时间轮转并压缩，启动时按保留天数和文件数清理旧日志
 """
+import atexit
+import copy
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import sys
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
 import platform
 
 
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按大小和时间轮转的日志文件处理器
+
+    文件超过 max_bytes 或距离上次轮转超过 interval 秒时轮转，旧文件压缩为 .1.gz、.2.gz ...，
+    最多保留 backup_count 个
+    """
+
+    def __init__(self, filename, max_bytes: int, backup_count: int, interval: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        """压缩轮转出的日志文件（在日志后台线程中执行）"""
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record) -> bool:
+        if time.time() >= self.rollover_at and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，便于日志采集工具直接解析"""
+
+    def format(self, record) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'file': record.filename,
+            'line': record.lineno,
+            'func': record.funcName,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    把日志记录放入队列，由后台线程格式化输出
+
+    只在调用线程中合并消息参数和异常堆栈（二者依赖调用时的状态），保留原始记录的其他字段，
+    文件和控制台各自按自己的格式输出
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
 class DetailedLogger:
     """详细日志记录器"""
 
+    # 单个日志文件的大小上限（字节），超过后轮转
+    MAX_BYTES = 5 * 1024 * 1024
+
+    # 距离上次轮转超过该时间（秒）时轮转
+    ROTATE_INTERVAL = 24 * 3600
+
+    # 每个日志文件最多保留的轮转压缩文件数
+    BACKUP_COUNT = 5
+
+    # 日志目录中最多保留的文件数和天数（启动时清理）
+    MAX_LOG_FILES = 50
+    RETENTION_DAYS = 14
+
+    # 文件日志格式：text（默认）或 json（每行一个 JSON 对象），通过环境变量 YST_LOG_FORMAT 设置
+    LOG_FORMAT = os.environ.get('YST_LOG_FORMAT', 'text').lower()
+
     _instance: Optional['DetailedLogger'] = None
 
     def __new__(cls):
@@ -26,7 +123,23 @@ class DetailedLogger:
 
         self._initialized = True
         self.logger = None
-        self._setup_logger()
+        self._listener = None
+        self._setup_lock = threading.Lock()
+
+    def _get_logger(self) -> logging.Logger:
+        """
+        获取底层 logger，第一次写日志时才创建日志文件
+
+        导入本模块不产生任何文件操作，服务启动不会因此变慢
+
+        Returns:
+            logging.Logger 实例
+        """
+        if self.logger is None:
+            with self._setup_lock:
+                if self.logger is None:
+                    self._setup_logger()
+        return self.logger
 
     def _get_log_dir(self) -> Path:
         """
@@ -47,86 +160,125 @@ class DetailedLogger:
         return log_dir
 
     def _setup_logger(self):
-        """设置日志记录器"""
-        # 创建 logger
-        self.logger = logging.getLogger('yst_mcp')
-        self.logger.setLevel(logging.DEBUG)
+        """
+        设置日志记录器
+
+        调用方只把日志记录放入内存队列（QueueHandler），由后台线程（QueueListener）写入文件和控制台，
+        工具协程不会因为磁盘 I/O 阻塞
+        """
+        # 创建 logger（配置完成后才赋值给 self.logger，其他线程不会拿到未配置的 logger）
+        logger = logging.getLogger('yst_mcp')
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
 
         # 清除已有的 handlers
-        self.logger.handlers.clear()
+        logger.handlers.clear()
 
         # 日志目录
         log_dir = self._get_log_dir()
+        self._remove_old_logs(log_dir)
 
-        # 日志文件名：包含日期和平台信息
-        log_filename = f"browser_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{platform.system().lower()}.log"
+        # 日志文件名：包含日期和平台信息（每个进程单独一个文件，多个服务进程不会同时轮转同一个文件）
+        suffix = 'jsonl' if self.LOG_FORMAT == 'json' else 'log'
+        log_filename = f"browser_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{platform.system().lower()}.{suffix}"
         log_file = log_dir / log_filename
 
-        # 文件处理器 - 详细日志
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        # 文件处理器 - 详细日志，按大小和时间轮转并压缩
+        file_handler = SizeAndTimeRotatingFileHandler(
+            log_file, max_bytes=self.MAX_BYTES, backup_count=self.BACKUP_COUNT, interval=self.ROTATE_INTERVAL
+        )
         file_handler.setLevel(logging.DEBUG)
 
         # 控制台处理器 - 只显示 INFO 及以上
+        # 输出到 stderr：stdout 是 MCP stdio 协议的通道
         # Windows 兼容：确保使用 UTF-8 编码
         import io
-        if platform.system() == 'Windows' and hasattr(sys.stdout, 'buffer'):
-            console_stream = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace', line_buffering=True)
+        if platform.system() == 'Windows' and hasattr(sys.stderr, 'buffer'):
+            console_stream = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace', line_buffering=True)
         else:
-            console_stream = sys.stdout
+            console_stream = sys.stderr
         console_handler = logging.StreamHandler(console_stream)
         console_handler.setLevel(logging.INFO)
 
         # 格式化器
-        detailed_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(funcName)s() - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        if self.LOG_FORMAT == 'json':
+            file_formatter = JsonFormatter()
+        else:
+            file_formatter = logging.Formatter(
+                '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(funcName)s() - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            )
 
         simple_formatter = logging.Formatter(
             '%(message)s'
         )
 
-        file_handler.setFormatter(detailed_formatter)
+        file_handler.setFormatter(file_formatter)
         console_handler.setFormatter(simple_formatter)
 
-        # 添加处理器
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # 日志记录经队列交给后台线程处理
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(DeferredQueueHandler(log_queue))
+        self._listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        self._listener.start()
+        # 退出时写完队列中剩余的日志
+        atexit.register(self._listener.stop)
 
         # 记录系统信息
-        self.logger.info("=" * 80)
-        self.logger.info("YST MCP Browser Login - 详细调试日志")
-        self.logger.info("=" * 80)
-        self.logger.info(f"日志文件: {log_file}")
-        self.logger.info(f"平台: {platform.system()} {platform.release()}")
-        self.logger.info(f"Python 版本: {platform.python_version()}")
-        self.logger.info(f"工作目录: {Path.cwd()}")
-        self.logger.info("=" * 80)
+        logger.info("=" * 80)
+        logger.info("YST MCP Browser Login - 详细调试日志")
+        logger.info("=" * 80)
+        logger.info(f"日志文件: {log_file}")
+        logger.info(f"平台: {platform.system()} {platform.release()}")
+        logger.info(f"Python 版本: {platform.python_version()}")
+        logger.info(f"工作目录: {Path.cwd()}")
+        logger.info("=" * 80)
+        self.logger = logger
+
+    def _remove_old_logs(self, log_dir: Path):
+        """
+        清理旧日志：删除超过 RETENTION_DAYS 天的日志，并且最多保留 MAX_LOG_FILES 个文件（含轮转压缩的文件）
+
+        Args:
+            log_dir: 日志目录
+        """
+        files = []
+        for path in log_dir.glob('browser_debug_*'):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        files.sort(reverse=True)
+
+        expire_before = time.time() - self.RETENTION_DAYS * 86400
+        for index, (mtime, path) in enumerate(files):
+            if index >= self.MAX_LOG_FILES or mtime < expire_before:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
 
     def debug(self, msg: str, *args, **kwargs):
         """调试级别日志"""
-        if self.logger:
-            self.logger.debug(msg, *args, **kwargs)
+        self._get_logger().debug(msg, *args, stacklevel=2, **kwargs)
 
     def info(self, msg: str, *args, **kwargs):
         """信息级别日志"""
-        if self.logger:
-            self.logger.info(msg, *args, **kwargs)
+        self._get_logger().info(msg, *args, stacklevel=2, **kwargs)
 
     def warning(self, msg: str, *args, **kwargs):
         """警告级别日志"""
-        if self.logger:
-            self.logger.warning(msg, *args, **kwargs)
+        self._get_logger().warning(msg, *args, stacklevel=2, **kwargs)
 
     def error(self, msg: str, *args, **kwargs):
         """错误级别日志"""
-        if self.logger:
-            self.logger.error(msg, *args, **kwargs)
+        self._get_logger().error(msg, *args, stacklevel=2, **kwargs)
 
     def exception(self, msg: str, *args, **kwargs):
         """异常级别日志（包含堆栈跟踪）"""
-        if self.logger:
-            self.logger.exception(msg, *args, **kwargs)
+        self._get_logger().exception(msg, *args, stacklevel=2, **kwargs)
 
     def log_browser_config(self, config: dict):
         """记录浏览器配置"""
@@ -0,0 +1,151 @@
+"""
+登录续期模块
+Cookie 失效或即将过期时，先用持久化浏览器会话在后台无头续期，失败才需要弹出浏览器窗口登录；
+后台任务定期检查 Cookie 的过期时间，提前续期，采集过程不会因为登录过期而中断
+"""
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from browser_pool import get_browser_pool
+from collector_registry import get_cookie_manager
+from cookie_manager import CookieStatus
+from io_executor import run_blocking
+from logger import logger
+
+if TYPE_CHECKING:
+    # 导入 browser_login 会加载 Playwright，第一次续期时才导入
+    from browser_login import BrowserLogin
+
+
+class LoginRefresher:
+    """无头续期 Cookie，并在后台提前续期（同一时间只进行一次续期）"""
+
+    # 后台检查 Cookie 过期时间的间隔（秒）
+    CHECK_INTERVAL = 30 * 60
+
+    # 续期失败后，距离上次尝试不足该时间（秒）时不再尝试（包括工具调用触发的续期）
+    RETRY_INTERVAL = 10 * 60
+
+    def __init__(self, check_interval: float = None):
+        """
+        初始化续期器
+
+        Args:
+            check_interval: 后台检查间隔（秒，可选，默认 CHECK_INTERVAL）
+        """
+        self.check_interval = check_interval or self.CHECK_INTERVAL
+        self.cookie_manager = get_cookie_manager()
+        self._browser_login: Optional['BrowserLogin'] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._last_attempt = 0.0
+        self._last_success: Optional[bool] = None
+        # 上次尝试续期时登录凭据的过期时间：续期后过期时间未变时不再重复尝试
+        self._attempted_expiry: Optional[float] = None
+
+    def _get_browser_login(self) -> 'BrowserLogin':
+        if self._browser_login is None:
+            from browser_login import BrowserLogin
+
+            # 复用常驻浏览器池：无头浏览器在两次续期之间保持打开，直到空闲超时
+            self._browser_login = BrowserLogin(pool=get_browser_pool())
+        return self._browser_login
+
+    async def refresh(self) -> bool:
+        """
+        立即无头续期 Cookie（已有续期在进行时等待其结果）
+
+        没有已保存的 Cookie，或上次续期失败后不足 RETRY_INTERVAL 时直接返回 False，不启动浏览器
+
+        Returns:
+            是否续期成功（成功后 cookies.json 已更新，get_collector 会自动加载新 Cookie）
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        started = time.monotonic()
+        async with self._refresh_lock:
+            if self._last_attempt > started:
+                # 等待期间其他调用刚完成续期，直接复用结果
+                return bool(self._last_success)
+            if self._in_cooldown():
+                logger.info("上次无头续期失败不久，跳过续期")
+                return False
+
+            # cookie_status 需要加文件锁并读取文件，放到线程池执行
+            status = await run_blocking(self.cookie_manager.cookie_status)
+            if status.state == CookieStatus.MISSING:
+                logger.info("没有已保存的 Cookie，跳过无头续期")
+                return False
+
+            logger.info("登录已失效或即将过期，开始无头续期 Cookie")
+            self._attempted_expiry = status.expires_at
+            self._last_success = await self._get_browser_login().refresh_cookies_headless()
+            self._last_attempt = time.monotonic()
+
+            if self._last_success:
+                logger.info("✓ Cookie 已自动续期")
+            else:
+                logger.warning("无头续期失败，需要在浏览器窗口中重新登录")
+            return self._last_success
+
+    def _in_cooldown(self) -> bool:
+        """上次续期失败，且距离上次尝试不足 RETRY_INTERVAL"""
+        return self._last_success is False and time.monotonic() - self._last_attempt < self.RETRY_INTERVAL
+
+    def _needs_refresh(self, status: CookieStatus) -> bool:
+        """后台检查：Cookie 已过期或即将过期，且没有刚刚失败过"""
+        if status.state not in (CookieStatus.EXPIRING, CookieStatus.EXPIRED):
+            return False
+        if self._in_cooldown():
+            return False
+        # 续期成功但服务器没有延长有效期时，同一个过期时间只尝试一次
+        return status.state == CookieStatus.EXPIRED or status.expires_at != self._attempted_expiry
+
+    async def _run(self):
+        """后台任务：定期检查 Cookie 过期时间，提前续期"""
+        while True:
+            try:
+                status = await run_blocking(self.cookie_manager.cookie_status)
+                if self._needs_refresh(status):
+                    logger.info(f"后台检查：Cookie 状态为 {status.state}，开始无头续期")
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"后台续期 Cookie 出错: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def ensure_started(self):
+        """启动后台续期任务（需要在事件循环中调用；已启动时不重复启动）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"后台 Cookie 续期任务已启动，检查间隔: {self.check_interval} 秒")
+
+    def stop(self):
+        """停止后台续期任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+_refresher: Optional[LoginRefresher] = None
+_lock = threading.Lock()
+
+
+def get_login_refresher() -> LoginRefresher:
+    """
+    获取进程内共享的续期器（首次调用时创建）
+
+    Returns:
+        续期器实例
+    """
+    global _refresher
+    if _refresher is None:
+        with _lock:
+            if _refresher is None:
+                _refresher = LoginRefresher()
+    return _refresher
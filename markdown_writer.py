@@ -0,0 +1,83 @@
+"""
+Markdown 输出模块
+按月份流式写入日报，完成后原子替换目标文件
+"""
+import os
+from datetime import datetime
+from typing import List
+
+from report_record import Report
+
+
+class MarkdownWriter:
+    """
+    流式 Markdown 写入器
+
+    内容先写入 <output_file>.part，每写完一个月份就刷新到磁盘；
+    finalize() 时重命名为目标文件。中途出错时保留 .part 文件作为部分结果。
+    """
+
+    PART_SUFFIX = '.part'
+
+    def __init__(self, output_file: str):
+        """
+        打开临时文件并写入标题
+
+        Args:
+            output_file: 最终输出文件路径
+        """
+        self.output_file = output_file
+        self.part_file = output_file + self.PART_SUFFIX
+        self.month_count = 0
+        self.report_count = 0
+        self._file = open(self.part_file, 'w', encoding='utf-8')
+        self._file.write("# YST 日报整理\n\n")
+        self._file.write(f"生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+    def write_month(self, month: str, reports: List[Report]):
+        """
+        写入一个月份的日报并刷新到磁盘
+
+        Args:
+            month: 月份，格式 YYYY-MM
+            reports: 日报列表
+        """
+        f = self._file
+        f.write(f"## {month} 月份日报 ({len(reports)} 条)\n\n")
+
+        if not reports:
+            f.write("*暂无数据*\n\n")
+        else:
+            for i, report in enumerate(reports, 1):
+                f.write(f"### {i}. {report.text}\n\n")
+                if report.link:
+                    f.write(f"链接：{report.link}\n\n")
+                if report.content:
+                    # 正文每行单独成段，避免 Markdown 把多行合并
+                    f.write("\n\n".join(report.content.splitlines()) + "\n\n")
+                f.write("---\n\n")
+
+        f.flush()
+        self.month_count += 1
+        self.report_count += len(reports)
+
+    def finalize(self):
+        """写入完成，将临时文件原子替换为目标文件"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.part_file, self.output_file)
+
+    def abort(self):
+        """中止写入，关闭文件并保留 .part 部分结果"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> 'MarkdownWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.abort()
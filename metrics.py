@@ -0,0 +1,227 @@
+"""
+耗时统计模块
+在采集和登录的各个阶段（登录检查、HTTP 请求、解析、写入 Markdown 等）记录耗时，
+按阶段汇总为进程内的计数器和延迟直方图，供 get_metrics 工具查看或导出到文件
+
+开销很小（每次记录只有一次计时和一次加锁），始终开启
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# 直方图的桶上界（毫秒），最后一个桶收纳更慢的记录
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# 设置后在进程退出时把统计结果写入该文件
+DUMP_ENV = 'YST_METRICS_FILE'
+
+
+class Histogram:
+    """固定分桶的延迟直方图（不保留每次记录，内存占用固定）"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, seconds: float, error: bool = False):
+        ms = seconds * 1000
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        if error:
+            self.errors += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        按分桶估算百分位数（桶内线性插值）
+
+        Args:
+            q: 百分位（0~1）
+
+        Returns:
+            估算的延迟（毫秒），没有记录时返回 None
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS_MS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self) -> Dict:
+        def ms(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': round(self.total * 1000, 1),
+            'avg_ms': ms(self.total * 1000 / self.count) if self.count else None,
+            'min_ms': ms(self.min),
+            'p50_ms': ms(self.percentile(0.5)),
+            'p95_ms': ms(self.percentile(0.95)),
+            'max_ms': ms(self.max),
+            'buckets': {
+                (f"<={bound}ms" if index < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}ms"): count
+                for index, (bound, count) in enumerate(zip(BUCKETS_MS + (None,), self.counts))
+                if count
+            },
+        }
+
+
+class Metrics:
+    """按阶段名称汇总的耗时直方图和计数器（线程安全，同步代码和协程中都可以使用）"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, error: bool = False):
+        """
+        记录一次耗时
+
+        Args:
+            name: 阶段名称（如 http.request、parse.list）
+            seconds: 耗时（秒）
+            error: 该次执行是否出错
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(seconds, error)
+
+    def incr(self, name: str, value: int = 1):
+        """
+        增加计数器
+
+        Args:
+            name: 计数器名称（如 month.cache_hit）
+            value: 增加的数量
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        记录代码块的耗时（代码块抛出异常时同时计为出错）
+
+        协程中可以包住 await：记录的是包括等待在内的实际经过时间
+
+        Args:
+            name: 阶段名称
+        """
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, error)
+
+    def snapshot(self) -> Dict:
+        """
+        返回当前统计结果
+
+        Returns:
+            {'started_at', 'uptime_s', 'spans': {名称: 直方图统计}, 'counters': {名称: 计数}}
+        """
+        with self._lock:
+            return {
+                'started_at': self._started_at,
+                'uptime_s': round(time.time() - self._started_at, 1),
+                'spans': {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())},
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+    def reset(self):
+        """清空统计结果"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._started_at = time.time()
+
+    def dump(self, path: Optional[str] = None) -> Path:
+        """
+        将统计结果写入 JSON 文件（先写临时文件再替换，不会留下写了一半的文件）
+
+        Args:
+            path: 文件路径（可选，默认写入输出目录下的 metrics.json）
+
+        Returns:
+            写入的文件路径
+        """
+        target = Path(path) if path else default_dump_path()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(target.name + '.tmp')
+        temp.write_text(json.dumps(self.snapshot(), ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(temp, target)
+        return target
+
+
+def default_dump_path() -> Path:
+    """
+    默认的统计结果文件路径
+
+    打包后使用 ~/.yst_mcp/output/metrics.json，开发时使用 ./data/metrics.json
+
+    Returns:
+        文件路径
+    """
+    if getattr(sys, 'frozen', False):
+        return Path.home() / '.yst_mcp' / 'output' / 'metrics.json'
+    return Path(__file__).parent / 'data' / 'metrics.json'
+
+
+def _dump_at_exit():
+    """进程退出时写入 YST_METRICS_FILE 指定的文件"""
+    path = os.environ.get(DUMP_ENV)
+    if path and _metrics is not None:
+        try:
+            _metrics.dump(path)
+        except OSError as e:
+            print(f"写入耗时统计失败: {e}", file=sys.stderr)
+
+
+_metrics: Optional[Metrics] = None
+_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """
+    获取进程内共享的耗时统计（首次调用时创建）
+
+    Returns:
+        统计实例
+    """
+    global _metrics
+    if _metrics is None:
+        with _lock:
+            if _metrics is None:
+                _metrics = Metrics()
+                atexit.register(_dump_at_exit)
+    return _metrics
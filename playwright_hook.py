@@ -1,68 +1,205 @@
 """
 Playwright 浏览器自动安装 Hook
 用于 PyInstaller 打包后首次运行时自动下载浏览器
+
+导入时只设置浏览器目录（PLAYWRIGHT_BROWSERS_PATH），不检查也不下载；
+下载由服务启动后调用 start_background_install() 在后台线程中进行，MCP 握手不受影响。
+安装成功后写入版本标记文件，之后启动只读取标记即可确认，不再扫描浏览器目录；
+Playwright 版本升级后标记失效，自动重新安装。下载中断时不写标记，下次启动重新执行
+（playwright install 会跳过已完整安装的浏览器）
 """
 import os
+import re
 import sys
 import subprocess
+import threading
+import time
 from pathlib import Path
+from typing import Dict, Optional
 
-def ensure_playwright_browser():
-    """确保 Playwright 浏览器已安装"""
-    if getattr(sys, 'frozen', False):
-        # 运行打包后的可执行文件
-        # 使用用户目录存储浏览器
-        if sys.platform == 'win32':
-            browser_dir = Path.home() / '.yst_mcp' / 'playwright_browsers'
-        elif sys.platform == 'darwin':
-            browser_dir = Path.home() / 'Library' / 'Caches' / 'yst_mcp_playwright'
-        else:
-            browser_dir = Path.home() / '.cache' / 'yst_mcp_playwright'
-
-        # 设置环境变量
-        os.environ['PLAYWRIGHT_BROWSERS_PATH'] = str(browser_dir)
-
-        # 检查浏览器是否已安装
-        chromium_installed = any(browser_dir.glob('chromium-*/chrome*'))
-
-        if not chromium_installed:
-            print("[Playwright] 首次运行，正在下载浏览器...")
-            print(f"[Playwright] 浏览器将安装到: {browser_dir}")
-
-            try:
-                # 创建目录
-                browser_dir.mkdir(parents=True, exist_ok=True)
-
-                # 使用打包的 playwright 模块安装浏览器
-                # 注意：这需要 playwright 的 driver 也被打包
-                from playwright._impl._driver import compute_driver_executable
-
-                driver_executable = compute_driver_executable()
-
-                # 运行 playwright install chromium
-                result = subprocess.run(
-                    [str(driver_executable), 'install', 'chromium'],
-                    env={**os.environ, 'PLAYWRIGHT_BROWSERS_PATH': str(browser_dir)},
-                    capture_output=True,
-                    text=True,
-                    timeout=300  # 5分钟超时
-                )
-
-                if result.returncode == 0:
-                    print("[Playwright] ✓ 浏览器安装成功")
-                else:
-                    print(f"[Playwright] ✗ 浏览器安装失败: {result.stderr}")
-                    print("[Playwright] 请手动安装: playwright install chromium")
+# 安装成功后写入的标记文件（内容为 Playwright 版本）
+MARKER_FILE = '.yst_chromium_installed'
+
+# 单次安装的超时时间（秒）
+INSTALL_TIMEOUT = 30 * 60
+
+# 安装状态
+NOT_NEEDED = 'not_needed'  # 开发模式，使用 Playwright 默认位置的浏览器
+PENDING = 'pending'        # 尚未检查或尚未开始安装
+INSTALLING = 'installing'
+INSTALLED = 'installed'
+FAILED = 'failed'
+
+_status: Dict = {'state': PENDING, 'percent': None, 'message': '', 'started_at': None, 'finished_at': None}
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
 
-            except Exception as e:
-                print(f"[Playwright] ✗ 安装浏览器时出错: {e}")
-                print("[Playwright] 程序将使用系统默认位置")
-        else:
-            print(f"[Playwright] 使用已安装的浏览器: {browser_dir}")
 
+def is_frozen() -> bool:
+    """是否运行在打包后的可执行文件中"""
+    return getattr(sys, 'frozen', False)
+
+
+def get_browser_dir() -> Path:
+    """
+    获取打包版本的浏览器安装目录
+
+    Returns:
+        浏览器目录路径
+    """
+    if sys.platform == 'win32':
+        return Path.home() / '.yst_mcp' / 'playwright_browsers'
+    elif sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'yst_mcp_playwright'
     else:
-        # 开发模式，使用系统安装的浏览器
-        pass
+        return Path.home() / '.cache' / 'yst_mcp_playwright'
+
+
+def _playwright_version() -> str:
+    """当前 Playwright 版本（浏览器版本随 Playwright 版本确定）"""
+    from playwright._repo_version import version
+    return version
+
+
+def _update_status(**fields):
+    with _lock:
+        _status.update(fields)
+
+
+def is_browser_installed() -> bool:
+    """
+    通过版本标记快速判断浏览器是否已安装（不扫描目录）
+
+    Returns:
+        开发模式始终返回 True；打包版本在标记与当前 Playwright 版本一致时返回 True
+    """
+    if not is_frozen():
+        return True
+    try:
+        marker = (get_browser_dir() / MARKER_FILE).read_text(encoding='utf-8').strip()
+    except OSError:
+        return False
+    return marker == _playwright_version()
+
+
+def _run_install():
+    """执行 playwright install chromium，逐行解析下载进度"""
+    browser_dir = get_browser_dir()
+    _update_status(message=f"正在下载浏览器到 {browser_dir}")
+    print("[Playwright] 正在后台下载浏览器...", file=sys.stderr)
+
+    try:
+        browser_dir.mkdir(parents=True, exist_ok=True)
+
+        # 使用打包的 playwright 模块安装浏览器
+        # 注意：这需要 playwright 的 driver 也被打包
+        from playwright._impl._driver import compute_driver_executable
+
+        driver_executable = compute_driver_executable()
+        # 新版本返回 (node, cli.js)，旧版本返回单个可执行文件
+        command = list(driver_executable) if isinstance(driver_executable, tuple) else [str(driver_executable)]
+
+        process = subprocess.Popen(
+            command + ['install', 'chromium'],
+            env={**os.environ, 'PLAYWRIGHT_BROWSERS_PATH': str(browser_dir)},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors='replace'
+        )
+        # 超时后结束安装进程（下载过程中可能长时间没有输出）
+        timer = threading.Timer(INSTALL_TIMEOUT, process.kill)
+        timer.start()
+        output = []
+        try:
+            for line in process.stdout:
+                line = line.strip()
+                if not line:
+                    continue
+                match = re.search(r'(\d+)%', line)
+                if match:
+                    _update_status(percent=int(match.group(1)), message=line)
+                else:
+                    # 进度条以外的输出，失败时用作错误信息
+                    output.append(line)
+                    _update_status(message=line)
+            returncode = process.wait()
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+
+        if timed_out:
+            raise TimeoutError(f"安装超过 {INSTALL_TIMEOUT} 秒")
+        if returncode != 0:
+            raise RuntimeError("\n".join(output[-3:]) or f"退出码 {returncode}")
+
+        (browser_dir / MARKER_FILE).write_text(_playwright_version(), encoding='utf-8')
+        _update_status(state=INSTALLED, percent=100, message=f"浏览器已安装到 {browser_dir}", finished_at=time.time())
+        print("[Playwright] ✓ 浏览器安装成功", file=sys.stderr)
+    except Exception as e:
+        _update_status(state=FAILED, message=f"安装浏览器时出错: {e}", finished_at=time.time())
+        print(f"[Playwright] ✗ 安装浏览器时出错: {e}", file=sys.stderr)
+        print("[Playwright] 请手动安装: playwright install chromium", file=sys.stderr)
+
+
+def start_background_install() -> Dict:
+    """
+    检查浏览器是否已安装，未安装时在后台线程中开始下载（立即返回）
+
+    已在安装中时不重复启动；上次失败时重新开始
+
+    Returns:
+        当前安装状态（见 get_install_status）
+    """
+    global _thread
+    if not is_frozen():
+        _update_status(state=NOT_NEEDED, message="开发模式，使用 Playwright 默认位置的浏览器")
+        return get_install_status()
+
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return dict(_status)
+
+    if is_browser_installed():
+        _update_status(state=INSTALLED, percent=100, message=f"使用已安装的浏览器: {get_browser_dir()}")
+        return get_install_status()
+
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _status.update(state=INSTALLING, percent=0, message="准备下载浏览器", started_at=time.time(), finished_at=None)
+            _thread = threading.Thread(target=_run_install, name='playwright-install', daemon=True)
+            _thread.start()
+        return dict(_status)
+
+
+def get_install_status() -> Dict:
+    """
+    获取浏览器安装状态
+
+    Returns:
+        {'state', 'percent', 'message', 'started_at', 'finished_at'}
+    """
+    with _lock:
+        return dict(_status)
+
+
+def ensure_playwright_browser(timeout: Optional[float] = None) -> bool:
+    """
+    确保 Playwright 浏览器已安装（阻塞等待，供命令行脚本使用）
+
+    Args:
+        timeout: 最长等待时间（秒，可选，默认等待安装结束）
+
+    Returns:
+        浏览器是否可用
+    """
+    start_background_install()
+    thread = _thread
+    if thread is not None:
+        thread.join(timeout)
+    return get_install_status()['state'] in (NOT_NEEDED, INSTALLED)
+
 
-# 在导入时自动执行
-ensure_playwright_browser()
+# 导入时只设置浏览器目录，下载在 start_background_install() 中进行
+if is_frozen():
+    os.environ['PLAYWRIGHT_BROWSERS_PATH'] = str(get_browser_dir())
@@ -0,0 +1,233 @@
+"""
+自适应限流模块
+对 KPI 服务器的所有请求共用一个令牌桶 + 并发上限，并按 AIMD 策略自动调整：
+响应健康时缓慢提高速率和并发，遇到 429 / 5xx / 超时或延迟突增时减半
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶限速 + AIMD 自适应并发控制（线程安全，同步和异步请求可共用）
+
+    每个请求先 acquire()（等待并发名额和令牌），收到响应头后 release() 报告结果
+    """
+
+    # 延迟统计窗口（最近多少个请求）
+    LATENCY_WINDOW = 256
+
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.5, max_rate: float = 20.0,
+                 burst: int = 5, concurrency: int = 4, min_concurrency: int = 1, max_concurrency: int = 16,
+                 latency_spike_factor: float = 2.0, min_spike_latency: float = 1.0,
+                 backoff_cooldown: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        """
+        初始化限流器
+
+        Args:
+            rate: 初始速率（请求/秒）
+            min_rate: 速率下限
+            max_rate: 速率上限
+            burst: 令牌桶容量（允许的瞬时突发请求数）
+            concurrency: 初始并发上限
+            min_concurrency: 并发下限
+            max_concurrency: 并发上限的最大值
+            latency_spike_factor: 延迟超过平均延迟多少倍视为突增
+            min_spike_latency: 低于该延迟（秒）的请求不视为突增
+            backoff_cooldown: 两次减速之间的最短间隔（秒），避免同一批失败把速率连续减半
+            clock: 单调时钟（秒，测试时可替换）
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = max(1, burst)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.latency_spike_factor = latency_spike_factor
+        self.min_spike_latency = min_spike_latency
+        self.backoff_cooldown = backoff_cooldown
+        self._clock = clock
+
+        self._rate = min(max(rate, min_rate), max_rate)
+        self._concurrency = float(min(max(concurrency, self.min_concurrency), self.max_concurrency))
+        self._tokens = float(self.burst)
+        self._last_refill = self._clock()
+        self._paused_until = 0.0
+        self._last_backoff = 0.0
+        self._in_flight = 0
+
+        self._latency_avg: Optional[float] = None
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._counts = {'requests': 0, 'throttled': 0, 'errors': 0, 'slow': 0, 'backoffs': 0}
+
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        """按当前速率补充令牌"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self._rate)
+            self._last_refill = now
+
+    def _try_acquire(self) -> Optional[float]:
+        """
+        尝试占用一个并发名额和一个令牌（调用方需持有锁）
+
+        Returns:
+            成功返回 None；否则返回建议的等待秒数
+        """
+        now = self._clock()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= int(self._concurrency):
+            # 等待其他请求释放名额
+            return 0.05
+
+        self._refill(now)
+        if self._tokens < 1:
+            return (1 - self._tokens) / self._rate
+
+        self._tokens -= 1
+        self._in_flight += 1
+        return None
+
+    def acquire(self):
+        """阻塞等待，直到可以发出请求"""
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait is None:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        """异步等待，直到可以发出请求（不阻塞事件循环）"""
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait is None:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, status_code: Optional[int], latency: float, retry_after: Optional[float] = None):
+        """
+        报告请求结果并释放并发名额
+
+        Args:
+            status_code: 响应状态码（请求异常时为 None）
+            latency: 从发出请求到收到响应头的耗时（秒）
+            retry_after: 服务端 Retry-After 指定的等待秒数（可选）
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._counts['requests'] += 1
+            self._latencies.append(latency)
+
+            throttled = status_code == 429
+            failed = status_code is None or status_code >= 500
+            slow = (
+                self._latency_avg is not None
+                and latency > self.min_spike_latency
+                and latency > self._latency_avg * self.latency_spike_factor
+            )
+            self._latency_avg = latency if self._latency_avg is None else 0.8 * self._latency_avg + 0.2 * latency
+
+            if throttled:
+                self._counts['throttled'] += 1
+            elif failed:
+                self._counts['errors'] += 1
+            elif slow:
+                self._counts['slow'] += 1
+
+            if throttled or failed or slow:
+                self._backoff(retry_after if throttled else None)
+            elif status_code < 400:
+                self._increase()
+            self._cond.notify_all()
+
+    def cancel(self):
+        """请求被取消（如用户取消采集）：只释放并发名额，不计入请求结果，也不调整速率"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _backoff(self, retry_after: Optional[float]):
+        """乘性减小速率和并发上限（调用方需持有锁）"""
+        now = self._clock()
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if now - self._last_backoff < self.backoff_cooldown:
+            return
+        self._last_backoff = now
+        self._counts['backoffs'] += 1
+        self._rate = max(self.min_rate, self._rate / 2)
+        self._concurrency = max(float(self.min_concurrency), self._concurrency / 2)
+        self._tokens = min(self._tokens, 1.0)
+
+    def _increase(self):
+        """加性提高速率和并发上限：大约每一轮请求各增加 1（调用方需持有锁）"""
+        self._rate = min(self.max_rate, self._rate + 1 / self._rate)
+        self._concurrency = min(float(self.max_concurrency), self._concurrency + 1 / self._concurrency)
+
+    def stats(self) -> Dict:
+        """
+        返回当前限流参数和观测到的延迟
+
+        Returns:
+            统计信息字典（延迟单位为毫秒）
+        """
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = {
+                'rate': round(self._rate, 2),
+                'concurrency_limit': int(self._concurrency),
+                'in_flight': self._in_flight,
+                'paused_for': round(max(0.0, self._paused_until - self._clock()), 2),
+                'latency_avg_ms': round(self._latency_avg * 1000) if self._latency_avg is not None else None,
+                'latency_p50_ms': None,
+                'latency_p95_ms': None,
+                **self._counts,
+            }
+        if latencies:
+            stats['latency_p50_ms'] = round(latencies[len(latencies) // 2] * 1000)
+            stats['latency_p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000)
+        return stats
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头（只支持秒数格式）
+
+    Args:
+        value: 响应头的值
+
+    Returns:
+        等待秒数，无法解析时返回 None
+    """
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+_lock = threading.Lock()
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    获取进程内共享的限流器（首次调用时创建）
+
+    所有采集器默认共用同一个限流器，同时进行的多个工具调用加起来也不会超过限制
+
+    Returns:
+        限流器实例
+    """
+    global _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                _limiter = AdaptiveRateLimiter()
+    return _limiter
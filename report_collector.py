@@ -3,40 +3,64 @@
 使用 requests 和 BeautifulSoup 采集 KPI 系统日报
 """
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar, create_cookie
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from cookie_manager import CookieManager
-from typing import List, Dict
+from cassette import Cassette
+from cookie_manager import CookieManager, CookieStatus
+from http_cache import HttpCache
+from report_store import ReportStore
+from report_parser import get_backend
+from report_record import Report
+from markdown_writer import MarkdownWriter
+from metrics import get_metrics
+from io_executor import run_blocking
+from rate_limiter import AdaptiveRateLimiter, get_rate_limiter, parse_retry_after
+from retry_policy import CircuitBreaker, RetryPolicy, RETRYABLE_STATUS_CODES, get_circuit_breaker
+from text_utils import safe_text
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 import re
 import sys
 import os
-import platform
+import time
 from pathlib import Path
+from urllib.parse import urljoin
 
-# Windows 兼容：emoji 字符映射
-def safe_text(text: str) -> str:
-    """
-    Windows 兼容的安全输出
-    在 Windows 下，将 emoji 替换为文本符号
-    """
-    if platform.system() == 'Windows':
-        # 替换常用 emoji 为文本符号
-        replacements = {
-            '✓': '[OK]',
-            '✅': '[OK]',
-            '❌': '[X]',
-            '⚠': '[!]',
-            '⏳': '[...]',
-            '🌐': '[*]',
-            '📍': '[*]',
-            '💡': '[*]',
-            '⏱': '[*]',
-            '🔒': '[*]',
-        }
-        for emoji, replacement in replacements.items():
-            text = text.replace(emoji, replacement)
-    return text
+class LoginRequiredError(Exception):
+    """会话已失效：请求被重定向到登录页"""
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """经过熔断器和限流器发送请求的连接池适配器"""
+
+    def __init__(self, rate_limiter: AdaptiveRateLimiter, circuit_breaker: CircuitBreaker, **kwargs):
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.circuit_breaker.before_call()
+        with get_metrics().span('ratelimit.wait'):
+            self.rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            self.rate_limiter.release(None, time.monotonic() - started)
+            self.circuit_breaker.record(None)
+            get_metrics().record('http.request', time.monotonic() - started, error=True)
+            raise
+        # 收到响应头的耗时（正文的下载计入各阶段自己的耗时）
+        latency = time.monotonic() - started
+        get_metrics().record('http.request', latency, error=response.status_code >= 400)
+        self.rate_limiter.release(response.status_code, latency,
+                                  parse_retry_after(response.headers.get('Retry-After')))
+        self.circuit_breaker.record(response.status_code)
+        return response
 
 class ReportCollector:
     """日报采集器"""
@@ -45,6 +69,25 @@ class ReportCollector:
     LOGIN_URL = f"{BASE_URL}/site/login"
     REPORT_LIST_URL = f"{BASE_URL}/report/report-daily/my-list"
 
+    # 并发采集的默认线程数（1 表示逐月串行采集）
+    DEFAULT_MAX_WORKERS = 4
+
+    # 月份结束多少天后视为不再变化，缓存命中时直接使用，不再请求服务器
+    DEFAULT_IMMUTABLE_AFTER_DAYS = 7
+
+    # 增量解析时每次读取的响应字节数
+    CHUNK_SIZE = 64 * 1024
+
+    # 登录有效性缓存时间（秒）：在此期间内确认过有效的会话不再重复探测
+    LOGIN_CACHE_TTL = 60
+
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'zh-CN,zh-TW;q=0.9,zh;q=0.8,en;q=0.7',
+        'DNT': '1',
+    }
+
     @staticmethod
     def _get_default_output_dir() -> Path:
         """
@@ -63,22 +106,73 @@ class ReportCollector:
             # 开发时：使用项目目录
             return Path(__file__).parent / 'data'
 
-    def __init__(self):
-        """初始化采集器"""
-        self.cookie_manager = CookieManager()
-        self.session = requests.Session()
-        self._setup_headers()
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, use_cache: bool = True,
+                 immutable_after_days: int = DEFAULT_IMMUTABLE_AFTER_DAYS, use_store: bool = True,
+                 parser: str = 'auto', include_raw_html: bool = False,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 cookie_manager: Optional[CookieManager] = None, cassette: Optional[Cassette] = None):
+        """
+        初始化采集器
+
+        Args:
+            max_workers: 并发采集月份时的线程数（默认 4）
+            use_cache: 是否使用磁盘缓存月份列表页面（默认 True）
+            immutable_after_days: 月份结束多少天后缓存不再重新验证（默认 7 天）
+            use_store: 是否使用本地 SQLite 日报库做增量同步（默认 True）
+            parser: HTML 解析后端（selectolax / lxml / html.parser，默认 auto 自动选择最快的可用后端）
+            include_raw_html: 是否在日报记录中保存原始 HTML（默认 False，仅调试解析逻辑时需要）
+            rate_limiter: 请求限流器（可选，默认使用进程内共享的限流器）
+            retry_policy: 请求失败时的重试策略（可选，默认最多尝试 3 次）
+            circuit_breaker: 熔断器（可选，默认使用进程内共享的熔断器）
+            cookie_manager: Cookie 管理器（可选，默认新建）
+            cassette: 录制回放目录（可选，默认按环境变量 YST_CASSETTE_MODE 决定，未设置时正常访问服务器）。
+                录制和回放时不使用磁盘缓存和本地日报库：录制时每个月份都请求服务器，回放的数据也不会混入本地库
+        """
+        self.cassette = cassette if cassette is not None else Cassette.from_env()
+        if self.cassette is not None:
+            use_cache = use_store = False
+        self.cookie_manager = cookie_manager or CookieManager()
+        self.parser = get_backend(parser)
+        self.include_raw_html = include_raw_html
+        self.max_workers = max(1, max_workers)
+        self.http_cache = HttpCache() if use_cache else None
+        self.report_store = ReportStore() if use_store else None
+        self.immutable_after_days = immutable_after_days
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker()
+        self._login_valid: Optional[bool] = None  # None 表示未知
+        self._login_checked_at = 0.0
+        self.session = self._create_session()
         self.default_output_dir = self._get_default_output_dir()
 
-    def _setup_headers(self):
+    def _create_session(self) -> requests.Session:
+        """
+        创建 HTTP 会话
+
+        Returns:
+            配置好连接池和请求头的 requests.Session
+        """
+        session = requests.Session()
+        self._setup_adapters(session)
+        self._setup_headers(session)
+        return session
+
+    def _setup_adapters(self, session: requests.Session):
+        """设置连接池大小，保证并发线程都能复用连接；所有请求经过限流器"""
+        adapter = RateLimitedAdapter(self.rate_limiter, self.circuit_breaker,
+                                     pool_connections=1, pool_maxsize=max(10, self.max_workers))
+        if self.cassette is not None:
+            # 录制时包在限流之外；回放时不访问网络，也不经过限流器
+            adapter = self.cassette.wrap_adapter(adapter)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def _setup_headers(self, session: requests.Session):
         """设置请求头"""
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh-TW;q=0.9,zh;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',  # 明确指定接受的编码
-            'DNT': '1',
-        })
+        session.headers.update(self.DEFAULT_HEADERS)
+        session.headers['Accept-Encoding'] = 'gzip, deflate, br'  # 明确指定接受的编码
 
     def load_cookies_from_dict(self, cookie_dict: Dict[str, str]) -> bool:
         """
@@ -91,8 +185,9 @@ class ReportCollector:
             是否加载成功
         """
         try:
-            for name, value in cookie_dict.items():
-                self.session.cookies.set(name, value, domain='kpi.drojian.dev')
+            with self._tracking_cookie_changes():
+                for name, value in cookie_dict.items():
+                    self.session.cookies.set(name, value, domain='kpi.drojian.dev')
             return True
         except Exception as e:
             print(f"加载 Cookie 失败: {e}")
@@ -119,16 +214,27 @@ class ReportCollector:
             print(f"解析 Cookie 字符串失败: {e}")
             return False
 
+    def _cookie_jar(self):
+        """会话的 CookieJar（http.cookiejar.CookieJar）"""
+        return self.session.cookies
+
+    def _cookie_snapshot(self) -> frozenset:
+        """当前 Cookie 的快照，用于判断 Cookie 是否变化"""
+        return frozenset((c.name, c.value, c.domain, c.path) for c in self._cookie_jar())
+
+    @contextmanager
+    def _tracking_cookie_changes(self):
+        """Cookie 发生变化时清除登录有效性缓存"""
+        before = self._cookie_snapshot()
+        try:
+            yield
+        finally:
+            if self._cookie_snapshot() != before:
+                self._login_valid = None
+
     def save_current_cookies(self) -> bool:
-        """保存当前 session 的 Cookie"""
-        cookies = []
-        for cookie in self.session.cookies:
-            cookies.append({
-                'name': cookie.name,
-                'value': cookie.value,
-                'domain': cookie.domain,
-                'path': cookie.path,
-            })
+        """保存当前 session 的 Cookie（包括过期时间和安全属性）"""
+        cookies = [CookieManager.cookie_from_jar(cookie) for cookie in self._cookie_jar()]
         return self.cookie_manager.save_cookies(cookies)
 
     def load_saved_cookies(self) -> bool:
@@ -138,37 +244,238 @@ class ReportCollector:
             return False
 
         try:
-            for cookie in cookies:
-                self.session.cookies.set(
-                    cookie['name'],
-                    cookie['value'],
-                    domain=cookie.get('domain', 'kpi.drojian.dev'),
-                    path=cookie.get('path', '/')
-                )
+            with self._tracking_cookie_changes():
+                self._fill_cookie_jar(self._cookie_jar(), cookies)
             return True
         except Exception as e:
             print(f"加载保存的 Cookie 失败: {e}")
             return False
 
-    def check_login_status(self) -> bool:
+    @staticmethod
+    def _fill_cookie_jar(jar, cookies: List[Dict]):
+        """把已保存的 Cookie（save_cookies 保存的格式）加入 CookieJar"""
+        for cookie in cookies:
+            # 带上过期时间，已过期的 Cookie 不会被发送
+            jar.set_cookie(create_cookie(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain', 'kpi.drojian.dev'),
+                path=cookie.get('path', '/'),
+                expires=cookie.get('expires'),
+                secure=cookie.get('secure', False),
+                rest={'HttpOnly': None} if cookie.get('httpOnly') else {},
+            ))
+
+    def reload_saved_cookies(self) -> bool:
+        """
+        用已保存的 Cookie 替换会话中的 Cookie（连接池保持不变）
+
+        共享采集器上可能还有其他调用正在采集：先在新的 CookieJar 中加载，再一次赋值替换，
+        正在进行的请求不会看到被清空的 Cookie
+
+        Returns:
+            是否加载到 Cookie
+        """
+        cookies = self.cookie_manager.load_cookies() or []
+        jar = RequestsCookieJar()
+        try:
+            self._fill_cookie_jar(jar, cookies)
+        except Exception as e:
+            print(f"加载保存的 Cookie 失败: {e}")
+            return False
+
+        with self._tracking_cookie_changes():
+            # requests.Session 和 httpx.AsyncClient 都接受 CookieJar 赋值
+            self.session.cookies = jar
+        return bool(cookies)
+
+    def cookie_status(self) -> CookieStatus:
+        """
+        根据会话中 Cookie 的过期时间判断登录状态（不访问网络）
+
+        Returns:
+            登录状态
+        """
+        return CookieManager.evaluate_cookies([CookieManager.cookie_from_jar(c) for c in self._cookie_jar()])
+
+    def _local_login_status(self) -> Optional[bool]:
+        """
+        不访问网络判断是否已登录
+
+        Returns:
+            是否已登录，无法在本地判断时返回 None
+        """
+        if self._login_cached():
+            return True
+        if self._login_valid is False or (self.cassette is not None and self.cassette.replaying):
+            # 已观察到会话失效，需要服务器重新确认；回放时以录制的响应为准，不看本地 Cookie
+            return None
+
+        status = self.cookie_status()
+        if status.state in (CookieStatus.MISSING, CookieStatus.EXPIRED):
+            return False
+        if status.is_valid:
+            return True
+        return None
+
+    def check_login_status(self, force: bool = False) -> bool:
         """
         检查是否已登录
 
+        优先在本地判断：LOGIN_CACHE_TTL 秒内确认过有效的会话，或登录凭据的过期时间
+        尚未到达时直接返回 True，凭据已过期时直接返回 False；无法判断时才访问服务器。
+        采集过程中的正常响应会刷新有效期，被重定向到登录页则标记为失效
+
+        Args:
+            force: 是否忽略本地判断，强制向服务器确认
+
         Returns:
             是否已登录
         """
+        if not force:
+            local = self._local_login_status()
+            if local is not None:
+                get_metrics().incr('login.local_check')
+                return local
+
         try:
-            response = self.session.get(self.REPORT_LIST_URL, allow_redirects=False)
-            # 如果返回 200 且不是重定向到登录页，说明已登录
-            return response.status_code == 200 and 'login' not in response.url.lower()
+            with get_metrics().span('login.probe'):
+                valid = self._probe_login()
         except Exception as e:
             print(f"检查登录状态失败: {e}")
             return False
+        self._remember_login(valid)
+        return valid
 
-    def fetch_month_reports(self, month: str) -> List[Dict]:
+    def _probe_login(self) -> bool:
+        """
+        向服务器确认会话是否有效（只请求响应头，不下载页面）
+
+        Returns:
+            是否已登录
+        """
+        response = self.session.head(self.REPORT_LIST_URL, allow_redirects=False)
+        if response.status_code in (405, 501):
+            # 服务端不支持 HEAD 时退回 GET，只读取响应头
+            with self.session.get(self.REPORT_LIST_URL, allow_redirects=False, stream=True) as response:
+                pass
+        # 返回 200 说明已登录，未登录时会重定向到登录页
+        return response.status_code == 200
+
+    def _login_cached(self) -> bool:
+        """登录有效性缓存是否仍然有效"""
+        return self._login_valid is True and time.monotonic() - self._login_checked_at < self.LOGIN_CACHE_TTL
+
+    def _remember_login(self, valid: bool):
+        """记录会话有效性"""
+        self._login_valid = valid
+        self._login_checked_at = time.monotonic()
+
+    def _observe_login(self, final_url):
+        """
+        根据正常响应的最终 URL 推断会话状态
+
+        Args:
+            final_url: 跟随重定向后的最终 URL
+
+        Raises:
+            LoginRequiredError: 请求被重定向到登录页
+        """
+        if 'login' in str(final_url).lower():
+            self._remember_login(False)
+            raise LoginRequiredError("登录已过期，请求被重定向到登录页")
+        self._remember_login(True)
+
+    def _ensure_not_logged_out(self):
+        """本次已确认会话失效时直接失败，不再发出注定被重定向的请求"""
+        if self._login_valid is False:
+            raise LoginRequiredError("登录已过期，请重新登录")
+
+    def fetch_month_reports(self, month: str) -> List[Report]:
         """
         获取指定月份的日报列表
 
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            日报列表（获取失败时返回空列表）
+        """
+        reports = self._fetch_month_or_none(month)
+        return reports if reports is not None else []
+
+    def _fetch_month_or_none(self, month: str) -> Optional[List[Report]]:
+        """
+        获取指定月份的日报列表，临时错误按重试策略重试，最终失败时打印错误并返回 None
+
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            日报列表，获取失败返回 None
+        """
+        try:
+            # 包括重试在内的整个月份的耗时
+            with get_metrics().span('month.fetch'):
+                return self._call_with_retry(self._fetch_month, month)
+        except Exception as e:
+            print(f"获取 {month} 月份日报失败: {e}")
+            return None
+
+    def _call_with_retry(self, func, *args):
+        """
+        调用 func，遇到可重试的错误时等待后重试
+
+        Args:
+            func: 请求函数（出错时抛出异常）
+            *args: 参数
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            最后一次尝试的异常，或不可重试的异常
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(*args)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                print(f"  请求失败（第 {attempt} 次）: {e}，{delay:.1f} 秒后重试")
+                time.sleep(delay)
+                attempt += 1
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> Optional[float]:
+        """
+        计算重试前的等待时间
+
+        Args:
+            attempt: 已失败的次数
+            exc: 本次失败的异常
+
+        Returns:
+            等待秒数，不应重试时返回 None
+        """
+        if attempt >= self.retry_policy.max_attempts or not self._is_retryable(exc):
+            return None
+        return self.retry_policy.delay(attempt)
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        """连接错误、超时、响应中断以及 429 / 5xx 可以重试；熔断和其他错误直接失败"""
+        if isinstance(exc, requests.HTTPError):
+            return exc.response is not None and exc.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(exc, (requests.ConnectionError, requests.Timeout,
+                                requests.exceptions.ChunkedEncodingError))
+
+    def _fetch_month(self, month: str) -> List[Report]:
+        """
+        获取并解析指定月份的日报列表（出错时抛出异常）
+
+        响应正文按块边接收边解析，同时写入缓存，不在内存中保留整页内容
+
         Args:
             month: 月份，格式 YYYY-MM
 
@@ -176,54 +483,181 @@ class ReportCollector:
             日报列表
         """
         url = f"{self.REPORT_LIST_URL}?month={month}"
-        reports = []
 
-        try:
-            # 禁用自动解压缩，手动处理编码
-            response = self.session.get(url, stream=True)
+        entry, fresh = self._lookup_cache(url, month)
+        if fresh:
+            # 已结束的月份直接使用缓存，不访问网络
+            get_metrics().incr('month.cache_fresh')
+            return self._parse_chunks(self.http_cache.iter_body(url, self.CHUNK_SIZE))
+
+        self._ensure_not_logged_out()
+        response = self.session.get(url, stream=True, headers=HttpCache.conditional_headers(entry))
+        with response:
+            if response.status_code == 304 and entry is not None:
+                # 服务端确认内容未变化，沿用缓存正文
+                self._observe_login(response.url)
+                get_metrics().incr('month.not_modified')
+                self.http_cache.touch(url, entry)
+                return self._parse_chunks(self.http_cache.iter_body(url, self.CHUNK_SIZE))
+
             response.raise_for_status()
+            # 被重定向到登录页时抛出异常，不会把登录页当作空月份缓存
+            self._observe_login(response.url)
+            get_metrics().incr('month.downloaded')
+            body_writer = self._cache_writer(url, response.status_code, response.headers)
+            # iter_content 返回已解压的数据块
+            return self._parse_chunks(response.iter_content(self.CHUNK_SIZE), body_writer)
+
+    def _month_settled_at(self, month: str) -> float:
+        """
+        计算月份内容不再变化的时间点
 
-            # 手动处理响应内容
-            response.raw.decode_content = True
-            content = response.content.decode('utf-8', errors='ignore')
+        Args:
+            month: 月份，格式 YYYY-MM
 
-            soup = BeautifulSoup(content, 'html.parser')
-            report_list = soup.select('#report_list li')
+        Returns:
+            时间戳：下个月第一天 + immutable_after_days 天
+        """
+        next_month = datetime.strptime(month, '%Y-%m') + relativedelta(months=1)
+        return (next_month + relativedelta(days=self.immutable_after_days)).timestamp()
 
-            for li in report_list:
-                report = self._parse_report_item(li)
-                if report:
-                    reports.append(report)
+    def _lookup_cache(self, url: str, month: str):
+        """
+        查询月份页面缓存
 
-            return reports
-        except Exception as e:
-            print(f"获取 {month} 月份日报失败: {e}")
-            return []
+        Args:
+            url: 月份列表 URL
+            month: 月份，格式 YYYY-MM
 
-    def _parse_report_item(self, li_element) -> Dict:
+        Returns:
+            (缓存条目或 None, 是否可以不经验证直接使用)
+        """
+        if self.http_cache is None:
+            return None, False
+
+        entry = self.http_cache.get(url)
+        if entry is None:
+            return None, False
+
+        # 只有在月份稳定之后获取的缓存才视为不可变
+        fresh = entry.get('fetched_at', 0) >= self._month_settled_at(month)
+        return entry, fresh
+
+    def _cache_writer(self, url: str, status_code: int, headers):
+        """
+        为可缓存的响应创建缓存写入器
+
+        Args:
+            url: 请求 URL
+            status_code: 响应状态码
+            headers: 响应头
+
+        Returns:
+            缓存写入器，不可缓存时返回 None
+        """
+        if self.http_cache is None or status_code != 200:
+            return None
+        return self.http_cache.body_writer(url, headers)
+
+    def _parse_chunks(self, chunks: Iterable[bytes], body_writer=None) -> List[Report]:
+        """
+        增量解析响应正文
+
+        Args:
+            chunks: 已解压的正文数据块
+            body_writer: 缓存写入器（可选）
+
+        Returns:
+            日报列表
+        """
+        parser = self.parser.incremental()
+        reports = []
+        try:
+            for chunk in chunks:
+                reports.extend(self._parse_chunk(parser, chunk, body_writer))
+            reports.extend(self._finish_parse(parser, body_writer))
+        except BaseException:
+            if body_writer is not None:
+                body_writer.discard()
+            raise
+        return reports
+
+    def _parse_chunk(self, parser, chunk: bytes, body_writer=None) -> List[Report]:
+        """
+        喂入一块正文，返回已解析完成的日报
+
+        Args:
+            parser: 增量解析器
+            chunk: 正文数据块
+            body_writer: 缓存写入器（可选）
+
+        Returns:
+            本块解析出的日报
+        """
+        if body_writer is not None:
+            body_writer.write(chunk)
+        with get_metrics().span('parse.list'):
+            return self._to_reports(parser.feed(chunk))
+
+    def _finish_parse(self, parser, body_writer=None) -> List[Report]:
+        """
+        正文接收完毕：解析剩余内容并提交缓存
+
+        Args:
+            parser: 增量解析器
+            body_writer: 缓存写入器（可选）
+
+        Returns:
+            剩余的日报
+        """
+        with get_metrics().span('parse.list'):
+            reports = self._to_reports(parser.close())
+        if body_writer is not None:
+            body_writer.commit()
+        return reports
+
+    def _to_reports(self, nodes: list) -> List[Report]:
+        """将解析后端返回的 li 元素转换为日报记录（需在下一次喂入数据前调用）"""
+        reports = []
+        for node in nodes:
+            report = self._parse_report_item(node)
+            if report:
+                reports.append(report)
+        return reports
+
+    def parse_reports(self, content: str) -> List[Report]:
+        """
+        解析月份列表页面中的日报条目
+
+        Args:
+            content: 页面 HTML
+
+        Returns:
+            日报列表
+        """
+        return self._to_reports(self.parser.select_items(content))
+
+    def _parse_report_item(self, li_element, backend=None) -> Optional[Report]:
         """
         解析单个日报条目
 
         Args:
-            li_element: li 元素
+            li_element: li 元素（由解析后端的 select_items 返回）
+            backend: 解析后端（可选，默认使用采集器的后端）
 
         Returns:
-            日报信息字典
+            日报记录，解析失败返回 None
         """
+        backend = backend or self.parser
         try:
-            # 根据实际页面结构调整解析逻辑
-            # 这里需要等登录后查看实际结构
-            text = li_element.get_text(strip=True)
-            link = li_element.find('a')
-
-            return {
-                'text': text,
-                'link': link['href'] if link and link.get('href') else '',
-                'raw_html': str(li_element)
-            }
+            return Report(
+                text=backend.item_text(li_element),
+                link=backend.item_link(li_element),
+                raw_html=backend.item_html(li_element) if self.include_raw_html else None,
+            )
         except Exception as e:
             print(f"解析日报条目失败: {e}")
-            return {}
+            return None
 
     def generate_month_range(self, start_month: str, end_month: str) -> List[str]:
         """
@@ -247,7 +681,289 @@ class ReportCollector:
 
         return months
 
-    async def collect(self, start_month: str, end_month: str, output_file: str = None) -> str:
+    def iter_months(self, months: List[str],
+                    max_workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[List[Report]]]]:
+        """
+        并发获取多个月份的日报，并按月份顺序逐个产出结果
+
+        最多同时请求 max_workers 个月份；前面的月份未完成时，
+        后面已完成的月份也最多缓存 max_workers 个，内存占用与月份总数无关
+
+        Args:
+            months: 月份列表，格式 YYYY-MM
+            max_workers: 并发线程数（可选，默认使用初始化时的配置）
+
+        Yields:
+            (月份, 日报列表)，获取失败的月份日报列表为 None
+        """
+        workers = min(max(1, max_workers or self.max_workers), max(1, len(months)))
+
+        if workers == 1:
+            for month in months:
+                yield month, self._fetch_month_or_none(month)
+            return
+
+        month_iter = iter(months)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yst-fetch') as executor:
+            pending = deque()
+
+            def submit_next():
+                month = next(month_iter, None)
+                if month is not None:
+                    pending.append((month, executor.submit(self._fetch_month_or_none, month)))
+
+            for _ in range(workers):
+                submit_next()
+
+            while pending:
+                month, future = pending.popleft()
+                reports = future.result()
+                submit_next()
+                yield month, reports
+
+    def fetch_months(self, months: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[List[Report]]]:
+        """
+        并发获取多个月份的日报
+
+        各月份在线程池中并行请求和解析，结果按传入的月份顺序返回
+
+        Args:
+            months: 月份列表，格式 YYYY-MM
+            max_workers: 并发线程数（可选，默认使用初始化时的配置）
+
+        Returns:
+            月份 -> 日报列表 的有序字典，获取失败的月份值为 None
+        """
+        return dict(self.iter_months(months, max_workers))
+
+    def _detail_url(self, link: str) -> str:
+        """将日报链接转换为绝对 URL"""
+        return urljoin(self.BASE_URL + '/', link)
+
+    def fetch_report_detail(self, link: str) -> Optional[str]:
+        """
+        获取日报详情页的正文
+
+        已缓存的详情页直接读取缓存，不访问网络
+
+        Args:
+            link: 日报链接（列表页中的 href）
+
+        Returns:
+            正文纯文本，获取失败返回 None
+        """
+        url = self._detail_url(link)
+        try:
+            with get_metrics().span('detail.fetch'):
+                return self._call_with_retry(self._fetch_detail, url)
+        except Exception as e:
+            print(f"获取日报详情失败 {url}: {e}")
+            return None
+
+    def _fetch_detail(self, url: str) -> str:
+        """
+        获取并解析详情页（出错时抛出异常）
+
+        Args:
+            url: 详情页 URL
+
+        Returns:
+            正文纯文本
+        """
+        if self.http_cache is not None and self.http_cache.get(url) is not None:
+            # 已缓存的详情页不再请求服务器
+            return self._parse_detail(self.http_cache.read_body(url))
+
+        self._ensure_not_logged_out()
+        response = self.session.get(url)
+        response.raise_for_status()
+        # 被重定向到登录页时抛出异常，避免把登录页当作正文保存
+        self._observe_login(response.url)
+        if self.http_cache is not None:
+            self.http_cache.put(url, response.content, response.headers)
+        return self._parse_detail(response.content)
+
+    def _parse_detail(self, body: bytes) -> str:
+        """解析详情页正文"""
+        with get_metrics().span('parse.detail'):
+            return self.parser.detail_text(body.decode('utf-8', errors='ignore'))
+
+    @staticmethod
+    def _pending_details(reports: List[Report]) -> List[Report]:
+        """返回有详情链接但还没有正文的日报"""
+        return [report for report in reports if report.link and report.content is None]
+
+    @staticmethod
+    def _apply_details(pending: List[Report], contents: List[Optional[str]]) -> List[Report]:
+        """把获取到的正文写入日报记录，返回成功补充的日报"""
+        enriched = []
+        for report, content in zip(pending, contents):
+            if content is not None:
+                report.content = content
+                enriched.append(report)
+        return enriched
+
+    def enrich_reports(self, reports: List[Report], max_workers: Optional[int] = None) -> List[Report]:
+        """
+        并发获取日报详情页，将正文补充到日报记录的 content 中
+
+        已有正文的日报跳过，已缓存的详情页不访问网络
+
+        Args:
+            reports: 日报列表（原地修改）
+            max_workers: 并发线程数（可选，默认使用初始化时的配置）
+
+        Returns:
+            本次补充了正文的日报
+        """
+        pending = self._pending_details(reports)
+        if not pending:
+            return []
+
+        workers = min(max(1, max_workers or self.max_workers), len(pending))
+        links = [report.link for report in pending]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yst-detail') as executor:
+            contents = list(executor.map(self.fetch_report_detail, links))
+        return self._apply_details(pending, contents)
+
+    def _enrich_month(self, month: str, reports: List[Report], max_workers: Optional[int] = None) -> int:
+        """
+        补充一个月份的日报详情，并保存到本地库
+
+        Args:
+            month: 月份，格式 YYYY-MM
+            reports: 该月份的日报列表（原地修改）
+            max_workers: 并发线程数
+
+        Returns:
+            本次补充的详情数
+        """
+        enriched = self.enrich_reports(reports, max_workers)
+        if enriched and self.report_store is not None:
+            self.report_store.save_contents(month, enriched)
+        return len(enriched)
+
+    def _has_pending_details(self, months: List[str]) -> bool:
+        """是否还有需要获取详情的日报（不使用本地库时总是需要）"""
+        if self.report_store is None:
+            return True
+        return self.report_store.missing_content_count(months) > 0
+
+    def _resolve_output_file(self, output_file: Optional[str]) -> str:
+        """
+        处理输出文件路径
+
+        Args:
+            output_file: 用户传入的路径（可选）
+
+        Returns:
+            绝对路径
+        """
+        if output_file is None:
+            # 使用默认路径
+            return str(self.default_output_dir / 'new.md')
+        if not os.path.isabs(output_file):
+            # 如果是相对路径，转换为绝对路径（相对于默认输出目录）
+            return str(self.default_output_dir / output_file)
+        return output_file
+
+    def _login_required_message(self) -> str:
+        """未登录时返回给用户的提示"""
+        return safe_text(
+            "❌ 未登录或登录已过期\n\n"
+            "请先使用以下步骤登录：\n"
+            "1. 使用 chrome_devtools_mcp 打开登录页面\n"
+            f"2. 访问 {self.LOGIN_URL}\n"
+            "3. 手动登录\n"
+            "4. 登录成功后，使用 save_cookies 工具保存 Cookie\n"
+            "5. 重新调用 collect_reports 工具"
+        )
+
+    def _months_to_sync(self, months: List[str], force_refresh: bool = False) -> List[str]:
+        """
+        找出需要从服务器同步的月份
+
+        本地库中没有、尚未结束，或者在月份稳定之前同步的月份需要重新获取
+
+        Args:
+            months: 月份列表
+            force_refresh: 是否忽略本地库，全部重新获取
+
+        Returns:
+            需要同步的月份列表
+        """
+        if self.report_store is None or force_refresh:
+            return list(months)
+
+        synced_at = self.report_store.synced_at(months)
+        return [
+            month for month in months
+            if synced_at[month] is None or synced_at[month] < self._month_settled_at(month)
+        ]
+
+    def _month_reports(self, month: str, fetched: Optional[List[Report]]) -> List[Report]:
+        """
+        将新获取的月份写入本地库，并返回该月份用于输出的日报
+
+        fetched 为 None（未同步或获取失败）时不写入本地库，沿用上一次同步的数据
+
+        Args:
+            month: 月份，格式 YYYY-MM
+            fetched: 本次获取的结果
+
+        Returns:
+            日报列表
+        """
+        if self.report_store is None:
+            return fetched or []
+
+        if fetched is not None:
+            self.report_store.save_month(month, fetched)
+        return self.report_store.load_month(month)
+
+    def _sync_and_write(self, months: List[str], to_sync: List[str], output_file: str,
+                        max_workers: Optional[int] = None, include_details: bool = False) -> Tuple[int, List[str]]:
+        """
+        同步月份并流式写入 Markdown：每个月份轮到时立即写出，不在内存中累积全部结果
+
+        Args:
+            months: 完整月份列表
+            to_sync: 需要从服务器获取的月份
+            output_file: 输出文件路径
+            max_workers: 并发线程数
+            include_details: 是否获取详情页正文
+
+        Returns:
+            (写入的日报总数, 获取失败的月份)
+        """
+        to_sync_set = set(to_sync)
+        fetched_iter = self.iter_months(to_sync, max_workers)
+        failed_months = []
+
+        with MarkdownWriter(output_file) as writer:
+            for month in months:
+                fetched = next(fetched_iter)[1] if month in to_sync_set else None
+                if month in to_sync_set and fetched is None:
+                    failed_months.append(month)
+                reports = self._month_reports(month, fetched)
+                detail_count = self._enrich_month(month, reports, max_workers) if include_details else 0
+                with get_metrics().span('markdown.write'):
+                    writer.write_month(month, reports)
+                print(self._month_summary(month, reports, include_details, detail_count))
+
+        return writer.report_count, failed_months
+
+    @staticmethod
+    def _month_summary(month: str, reports: List[Report], include_details: bool, detail_count: int) -> str:
+        """月份写入完成后的进度提示"""
+        summary = f"  ✓ {month} 共 {len(reports)} 条日报"
+        if include_details:
+            summary += f"，新获取 {detail_count} 条详情"
+        return safe_text(summary)
+
+    async def collect(self, start_month: str, end_month: str, output_file: str = None,
+                      max_workers: Optional[int] = None, force_refresh: bool = False,
+                      include_details: bool = False) -> str:
         """
         采集指定月份范围的日报并保存
 
@@ -255,56 +971,73 @@ class ReportCollector:
             start_month: 起始月份
             end_month: 结束月份
             output_file: 输出文件路径（可选，默认使用自动检测的路径）
+            max_workers: 并发采集的线程数（可选，默认使用初始化时的配置）
+            force_refresh: 是否忽略本地日报库，全部重新获取（默认 False）
+            include_details: 是否并发获取日报详情页，将正文写入输出和本地库（默认 False）
 
         Returns:
             采集结果描述
         """
-        # 处理输出文件路径
-        if output_file is None:
-            # 使用默认路径
-            output_file = str(self.default_output_dir / 'new.md')
-        elif not os.path.isabs(output_file):
-            # 如果是相对路径，转换为绝对路径（相对于默认输出目录）
-            output_file = str(self.default_output_dir / output_file)
+        output_file = self._resolve_output_file(output_file)
 
         # 确保输出目录存在
         output_path = Path(output_file)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # 加载已保存的 Cookie
-        if self.cookie_manager.has_cookies():
-            self.load_saved_cookies()
-
-        # 检查登录状态
-        if not self.check_login_status():
-            return safe_text(
-                "❌ 未登录或登录已过期\n\n"
-                "请先使用以下步骤登录：\n"
-                "1. 使用 chrome_devtools_mcp 打开登录页面\n"
-                f"2. 访问 {self.LOGIN_URL}\n"
-                "3. 手动登录\n"
-                "4. 登录成功后，使用 save_cookies 工具保存 Cookie\n"
-                "5. 重新调用 collect_reports 工具"
-            )
+        await run_blocking(output_path.parent.mkdir, parents=True, exist_ok=True)
 
-        # 生成月份范围
+        # 生成月份范围，只同步本地库中缺失或可能变化的月份
         months = self.generate_month_range(start_month, end_month)
+        to_sync = await run_blocking(self._months_to_sync, months, force_refresh)
+        needs_details = include_details and await run_blocking(self._has_pending_details, months)
+
+        if to_sync or needs_details:
+            # 加载已保存的 Cookie
+            if self.cookie_manager.has_cookies():
+                await run_blocking(self.load_saved_cookies)
+
+            # 检查登录状态
+            if not await run_blocking(self.check_login_status):
+                return self._login_required_message()
+
+        if to_sync:
+            print(f"正在同步 {len(to_sync)} 个月份的日报（其余 {len(months) - len(to_sync)} 个月份使用本地库）...")
+        else:
+            print(f"{start_month} 到 {end_month} 共 {len(months)} 个月份均已同步，直接使用本地库")
+
+        # 并发采集需要同步的月份，按月份顺序边采集边写入 Markdown 文件
+        total_count, failed_months = await run_blocking(self._sync_and_write, months, to_sync, output_file,
+                                                        max_workers, include_details)
+
+        return self._collect_result(months, total_count, failed_months, output_file)
 
-        # 采集所有月份的数据
-        all_reports = {}
-        for month in months:
-            print(f"正在采集 {month} 月份日报...")
-            reports = self.fetch_month_reports(month)
-            all_reports[month] = reports
-            print(safe_text(f"  ✓ 采集到 {len(reports)} 条日报"))
+    def _collect_result(self, months: List[str], total_count: int, failed_months: List[str], output_file: str) -> str:
+        """
+        生成采集结果描述，明确列出获取失败的月份
 
-        # 生成 Markdown 文件
-        self._generate_markdown(all_reports, output_file)
+        Args:
+            months: 完整月份列表
+            total_count: 写入的日报总数
+            failed_months: 重试后仍获取失败的月份
+            output_file: 输出文件路径
 
-        total_count = sum(len(reports) for reports in all_reports.values())
-        return safe_text(f"✓ 采集完成！共采集 {len(months)} 个月份，{total_count} 条日报，已保存到 {output_file}")
+        Returns:
+            采集结果描述
+        """
+        if not failed_months:
+            return safe_text(f"✓ 采集完成！共采集 {len(months)} 个月份，{total_count} 条日报，已保存到 {output_file}")
+
+        fallback = "本地库中上一次同步的数据" if self.report_store is not None else "空数据"
+        if self._login_valid is False:
+            hint = "采集过程中登录已过期，请调用 browser_login 重新登录后再调用 collect_reports 补齐这些月份"
+        else:
+            hint = "请稍后重新调用 collect_reports 补齐这些月份"
+        return safe_text(
+            f"⚠ 采集部分完成：共 {len(months)} 个月份，{total_count} 条日报，已保存到 {output_file}\n\n"
+            f"以下 {len(failed_months)} 个月份重试后仍获取失败，输出中使用{fallback}：\n"
+            f"{', '.join(failed_months)}\n\n"
+            f"{hint}"
+        )
 
-    def _generate_markdown(self, all_reports: Dict[str, List[Dict]], output_file: str):
+    def _generate_markdown(self, all_reports: Dict[str, List[Report]], output_file: str):
         """
         生成 Markdown 文件
 
@@ -312,20 +1045,6 @@ class ReportCollector:
             all_reports: 所有日报数据
             output_file: 输出文件路径
         """
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("# YST 日报整理\n\n")
-            f.write(f"生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
+        with MarkdownWriter(output_file) as writer:
             for month in sorted(all_reports.keys()):
-                reports = all_reports[month]
-                f.write(f"## {month} 月份日报 ({len(reports)} 条)\n\n")
-
-                if not reports:
-                    f.write("*暂无数据*\n\n")
-                    continue
-
-                for i, report in enumerate(reports, 1):
-                    f.write(f"### {i}. {report.get('text', '无标题')}\n\n")
-                    if report.get('link'):
-                        f.write(f"链接：{report['link']}\n\n")
-                    f.write("---\n\n")
+                writer.write_month(month, all_reports[month])
@@ -0,0 +1,320 @@
+"""
+日报列表解析模块
+提供多种 HTML 解析后端：lxml（增量解析）、selectolax（C 实现）、html.parser（纯 Python，兜底）
+"""
+from typing import List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None  # 未安装 selectolax
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None  # 未安装 lxml
+
+# 日报列表容器的 id
+REPORT_LIST_ID = 'report_list'
+
+# 与 BeautifulSoup 的 get_text 保持一致：这些标签内的文本不计入日报内容
+SKIP_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+# 日报详情页正文容器，按顺序取第一个匹配的元素
+DETAIL_CONTENT_SELECTORS = ('.detail-view', '.box-body', '.panel-body', 'body')
+
+
+class ParserBackend:
+    """解析后端基类"""
+
+    name = ''
+
+    # 整页解析详情页时 BeautifulSoup 使用的解析器
+    soup_features = 'html.parser'
+
+    def select_items(self, content: str) -> list:
+        """
+        选出日报列表中的所有 li 元素
+
+        Args:
+            content: 页面 HTML
+
+        Returns:
+            li 元素列表（按文档顺序）
+        """
+        raise NotImplementedError
+
+    def incremental(self) -> 'BufferedParser':
+        """
+        创建增量解析器，按块喂入已解压的响应正文
+
+        不支持增量解析的后端先缓存全部数据，在 close() 时一次性解析
+
+        Returns:
+            增量解析器
+        """
+        return BufferedParser(self)
+
+    def item_text(self, node) -> str:
+        """返回元素的纯文本（各文本片段去除首尾空白后拼接）"""
+        raise NotImplementedError
+
+    def item_link(self, node) -> str:
+        """返回元素中第一个链接的 href，没有时返回空字符串"""
+        raise NotImplementedError
+
+    def item_html(self, node) -> str:
+        """返回元素的 HTML"""
+        raise NotImplementedError
+
+    def detail_text(self, content: str) -> str:
+        """
+        提取日报详情页的正文
+
+        Args:
+            content: 详情页 HTML
+
+        Returns:
+            正文纯文本（每个文本片段一行），找不到正文容器时返回空字符串
+        """
+        soup = BeautifulSoup(content, self.soup_features)
+        for selector in DETAIL_CONTENT_SELECTORS:
+            node = soup.select_one(selector)
+            if node is not None:
+                for tag in node.find_all(SKIP_TEXT_TAGS):
+                    tag.decompose()
+                return node.get_text('\n', strip=True)
+        return ''
+
+
+class BufferedParser:
+    """非增量后端的解析器：缓存数据块，close() 时整体解析"""
+
+    def __init__(self, backend: ParserBackend):
+        self.backend = backend
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list:
+        """喂入一块数据，返回已解析完成的 li 元素（缓存模式下总是为空）"""
+        self._buffer.extend(chunk)
+        return []
+
+    def close(self) -> list:
+        """数据接收完毕，返回剩余的 li 元素"""
+        content = self._buffer.decode('utf-8', errors='ignore')
+        self._buffer = bytearray()
+        return self.backend.select_items(content)
+
+
+class BeautifulSoupBackend(ParserBackend):
+    """BeautifulSoup + html.parser 解析后端（原有实现，始终可用）"""
+
+    name = 'html.parser'
+
+    def select_items(self, content: str) -> list:
+        soup = BeautifulSoup(content, 'html.parser')
+        return soup.select(f'#{REPORT_LIST_ID} li')
+
+    def item_text(self, node) -> str:
+        return node.get_text(strip=True)
+
+    def item_link(self, node) -> str:
+        link = node.find('a')
+        return link['href'] if link and link.get('href') else ''
+
+    def item_html(self, node) -> str:
+        return str(node)
+
+
+class LxmlIncrementalParser:
+    """
+    基于 lxml HTMLPullParser 的增量解析器
+
+    边接收数据边解析：每个顶层 li 结束时立即返回它（以及其中嵌套的 li），
+    下一次喂入数据时释放已返回的元素，内存中只保留正在解析的部分
+    """
+
+    def __init__(self, release_items: bool = True):
+        """
+        Args:
+            release_items: 是否在下一次 feed 时释放已返回的 li（整页解析时需要保留）
+        """
+        self._parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+        self._release_items = release_items
+        self._list_depth = 0  # 在 #report_list 内部的层级，0 表示不在列表内
+        self._li_depth = 0
+        self._batch = []      # 当前顶层 li 及其嵌套 li（按开始顺序）
+        self._done = []       # 已返回、待释放的顶层 li
+
+    def feed(self, chunk: bytes) -> list:
+        """喂入一块数据，返回已解析完成的 li 元素"""
+        self._release()
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self) -> list:
+        """数据接收完毕，返回剩余的 li 元素"""
+        self._release()
+        self._parser.close()
+        return self._drain()
+
+    def _release(self):
+        """释放上一批已返回的 li"""
+        if not self._release_items:
+            return
+        for element in self._done:
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                parent.remove(element)
+        self._done = []
+
+    def _drain(self) -> list:
+        """处理解析事件，返回已结束的顶层 li 及其嵌套 li"""
+        ready = []
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._list_depth:
+                    self._list_depth += 1
+                    if element.tag == 'li':
+                        self._batch.append(element)
+                        self._li_depth += 1
+                elif element.get('id') == REPORT_LIST_ID:
+                    self._list_depth = 1
+            elif self._list_depth:
+                self._list_depth -= 1
+                if element.tag == 'li' and self._list_depth:
+                    self._li_depth -= 1
+                    if self._li_depth == 0:
+                        # 顶层 li 结束：按文档顺序返回它和嵌套的 li
+                        ready.extend(self._batch)
+                        self._batch = []
+                        self._done.append(element)
+        return ready
+
+
+class LxmlBackend(ParserBackend):
+    """lxml 解析后端，支持边下载边解析，只保留 #report_list 中正在解析的条目"""
+
+    name = 'lxml'
+    soup_features = 'lxml'
+
+    def select_items(self, content: str) -> list:
+        parser = LxmlIncrementalParser(release_items=False)
+        return parser.feed(content.encode('utf-8')) + parser.close()
+
+    def incremental(self) -> LxmlIncrementalParser:
+        return LxmlIncrementalParser()
+
+    def item_text(self, node) -> str:
+        parts = []
+
+        def walk(element):
+            if element.tag in SKIP_TEXT_TAGS:
+                return
+            if element.text:
+                parts.append(element.text.strip())
+            for child in element:
+                # 注释等非元素节点没有字符串 tag，只保留其后的文本
+                if isinstance(child.tag, str):
+                    walk(child)
+                if child.tail:
+                    parts.append(child.tail.strip())
+
+        walk(node)
+        return ''.join(parts)
+
+    def item_link(self, node) -> str:
+        link = next(node.iter('a'), None)
+        if link is None:
+            return ''
+        return link.get('href') or ''
+
+    def item_html(self, node) -> str:
+        return etree.tostring(node, encoding='unicode', method='html', with_tail=False)
+
+
+class SelectolaxBackend(ParserBackend):
+    """selectolax (lexbor) 解析后端，C 实现，整页解析速度快"""
+
+    name = 'selectolax'
+
+    def select_items(self, content: str) -> list:
+        tree = LexborHTMLParser(content)
+        report_list = tree.css_first(f'#{REPORT_LIST_ID}')
+        if report_list is None:
+            return []
+        # 与 BeautifulSoup 的 get_text 保持一致：不包含脚本和样式文本
+        report_list.strip_tags(list(SKIP_TEXT_TAGS))
+        return report_list.css('li')
+
+    def item_text(self, node) -> str:
+        return node.text(deep=True, separator='', strip=True)
+
+    def item_link(self, node) -> str:
+        link = node.css_first('a')
+        if link is None:
+            return ''
+        return link.attributes.get('href') or ''
+
+    def item_html(self, node) -> str:
+        return node.html
+
+    def detail_text(self, content: str) -> str:
+        tree = LexborHTMLParser(content)
+        for selector in DETAIL_CONTENT_SELECTORS:
+            node = tree.css_first(selector)
+            if node is not None:
+                node.strip_tags(list(SKIP_TEXT_TAGS))
+                # 与 BeautifulSoup 保持一致：去掉只含空白的文本片段
+                text = node.text(deep=True, separator='\n', strip=True)
+                return '\n'.join(line for line in text.split('\n') if line)
+        return ''
+
+
+BACKENDS = {
+    LxmlBackend.name: LxmlBackend,
+    SelectolaxBackend.name: SelectolaxBackend,
+    BeautifulSoupBackend.name: BeautifulSoupBackend,
+}
+
+
+def available_backends() -> List[str]:
+    """
+    返回当前环境可用的解析后端（按优先级排列）
+
+    lxml 支持边下载边解析，优先使用；selectolax 整页解析最快；html.parser 始终可用
+
+    Returns:
+        后端名称列表
+    """
+    names = []
+    if etree is not None:
+        names.append(LxmlBackend.name)
+    if LexborHTMLParser is not None:
+        names.append(SelectolaxBackend.name)
+    names.append(BeautifulSoupBackend.name)
+    return names
+
+
+def get_backend(name: Optional[str] = 'auto') -> ParserBackend:
+    """
+    获取解析后端
+
+    Args:
+        name: 后端名称（lxml / selectolax / html.parser），'auto' 或 None 表示自动选择
+
+    Returns:
+        解析后端实例
+    """
+    available = available_backends()
+    if name in (None, 'auto'):
+        return BACKENDS[available[0]]()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的解析后端: {name}，可选: {', '.join(BACKENDS)}")
+    if name not in available:
+        print(f"解析后端 {name} 不可用（未安装依赖），使用 {BeautifulSoupBackend.name}")
+        return BeautifulSoupBackend()
+    return BACKENDS[name]()
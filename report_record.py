@@ -0,0 +1,34 @@
+"""
+日报记录模块
+定义采集、存储和输出共用的紧凑日报记录
+"""
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+
+@dataclass(slots=True)
+class Report:
+    """
+    单条日报
+
+    使用 __slots__ 避免每条记录携带 __dict__；原始 HTML 只在采集时显式要求才保存，
+    详情页正文只在采集时要求补充详情才有值
+    """
+
+    text: str
+    link: str = ''
+    raw_html: Optional[str] = None
+    content: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        """
+        转换为字典（不包含未采集的原始 HTML 和详情正文）
+
+        Returns:
+            日报信息字典
+        """
+        data = asdict(self)
+        for field in ('raw_html', 'content'):
+            if data[field] is None:
+                del data[field]
+        return data
@@ -0,0 +1,289 @@
+"""
+本地日报存储模块
+使用 SQLite 按月份保存已采集的日报，支持增量同步
+"""
+import hashlib
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from report_record import Report
+
+
+class ReportStore:
+    """基于 SQLite 的日报存储"""
+
+    REPORTS_TABLE = """
+        CREATE TABLE IF NOT EXISTS reports (
+            month TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            report_key TEXT NOT NULL,
+            text TEXT NOT NULL,
+            link TEXT NOT NULL DEFAULT '',
+            content TEXT,
+            PRIMARY KEY (month, position)
+        )
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS months (
+            month TEXT PRIMARY KEY,
+            synced_at REAL NOT NULL,
+            report_count INTEGER NOT NULL
+        );
+    """ + REPORTS_TABLE + ';'
+
+    # 按日报键查找（沿用详情正文、保存详情正文）；链接或内容相同的日报可以有多条
+    INDEX = 'CREATE INDEX IF NOT EXISTS reports_by_key ON reports (month, report_key)'
+
+    @staticmethod
+    def _get_db_path() -> Path:
+        """
+        获取数据库文件路径
+
+        打包后使用用户主目录 ~/.yst_mcp/data/reports.db
+        开发时使用项目目录 ./data/reports.db
+
+        Returns:
+            数据库文件路径
+        """
+        if getattr(sys, 'frozen', False):
+            # 打包后：使用用户主目录
+            return Path.home() / '.yst_mcp' / 'data' / 'reports.db'
+        else:
+            # 开发时：使用项目目录
+            return Path(__file__).parent / 'data' / 'reports.db'
+
+    def __init__(self, db_path: str = None):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径（可选，默认使用自动检测的路径）
+        """
+        self.db_path = Path(db_path) if db_path else self._get_db_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            # WAL 模式允许读写并发，设置后持久保存在数据库文件中
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+            self._migrate(conn)
+            conn.execute(self.INDEX)
+
+    @classmethod
+    def _migrate(cls, conn: sqlite3.Connection):
+        """升级旧版本创建的数据库"""
+        columns = {row[1]: row[5] for row in conn.execute('PRAGMA table_info(reports)')}
+        if 'content' not in columns:
+            conn.execute('ALTER TABLE reports ADD COLUMN content TEXT')
+        if columns.get('report_key'):
+            # 旧版本以 (month, report_key) 为主键，链接或内容相同的日报互相覆盖：改为按位置保存
+            if not conn.in_transaction:
+                conn.execute('BEGIN')  # 重建表在一个事务中完成
+            conn.execute('ALTER TABLE reports RENAME TO reports_old')
+            conn.execute(cls.REPORTS_TABLE)
+            conn.execute(
+                'INSERT INTO reports (month, position, report_key, text, link, content) '
+                'SELECT month, position, report_key, text, link, content FROM reports_old'
+            )
+            conn.execute('DROP TABLE reports_old')
+            # 丢失过日报的月份（条数与记录的不一致）标记为未同步，下次采集时重新获取
+            conn.execute(
+                'DELETE FROM months WHERE report_count != '
+                '(SELECT COUNT(*) FROM reports WHERE reports.month = months.month)'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        打开数据库连接，退出时提交事务并关闭
+
+        每次操作使用独立连接，可以安全地在线程池和多个进程中使用
+        """
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def report_key(report: Report) -> str:
+        """
+        计算日报的键：优先使用链接，没有链接时使用内容哈希
+
+        用于在重新同步时沿用已保存的详情正文；同一月份中链接或内容相同的日报键也相同，
+        按位置分别保存
+
+        Args:
+            report: 日报记录
+
+        Returns:
+            唯一键
+        """
+        if report.link:
+            return report.link
+        return 'sha1:' + hashlib.sha1(report.text.encode('utf-8')).hexdigest()
+
+    def save_month(self, month: str, reports: List[Report]):
+        """
+        保存一个月份的日报（替换该月份已有数据）
+
+        Args:
+            month: 月份，格式 YYYY-MM
+            reports: 日报列表
+        """
+        self.save_months({month: reports})
+
+    def save_months(self, all_reports: Dict[str, List[Report]]):
+        """
+        在一个事务中保存多个月份的日报
+
+        重新同步的日报没有详情正文时，沿用本地库中已保存的正文
+
+        Args:
+            all_reports: 月份 -> 日报列表
+        """
+        now = time.time()
+        with self._connect() as conn:
+            for month, reports in all_reports.items():
+                saved_contents = dict(conn.execute(
+                    'SELECT report_key, content FROM reports WHERE month = ? AND content IS NOT NULL',
+                    (month,)
+                ).fetchall())
+                rows = []
+                for position, report in enumerate(reports):
+                    key = self.report_key(report)
+                    content = report.content if report.content is not None else saved_contents.get(key)
+                    rows.append((month, key, position, report.text, report.link, content))
+
+                conn.execute('DELETE FROM reports WHERE month = ?', (month,))
+                conn.executemany(
+                    'INSERT INTO reports (month, report_key, position, text, link, content) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                conn.execute(
+                    'INSERT OR REPLACE INTO months (month, synced_at, report_count) VALUES (?, ?, ?)',
+                    (month, now, len(reports))
+                )
+
+    def save_contents(self, month: str, reports: List[Report]):
+        """
+        保存日报的详情正文（只更新已存在的日报；链接相同的日报是同一个详情页，一并更新）
+
+        Args:
+            month: 月份，格式 YYYY-MM
+            reports: 已补充详情正文的日报列表
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                'UPDATE reports SET content = ? WHERE month = ? AND report_key = ?',
+                [
+                    (report.content, month, self.report_key(report))
+                    for report in reports if report.content is not None
+                ]
+            )
+
+    def load_month(self, month: str) -> List[Report]:
+        """
+        读取一个月份的日报
+
+        Args:
+            month: 月份，格式 YYYY-MM
+
+        Returns:
+            日报列表（未同步过返回空列表）
+        """
+        return self.load_months([month])[month]
+
+    def load_months(self, months: List[str]) -> Dict[str, List[Report]]:
+        """
+        读取多个月份的日报
+
+        Args:
+            months: 月份列表
+
+        Returns:
+            月份 -> 日报列表（按传入顺序，未同步的月份为空列表）
+        """
+        all_reports = {month: [] for month in months}
+        if not months:
+            return all_reports
+
+        placeholders = ','.join('?' * len(months))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT month, text, link, content FROM reports WHERE month IN ({placeholders}) '
+                'ORDER BY month, position',
+                months
+            ).fetchall()
+
+        for month, text, link, content in rows:
+            all_reports[month].append(Report(text=text, link=link, content=content))
+        return all_reports
+
+    def missing_content_count(self, months: List[str]) -> int:
+        """
+        统计有详情链接但尚未保存详情正文的日报数
+
+        Args:
+            months: 月份列表
+
+        Returns:
+            日报数
+        """
+        if not months:
+            return 0
+
+        placeholders = ','.join('?' * len(months))
+        with self._connect() as conn:
+            (count,) = conn.execute(
+                f"SELECT COUNT(*) FROM reports WHERE month IN ({placeholders}) "
+                "AND link != '' AND content IS NULL",
+                months
+            ).fetchone()
+        return count
+
+    def synced_at(self, months: List[str]) -> Dict[str, Optional[float]]:
+        """
+        查询月份的最近同步时间
+
+        Args:
+            months: 月份列表
+
+        Returns:
+            月份 -> 同步时间戳（未同步过为 None）
+        """
+        result = {month: None for month in months}
+        if not months:
+            return result
+
+        placeholders = ','.join('?' * len(months))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT month, synced_at FROM months WHERE month IN ({placeholders})',
+                months
+            ).fetchall()
+
+        result.update(dict(rows))
+        return result
+
+    def clear(self) -> bool:
+        """
+        清空存储
+
+        Returns:
+            是否清除成功
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM reports')
+                conn.execute('DELETE FROM months')
+            return True
+        except Exception as e:
+            print(f"清除日报存储失败: {e}")
+            return False
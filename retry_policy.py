@@ -0,0 +1,185 @@
+"""
+重试与熔断模块
+请求失败时按带随机抖动的指数退避重试；连续失败过多时熔断，暂停访问服务器
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# 可以重试的 HTTP 状态码（限流和服务端临时错误）
+RETRYABLE_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+
+class RetryPolicy:
+    """带随机抖动的指数退避重试策略"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts: 最多尝试次数（包括第一次请求）
+            base_delay: 第一次重试前的基准等待时间（秒）
+            max_delay: 单次等待时间上限（秒）
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """
+        计算第 attempt 次失败后的等待时间
+
+        在 [0, base_delay * 2^(attempt-1)] 中随机取值（full jitter），
+        避免并发请求在同一时刻集中重试
+
+        Args:
+            attempt: 已失败的次数（从 1 开始）
+
+        Returns:
+            等待秒数
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被拒绝"""
+
+
+class CircuitBreaker:
+    """
+    熔断器（线程安全）
+
+    连续失败 failure_threshold 次后打开，reset_timeout 秒内拒绝所有请求；
+    之后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间（秒）
+            clock: 单调时钟（秒，测试时可替换）
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._calls = 0
+        self._trial: Optional[int] = None  # 半开状态下正在试探的请求令牌
+        self._open_count = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> int:
+        """
+        请求前检查，熔断期间抛出 CircuitOpenError
+
+        Returns:
+            本次请求的令牌（请求被取消时传给 record_cancelled）
+
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下已有试探请求
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - self._clock()
+                if remaining > 0:
+                    raise CircuitOpenError(f"服务器连续请求失败，已暂停访问，{max(1, round(remaining))} 秒后重试")
+                self._state = self.HALF_OPEN
+
+            self._calls += 1
+            if self._state == self.HALF_OPEN:
+                if self._trial is not None:
+                    raise CircuitOpenError("服务器连续请求失败，正在试探服务器是否恢复")
+                self._trial = self._calls
+            return self._calls
+
+    def record_success(self):
+        """记录一次成功的请求"""
+        with self._lock:
+            self._failures = 0
+            self._trial = None
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        """记录一次失败的请求"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._open_count += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._trial = None
+
+    def record_cancelled(self, token: int):
+        """
+        请求被取消：不计为成功或失败
+
+        只有正在试探的请求被取消时才结束试探（下一个请求可以继续试探）；
+        熔断前发出、之后才被取消的请求不影响试探
+
+        Args:
+            token: before_call 返回的令牌
+        """
+        with self._lock:
+            if self._trial == token:
+                self._trial = None
+
+    def record(self, status_code: Optional[int]):
+        """
+        按响应状态记录结果
+
+        Args:
+            status_code: 响应状态码（请求异常时为 None）
+        """
+        if status_code is None or status_code in RETRYABLE_STATUS_CODES:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict:
+        """
+        返回熔断器状态
+
+        Returns:
+            {'state', 'consecutive_failures', 'open_count'}
+        """
+        with self._lock:
+            state = self._state
+            if state == self.OPEN and self._clock() >= self._opened_at + self.reset_timeout:
+                state = self.HALF_OPEN
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'open_count': self._open_count,
+            }
+
+
+_breaker: Optional[CircuitBreaker] = None
+_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    获取进程内共享的熔断器（首次调用时创建）
+
+    Returns:
+        熔断器实例
+    """
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
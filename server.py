@@ -7,12 +7,15 @@ import sys
 import platform
 import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 
-# 导入 Playwright 浏览器路径 hook（打包时需要）
+# 导入 Playwright 浏览器路径 hook（打包时需要；导入时只设置浏览器目录，下载在服务启动后于后台进行）
 try:
     import playwright_hook
 except ImportError:
-    pass  # 开发模式下可能不存在
+    playwright_hook = None  # 开发模式下可能不存在
 
 # Windows 兼容性：强制使用 UTF-8 编码
 if platform.system() == 'Windows':
@@ -35,16 +38,77 @@ if platform.system() == 'Windows':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 from fastmcp import FastMCP
-from report_collector import ReportCollector, safe_text
-from cookie_manager import CookieManager
-from browser_login import BrowserLogin
+# 启动时只导入轻量模块，MCP 握手不必等待 Playwright / requests / BeautifulSoup 加载；
+# 采集器在第一次 get_collector 时导入，浏览器登录模块在需要打开浏览器时导入
+from text_utils import safe_text
+from cookie_manager import CookieStatus
 from logger import logger
+from io_executor import run_blocking, shutdown as shutdown_io_executor
+from rate_limiter import get_rate_limiter
+from retry_policy import get_circuit_breaker
+from metrics import get_metrics as get_stage_metrics
+from collector_registry import (
+    get_collector,
+    get_cookie_manager,
+    invalidate as invalidate_collectors,
+    invalidate_async as invalidate_collectors_async,
+    is_async_collector,
+)
+from login_refresher import get_login_refresher
+from browser_pool import get_browser_pool, close_browser_pool
+
+@asynccontextmanager
+async def _lifespan(server):
+    """服务退出时停止后台续期任务，关闭常驻浏览器和采集器的连接池"""
+    try:
+        yield
+    finally:
+        get_login_refresher().stop()
+        await close_browser_pool()
+        await invalidate_collectors_async()
+
 
 # 创建 MCP 服务
-mcp = FastMCP("yst-mcp")
+mcp = FastMCP("yst-mcp", lifespan=_lifespan)
+
+
+async def _check_login(use_cache: bool = True):
+    """
+    检查登录状态，会话失效时先用持久化浏览器会话无头续期 Cookie（不弹出窗口）
+
+    同时启动后台续期任务，在 Cookie 过期前提前续期
+
+    Args:
+        use_cache: 使用哪一个共享采集器（见 get_collector）
+
+    Returns:
+        (采集器, 是否已登录)
+    """
+    refresher = get_login_refresher()
+    refresher.ensure_started()
+
+    # 复用进程内共享的采集器（已建立的连接和已加载的 Cookie），Cookie 文件变化时自动重新加载
+    collector = await run_blocking(get_collector, use_cache)
+    if await _login_status(collector):
+        return collector, True
+
+    if await refresher.refresh():
+        # 续期后 Cookie 文件已更新，重新获取时会加载新 Cookie
+        collector = await run_blocking(get_collector, use_cache)
+        return collector, await _login_status(collector)
+    return collector, False
+
+
+async def _login_status(collector) -> bool:
+    """检查登录状态：异步采集器直接 await，同步采集器的网络请求放到线程池，避免阻塞事件循环"""
+    if is_async_collector(collector):
+        return await collector.check_login_status()
+    return await run_blocking(collector.check_login_status)
 
 @mcp.tool()
-async def collect_reports(start_month: str, end_month: str, output_file: str = None, auto_login: bool = False) -> str:
+async def collect_reports(start_month: str, end_month: str, output_file: str = None, auto_login: bool = False,
+                          max_workers: int = 4, use_cache: bool = True, force_refresh: bool = False,
+                          include_details: bool = False) -> str:
     """
     采集指定月份范围的日报数据
 
@@ -62,39 +126,40 @@ async def collect_reports(start_month: str, end_month: str, output_file: str = N
         end_month: 结束月份，格式 YYYY-MM (例如: 2025-09)
         output_file: 输出文件路径（可选，默认为 ~/.yst_mcp/output/new.md 或项目目录下 data/new.md）
         auto_login: 未登录时是否自动启动浏览器登录（默认 False，不推荐设为 True）
+        max_workers: 并发采集的月份数（默认 4，设为 1 则逐月串行采集）
+        use_cache: 是否使用本地页面缓存（默认 True；已结束超过 7 天的月份直接读缓存，其余月份按 ETag 重新验证）
+        force_refresh: 是否忽略本地日报库，重新同步所有月份（默认 False，只同步缺失或未结束的月份）
+        include_details: 是否获取每条日报的详情页正文并写入输出（默认 False；按 max_workers 并发请求，已获取或已缓存的详情页不会重复请求）
 
     Returns:
         采集结果描述
     """
-    collector = ReportCollector()
-    cookie_manager = CookieManager()
-
     try:
-        # 检查是否有保存的 Cookie
-        if cookie_manager.has_cookies():
-            collector.load_saved_cookies()
-
-        # 检查登录状态
-        if not collector.check_login_status():
+        # 未登录时先尝试无头续期，仍失败才需要弹出浏览器窗口
+        collector, logged_in = await _check_login(use_cache)
+        if not logged_in:
             if auto_login:
                 print(safe_text("❌ 未登录，正在启动浏览器..."))
                 # 启动浏览器登录
-                browser_login = BrowserLogin()
+                from browser_login import BrowserLogin
+                browser_login = BrowserLogin(pool=get_browser_pool())
                 if await browser_login.launch_persistent_browser():
-                    # 重新加载 Cookie
-                    collector.load_saved_cookies()
+                    # 登录后 Cookie 文件已更新，重新获取时会加载新 Cookie
+                    collector = await run_blocking(get_collector, use_cache)
                 else:
                     return safe_text("❌ 登录失败或超时，请重试")
             else:
                 return safe_text(
-                    "❌ 未登录或 Cookie 已过期\n\n"
+                    "❌ 未登录或 Cookie 已过期，且无法通过浏览器会话自动续期\n\n"
                     "请使用以下方法之一：\n"
                     "1. 调用 browser_login 工具启动浏览器登录\n"
                     "2. 将 auto_login 参数设置为 true，自动打开浏览器"
                 )
 
         # 执行采集
-        result = await collector.collect(start_month, end_month, output_file)
+        with get_stage_metrics().span('collect.total'):
+            result = await collector.collect(start_month, end_month, output_file, max_workers, force_refresh,
+                                             include_details)
         return result
     except Exception as e:
         return f"采集失败: {str(e)}"
@@ -131,7 +196,9 @@ async def browser_login(use_persistent: bool = True, timeout: int = 300) -> str:
 
         print(safe_text("🌐 正在启动浏览器登录..."))
 
-        login = BrowserLogin()
+        # 复用常驻的 Playwright 驱动，避免每次冷启动
+        from browser_login import BrowserLogin
+        login = BrowserLogin(pool=get_browser_pool())
 
         if use_persistent:
             logger.info("使用持久化浏览器上下文")
@@ -154,6 +221,7 @@ async def browser_login(use_persistent: bool = True, timeout: int = 300) -> str:
                 "1. 浏览器是否正常弹出\n"
                 "2. 是否完成了 Google 登录\n"
                 "3. 查看日志文件获取详细信息"
+                + _browser_install_note()
             )
     except Exception as e:
         logger.exception("browser_login 执行出错:")
@@ -177,13 +245,13 @@ async def save_cookies_from_browser(cookie_string: str) -> str:
     Returns:
         保存结果
     """
-    collector = ReportCollector()
-
     try:
+        collector = await run_blocking(get_collector)
+
         # 加载 Cookie
         if collector.load_cookies_from_string(cookie_string):
             # 保存到文件
-            if collector.save_current_cookies():
+            if await run_blocking(collector.save_current_cookies):
                 return safe_text("✓ Cookie 保存成功！现在可以使用 collect_reports 工具采集数据了")
             else:
                 return safe_text("❌ Cookie 保存失败")
@@ -193,6 +261,19 @@ async def save_cookies_from_browser(cookie_string: str) -> str:
         return safe_text(f"保存失败: {str(e)}")
 
 
+def _cookie_expiry_note(status: CookieStatus) -> str:
+    """登录凭据的有效期说明，即将过期时提醒重新登录"""
+    if status.expires_at is None or not status.is_valid:
+        return ""
+
+    expires_text = datetime.fromtimestamp(status.expires_at).strftime('%Y-%m-%d %H:%M')
+    if status.state == CookieStatus.EXPIRING:
+        hours = max(1, int((status.expires_at - time.time()) // 3600))
+        return (f"\n\n⚠ 登录将在约 {hours} 小时后（{expires_text}）过期，后台会自动尝试续期；"
+                "如果浏览器会话也已失效，请调用 browser_login 重新登录")
+    return f"（有效期至 {expires_text}）"
+
+
 @mcp.tool()
 async def check_login_status() -> str:
     """
@@ -205,28 +286,183 @@ async def check_login_status() -> str:
 
     Returns:
         登录状态信息：
-        - "✓ 已登录，Cookie 有效" -> 可以直接采集数据
+        - "✓ 已登录，Cookie 有效" -> 可以直接采集数据（即将过期时附带提醒）
         - "❌ Cookie 已过期" -> 需要调用 browser_login 重新登录
         - "❌ 未找到保存的 Cookie" -> 需要调用 browser_login 首次登录
     """
-    collector = ReportCollector()
-
     try:
-        # 尝试加载已保存的 Cookie
-        if collector.cookie_manager.has_cookies():
-            collector.load_saved_cookies()
-
-            # 检查登录状态
-            if collector.check_login_status():
-                return safe_text("✓ 已登录，Cookie 有效")
-            else:
-                return safe_text("❌ Cookie 已过期，请重新登录并保存 Cookie")
+        # 登录凭据的过期时间已知时直接在本地判断，不访问服务器；失效时先尝试无头续期
+        collector, logged_in = await _check_login()
+        if logged_in:
+            return safe_text("✓ 已登录，Cookie 有效" + _cookie_expiry_note(collector.cookie_status()))
+        elif get_cookie_manager().has_cookies():
+            return safe_text("❌ Cookie 已过期，且无法通过浏览器会话自动续期，请调用 browser_login 重新登录")
         else:
             return safe_text("❌ 未找到保存的 Cookie，请先使用 save_cookies_from_browser 工具保存登录信息")
     except Exception as e:
         return safe_text(f"检查失败: {str(e)}")
 
 
+@mcp.tool()
+async def get_rate_limit_status() -> str:
+    """
+    查看访问 KPI 服务器的限流和熔断状态
+
+    所有采集请求共用一个自适应限流器：响应正常时逐步提高速率和并发，
+    遇到 429 / 5xx / 超时或延迟突增时减半。连续失败过多时熔断，暂停访问服务器。
+    可据此判断采集速度的瓶颈。
+
+    Returns:
+        当前速率、并发上限、观测到的延迟和熔断状态
+    """
+    stats = get_rate_limiter().stats()
+    breaker = get_circuit_breaker().stats()
+    breaker_states = {'closed': '正常', 'open': '已熔断，暂停访问服务器', 'half_open': '试探服务器是否恢复'}
+
+    def ms(value):
+        return f"{value} ms" if value is not None else "暂无数据"
+
+    lines = [
+        "当前限流状态：",
+        f"- 速率上限：{stats['rate']} 请求/秒",
+        f"- 并发上限：{stats['concurrency_limit']}（进行中 {stats['in_flight']}）",
+        f"- 延迟：平均 {ms(stats['latency_avg_ms'])}，P50 {ms(stats['latency_p50_ms'])}，P95 {ms(stats['latency_p95_ms'])}",
+        f"- 请求数：{stats['requests']}（429: {stats['throttled']}，失败: {stats['errors']}，"
+        f"慢请求: {stats['slow']}，减速: {stats['backoffs']} 次）",
+    ]
+    if stats['paused_for']:
+        lines.append(f"- 服务端要求暂停：还需 {stats['paused_for']} 秒")
+    lines.append(
+        f"- 熔断器：{breaker_states[breaker['state']]}（连续失败 {breaker['consecutive_failures']} 次，"
+        f"累计熔断 {breaker['open_count']} 次）"
+    )
+    return "\n".join(lines)
+
+
+# 各阶段耗时统计的说明（按采集流程排序）
+_METRIC_LABELS = {
+    'collect.total': '一次 collect_reports 采集的总耗时',
+    'login.probe': '向服务器确认登录状态',
+    'ratelimit.wait': '等待限流器放行',
+    'http.request': 'HTTP 请求（到收到响应头）',
+    'month.fetch': '一个月份的获取 + 解析（含重试）',
+    'parse.list': '解析列表页（每个数据块）',
+    'detail.fetch': '一篇详情页的获取 + 解析（含重试）',
+    'parse.detail': '解析详情页',
+    'markdown.write': '写入一个月份的 Markdown',
+    'browser.launch': '启动浏览器',
+    'browser.login_wait': '等待用户在浏览器中登录',
+    'browser.refresh': '无头续期 Cookie',
+}
+
+
+@mcp.tool()
+async def get_metrics(reset: bool = False, dump_to_file: bool = False) -> str:
+    """
+    查看本次服务运行以来各阶段的耗时统计
+
+    统计登录检查、HTTP 请求、列表页解析、详情页获取、Markdown 写入以及浏览器启动/续期等阶段的
+    次数、出错次数、平均 / P50 / P95 / 最大耗时，用于定位采集慢在哪里、对比调整并发前后的效果。
+
+    Args:
+        reset: 查看后是否清空统计（默认 False）
+        dump_to_file: 是否同时将完整统计（含直方图分桶）写入 JSON 文件（默认 False）
+
+    Returns:
+        各阶段的耗时统计表
+    """
+    metrics = get_stage_metrics()
+    snapshot = metrics.snapshot()
+    dump_path = await run_blocking(metrics.dump) if dump_to_file else None
+    if reset:
+        metrics.reset()
+
+    def ms(value):
+        if value is None:
+            return "-"
+        return f"{value:.1f}" if value < 10 else f"{value:.0f}"
+
+    spans = snapshot['spans']
+    if not spans and not snapshot['counters']:
+        lines = [f"服务已运行 {snapshot['uptime_s']:.0f} 秒，暂无耗时统计（调用 collect_reports 后再查看）"]
+    else:
+        lines = [
+            f"服务运行 {snapshot['uptime_s']:.0f} 秒以来的耗时统计（单位：毫秒）：",
+            "",
+            "| 阶段 | 说明 | 次数 | 出错 | 平均 | P50 | P95 | 最大 | 合计 |",
+            "|---|---|---|---|---|---|---|---|---|",
+        ]
+        order = list(_METRIC_LABELS)
+        for name in sorted(spans, key=lambda n: (order.index(n) if n in order else len(order), n)):
+            stat = spans[name]
+            lines.append(
+                f"| {name} | {_METRIC_LABELS.get(name, '')} | {stat['count']} | {stat['errors']} | {ms(stat['avg_ms'])} "
+                f"| {ms(stat['p50_ms'])} | {ms(stat['p95_ms'])} | {ms(stat['max_ms'])} | {ms(stat['total_ms'])} |"
+            )
+        if snapshot['counters']:
+            lines.append("")
+            lines.append("计数：" + "，".join(f"{name} {count}" for name, count in snapshot['counters'].items()))
+    if dump_path is not None:
+        lines.append(f"\n完整统计已写入: {dump_path}")
+    if reset:
+        lines.append("统计已清空")
+    return safe_text("\n".join(lines))
+
+
+_INSTALL_STATES = {
+    'not_needed': '开发模式，使用 Playwright 默认位置的浏览器',
+    'pending': '尚未检查',
+    'installing': '正在后台下载',
+    'installed': '已安装',
+    'failed': '安装失败',
+}
+
+
+def _browser_install_note() -> str:
+    """浏览器尚未安装完成时的提示（打包版本首次运行时浏览器在后台下载）"""
+    if playwright_hook is None:
+        return ""
+    status = playwright_hook.get_install_status()
+    if status['state'] == 'installing':
+        return f"\n\n⏳ 浏览器仍在后台下载（{status['percent'] or 0}%），可调用 get_browser_install_status 查看进度"
+    if status['state'] == 'failed':
+        return f"\n\n⚠ 浏览器安装失败：{status['message']}\n可调用 get_browser_install_status(retry=true) 重试"
+    return ""
+
+
+@mcp.tool()
+async def get_browser_install_status(retry: bool = False) -> str:
+    """
+    查看登录用浏览器（Chromium）的安装进度
+
+    打包版本首次运行时，浏览器在服务启动后于后台下载，不影响其他工具的使用；
+    下载完成前 browser_login 可能无法启动浏览器（已安装系统 Chrome 时不受影响）。
+
+    Args:
+        retry: 安装失败时是否重新开始下载（默认 False）
+
+    Returns:
+        安装状态和下载进度
+    """
+    if playwright_hook is None:
+        return safe_text("✓ 未使用打包版本，浏览器由 Playwright 默认方式管理")
+
+    status = playwright_hook.get_install_status()
+    if retry and status['state'] in ('failed', 'pending'):
+        status = await run_blocking(playwright_hook.start_background_install)
+
+    lines = [f"浏览器安装状态：{_INSTALL_STATES.get(status['state'], status['state'])}"]
+    if status['state'] == 'installing':
+        lines.append(f"- 进度：{status['percent'] or 0}%")
+        if status['started_at']:
+            lines.append(f"- 已用时：{int(time.time() - status['started_at'])} 秒")
+    if status['message']:
+        lines.append(f"- {status['message']}")
+    if status['state'] == 'failed':
+        lines.append("可调用 get_browser_install_status(retry=true) 重试，或手动运行：playwright install chromium")
+    return safe_text("\n".join(lines))
+
+
 @mcp.tool()
 async def check_playwright_installation() -> str:
     """
@@ -260,7 +496,8 @@ async def check_playwright_installation() -> str:
         # 尝试检查浏览器安装
         try:
             # 运行 playwright install --dry-run 检查浏览器状态
-            result = subprocess.run(
+            result = await run_blocking(
+                subprocess.run,
                 [sys.executable, "-m", "playwright", "install", "--dry-run", "chromium"],
                 capture_output=True,
                 text=True,
@@ -306,10 +543,12 @@ async def clear_saved_cookies() -> str:
     Returns:
         清除结果
     """
-    manager = CookieManager()
+    manager = get_cookie_manager()
 
     try:
-        if manager.clear_cookies():
+        if await run_blocking(manager.clear_cookies):
+            # 丢弃已加载旧 Cookie 的共享会话
+            await invalidate_collectors_async()
             return safe_text("✓ Cookie 已清除")
         else:
             return safe_text("❌ 清除失败")
@@ -332,7 +571,14 @@ if __name__ == "__main__":
 
         logger.info("=" * 60)
 
+        # 打包版本首次运行时在后台下载浏览器，不阻塞 MCP 握手
+        if playwright_hook is not None:
+            playwright_hook.start_background_install()
+
         mcp.run()
     except Exception as e:
         logger.exception("MCP 服务器启动失败:")
         raise
+    finally:
+        invalidate_collectors()
+        shutdown_io_executor(wait=False)
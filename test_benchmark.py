@@ -0,0 +1,505 @@
+"""
+测试脚本 - 离线性能基准
+在本地模拟 KPI 服务器（kpi_stub_server.py）上测量月份获取、页面解析、端到端采集和 Markdown 生成的耗时，
+不需要网络和 Cookie，结果可以在不同提交之间对比
+
+直接运行：python test_benchmark.py [--months 12] [--reports 50] [--latency 0.02] [--error-rate 0.05] [--check]
+    每次运行的结果追加到 data/benchmarks.jsonl，并与上一次相同配置的结果对比，变慢超过阈值时标出
+    （--check 时以非零退出码结束，可用于 CI）
+    --cassette <录制目录>：解析和回放基准使用录制的真实月份页面（见 cassette.py），而不是合成页面
+pytest test_benchmark.py：用很小的配置运行全部基准，并检查模拟服务器上的采集结果正确（不写入结果文件）
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from async_collector import AsyncReportCollector, ChunkPipe, httpx
+from cassette import Cassette
+from cookie_manager import CookieManager
+from http_cache import HttpCache
+from io_executor import run_blocking
+from kpi_stub_server import LIST_PATH, StubKpiServer
+from rate_limiter import AdaptiveRateLimiter
+from report_collector import ReportCollector
+from report_parser import available_backends
+from retry_policy import CircuitBreaker, RetryPolicy
+
+SERVER_DIR = Path(__file__).parent
+
+# 基准结果文件（每行一次运行）
+RESULTS_FILE = SERVER_DIR / 'data' / 'benchmarks.jsonl'
+
+# 比上一次相同配置的结果慢多少（比例）视为性能回退
+REGRESSION_THRESHOLD = 0.2
+
+# 默认基准配置
+DEFAULT_CONFIG = {
+    'months': 12,             # 端到端采集的月份数
+    'reports_per_month': 50,  # 每个月份页面的日报条数
+    'summary_size': 200,      # 每条日报摘要的字符数
+    'latency': 0.02,          # 模拟服务器每个请求的延迟（秒）
+    'error_rate': 0.0,        # 模拟服务器返回 503 的概率
+    'max_workers': 4,         # 采集并发数
+    'repeat': 5,              # 每项基准重复次数（取中位数）
+    'cassette': None,         # 录制目录（可选，解析和回放基准使用其中的真实页面）
+}
+
+# pytest 使用的小配置
+QUICK_CONFIG = {**DEFAULT_CONFIG, 'months': 3, 'reports_per_month': 10, 'latency': 0.0, 'repeat': 1}
+
+
+def make_collector(stub: StubKpiServer, work_dir: str, cls=ReportCollector, **kwargs) -> ReportCollector:
+    """
+    创建指向模拟服务器的采集器
+
+    使用独立的限流器、熔断器和 Cookie 文件，不受进程内共享状态和真实 Cookie 的影响；
+    限流器速率放开到不会成为瓶颈，测量的是采集代码本身和模拟服务器的延迟
+
+    Args:
+        stub: 已启动的模拟服务器
+        work_dir: 临时目录（存放 Cookie 文件）
+        cls: 采集器类
+        **kwargs: 传给采集器的其他参数
+
+    Returns:
+        已装入会话 Cookie 的采集器
+    """
+    max_workers = kwargs.get('max_workers', ReportCollector.DEFAULT_MAX_WORKERS)
+    options = dict(
+        use_cache=False,
+        use_store=False,
+        rate_limiter=AdaptiveRateLimiter(rate=10000, max_rate=10000, burst=1000, concurrency=max_workers,
+                                         max_concurrency=max(16, max_workers)),
+        retry_policy=RetryPolicy(max_attempts=5, base_delay=0.01, max_delay=0.05),
+        circuit_breaker=CircuitBreaker(failure_threshold=1000),
+        cookie_manager=CookieManager(os.path.join(work_dir, 'cookies.json')),
+    )
+    options.update(kwargs)
+    collector = cls(**options)
+    stub.configure(collector)
+    stub.install_cookies(collector)
+    return collector
+
+
+def make_months(count: int, start_year: int = 2024) -> List[str]:
+    """从 start_year 年 1 月开始的 count 个月份"""
+    return [f"{start_year + i // 12}-{i % 12 + 1:02d}" for i in range(count)]
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict:
+    """
+    重复执行 func 并统计耗时
+
+    Args:
+        func: 被测函数
+        repeat: 重复次数
+
+    Returns:
+        {'median_ms', 'min_ms', 'runs', 'result'}（result 为最后一次的返回值）
+    """
+    timings = []
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'min_ms': round(min(timings) * 1000, 2),
+        'runs': len(timings),
+        'result': result,
+    }
+
+
+def cassette_months(cassette: Cassette) -> List[str]:
+    """录制目录中有月份列表页的月份"""
+    pattern = re.compile(rf"^GET {re.escape(LIST_PATH)}\?month=(\d{{4}}-\d{{2}})$")
+    return sorted(match.group(1) for match in map(pattern.match, cassette.recorded_requests()) if match)
+
+
+def month_pages(stub: StubKpiServer, config: Dict) -> List[bytes]:
+    """解析基准使用的月份页面：指定录制目录时使用录制的页面，否则使用合成页面"""
+    if config.get('cassette'):
+        cassette = Cassette(config['cassette'])
+        return [cassette.replay('GET', f"{stub.url}{LIST_PATH}?month={month}")[2] for month in cassette_months(cassette)]
+    return [stub.month_page(month) for month in make_months(config['months'])]
+
+
+def bench_parse(stub: StubKpiServer, work_dir: str, config: Dict) -> Dict[str, Dict]:
+    """各解析后端增量解析 N 个月份页面的吞吐量"""
+    pages = month_pages(stub, config)
+    total_bytes = sum(len(page) for page in pages)
+    total_reports = None
+    results = {}
+    for backend in available_backends():
+        collector = make_collector(stub, work_dir, parser=backend)
+        chunk_size = collector.CHUNK_SIZE
+
+        def parse():
+            return [
+                collector._parse_chunks(page[i:i + chunk_size] for i in range(0, len(page), chunk_size))
+                for page in pages
+            ]
+
+        stat = measure(parse, config['repeat'] * 2)
+        count = sum(len(reports) for reports in stat.pop('result'))
+        # 各后端解析出的条数一致
+        assert total_reports in (None, count), f"{backend} 解析出 {count} 条日报，其他后端为 {total_reports} 条"
+        total_reports = count
+        seconds = stat['median_ms'] / 1000 or 1e-9
+        stat['mb_per_s'] = round(total_bytes / seconds / 1e6, 2)
+        stat['reports_per_s'] = round(total_reports / seconds)
+        results[f"parse.{backend}"] = stat
+    return results
+
+
+def bench_fetch_month(stub: StubKpiServer, work_dir: str, config: Dict) -> Dict[str, Dict]:
+    """fetch_month_reports：逐个获取月份（不使用缓存），每个月份的耗时"""
+    collector = make_collector(stub, work_dir)
+    months = make_months(config['months'])
+
+    def fetch_all():
+        return [collector.fetch_month_reports(month) for month in months]
+
+    stat = measure(fetch_all, config['repeat'])
+    fetched = stat.pop('result')
+    assert all(len(reports) == stub.reports_per_month for reports in fetched), "部分月份获取失败"
+    stat['per_month_ms'] = round(stat['median_ms'] / len(months), 2)
+    return {'fetch_month_reports': stat}
+
+
+def bench_collect(stub: StubKpiServer, work_dir: str, config: Dict) -> Dict[str, Dict]:
+    """collect 端到端：同步采集器和异步采集器（已安装 httpx 时）采集 N 个月份并写出 Markdown"""
+    months = make_months(config['months'])
+    output_file = os.path.join(work_dir, 'collect.md')
+    expected = len(months) * stub.reports_per_month
+    results = {}
+
+    def run_sync():
+        collector = make_collector(stub, work_dir, max_workers=config['max_workers'])
+        # 不输出每个月份的进度
+        with redirect_stdout(io.StringIO()):
+            return asyncio.run(collector.collect(months[0], months[-1], output_file))
+
+    candidates = [('collect.sync', run_sync)]
+    if httpx is not None:
+        def run_async():
+            async def main():
+                async with make_collector(stub, work_dir, cls=AsyncReportCollector,
+                                          max_workers=config['max_workers']) as collector:
+                    return await collector.collect(months[0], months[-1], output_file)
+            with redirect_stdout(io.StringIO()):
+                return asyncio.run(main())
+
+        candidates.append(('collect.async', run_async))
+
+    for name, run in candidates:
+        stat = measure(run, config['repeat'])
+        result = stat.pop('result')
+        assert f"{expected} 条日报" in result and '失败' not in result, f"{name} 采集结果不完整: {result}"
+        stat['months'] = len(months)
+        results[name] = stat
+    return results
+
+
+def bench_markdown(stub: StubKpiServer, work_dir: str, config: Dict) -> Dict[str, Dict]:
+    """Markdown 生成：把 N 个月份的日报写入文件"""
+    collector = make_collector(stub, work_dir)
+    months = make_months(config['months'])
+    all_reports = {month: collector.parse_reports(stub.month_page(month).decode('utf-8')) for month in months}
+    output_file = os.path.join(work_dir, 'markdown.md')
+
+    stat = measure(lambda: collector._generate_markdown(all_reports, output_file), config['repeat'] * 2)
+    stat.pop('result')
+    size = os.path.getsize(output_file)
+    stat['mb_per_s'] = round(size / (stat['median_ms'] / 1000 or 1e-9) / 1e6, 2)
+    stat['bytes'] = size
+    return {'markdown.write': stat}
+
+
+def bench_replay(stub: StubKpiServer, work_dir: str, config: Dict) -> Dict[str, Dict]:
+    """
+    回放模式的 collect 端到端：不访问网络，只测量解析、合并和写出 Markdown
+
+    未指定录制目录时，先从模拟服务器录制登录检查和 N 个月份
+    """
+    cassette_dir = config.get('cassette')
+    if not cassette_dir:
+        cassette_dir = os.path.join(work_dir, 'cassette')
+        recorder = make_collector(stub, work_dir, cassette=Cassette(cassette_dir, Cassette.RECORD))
+        assert recorder.check_login_status(force=True)
+        recorder.fetch_months(make_months(config['months']))
+    months = cassette_months(Cassette(cassette_dir))
+    output_file = os.path.join(work_dir, 'replay.md')
+
+    def run():
+        collector = make_collector(stub, work_dir, max_workers=config['max_workers'],
+                                   cassette=Cassette(cassette_dir, Cassette.REPLAY))
+        with redirect_stdout(io.StringIO()):
+            return asyncio.run(collector.collect(months[0], months[-1], output_file))
+
+    stat = measure(run, config['repeat'])
+    result = stat.pop('result')
+    if not config.get('cassette'):
+        assert f"{len(months) * stub.reports_per_month} 条日报" in result, f"回放结果不完整: {result}"
+    stat['months'] = len(months)
+    return {'collect.replay': stat}
+
+
+BENCHMARKS = (bench_parse, bench_fetch_month, bench_collect, bench_replay, bench_markdown)
+
+
+def run_suite(config: Dict) -> Dict[str, Dict]:
+    """
+    启动模拟服务器并运行全部基准
+
+    Args:
+        config: 基准配置（见 DEFAULT_CONFIG）
+
+    Returns:
+        基准名称 -> 统计结果
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='yst-bench-') as work_dir, StubKpiServer(
+            reports_per_month=config['reports_per_month'], summary_size=config['summary_size'],
+            latency=config['latency'], error_rate=config['error_rate']) as stub:
+        for bench in BENCHMARKS:
+            results.update(bench(stub, work_dir, config))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    """当前提交的短哈希（不在 Git 仓库中时返回 None）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_previous(config: Dict, results_file: Path) -> Optional[Dict]:
+    """读取上一次相同配置（同一台机器、同一 Python 版本）的基准记录"""
+    if not results_file.exists():
+        return None
+    previous = None
+    with open(results_file, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if (record.get('config') == config and record.get('machine') == platform.node()
+                    and record.get('python') == platform.python_version()):
+                previous = record
+    return previous
+
+
+def compare(results: Dict[str, Dict], previous: Optional[Dict]) -> List[str]:
+    """
+    打印本次结果（与上一次对比），返回变慢超过阈值的基准名称
+
+    Args:
+        results: 本次结果
+        previous: 上一次相同配置的记录（可选）
+
+    Returns:
+        性能回退的基准名称列表
+    """
+    regressions = []
+    old_results = previous['results'] if previous else {}
+    print(f"{'基准':<24}{'中位数(ms)':>12}{'最快(ms)':>12}{'对比上次':>12}  其他")
+    for name, stat in results.items():
+        extra = ', '.join(f"{key}={value}" for key, value in stat.items() if key not in ('median_ms', 'min_ms', 'runs'))
+        change = ''
+        old = old_results.get(name)
+        if old and old.get('median_ms'):
+            ratio = stat['median_ms'] / old['median_ms'] - 1
+            change = f"{ratio:+.0%}"
+            if ratio > REGRESSION_THRESHOLD:
+                change += ' ⚠'
+                regressions.append(name)
+        print(f"{name:<24}{stat['median_ms']:>12.2f}{stat['min_ms']:>12.2f}{change:>12}  {extra}")
+    return regressions
+
+
+def save_record(config: Dict, results: Dict[str, Dict], results_file: Path) -> Dict:
+    """将本次结果追加到结果文件"""
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'parsers': available_backends(),
+        'config': config,
+        'results': results,
+    }
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+
+def test_stub_login_flow(tmp_path):
+    """未登录时重定向到登录页；通过登录接口取得 Cookie 后可以访问列表页"""
+    with StubKpiServer(reports_per_month=3) as stub:
+        collector = make_collector(stub, str(tmp_path))
+        collector.session.cookies.clear()
+        assert collector.check_login_status(force=True) is False
+
+        response = requests.post(collector.LOGIN_URL, data={'username': 'u', 'password': 'p'}, allow_redirects=False)
+        assert response.status_code == 302
+        collector.session.cookies.update(response.cookies)
+        assert collector.check_login_status(force=True) is True
+
+        stub.expire_sessions()
+        assert collector.fetch_months(['2024-01']) == {'2024-01': None}
+        assert collector._login_valid is False
+
+
+def test_fetch_month_reports_from_stub(tmp_path):
+    """各解析后端从模拟服务器获取的日报条目一致，304 时沿用缓存正文（同步和异步采集器）"""
+    with StubKpiServer(reports_per_month=5) as stub:
+        expected = None
+        for backend in available_backends():
+            collector = make_collector(stub, str(tmp_path), parser=backend)
+            reports = [(r.text, r.link) for r in collector.fetch_month_reports('2024-02')]
+            assert len(reports) == 5 and reports[0][1] == '/report/report-daily/view?id=2024020000'
+            expected = expected or reports
+            assert reports == expected, f"{backend} 解析结果不一致"
+
+        # 月份永远不视为已稳定，第二次请求带 If-None-Match 向服务器验证
+        cached = make_collector(stub, str(tmp_path), immutable_after_days=10 ** 6)
+        cached.http_cache = HttpCache(str(tmp_path / 'http_cache'))
+        assert len(cached.fetch_month_reports('2024-03')) == 5
+        assert len(cached.fetch_month_reports('2024-03')) == 5
+        assert stub.stats.get('not_modified') == 1
+
+        if httpx is not None:
+            # 异步采集器在线程池中解析并写入缓存，之后同样走 304
+            async def fetch_twice():
+                async with make_collector(stub, str(tmp_path), cls=AsyncReportCollector,
+                                          immutable_after_days=10 ** 6) as collector:
+                    collector.http_cache = HttpCache(str(tmp_path / 'async_http_cache'))
+                    return [len(await collector.fetch_month_reports('2024-04')) for _ in range(2)]
+
+            assert asyncio.run(fetch_twice()) == [5, 5]
+            assert stub.stats.get('not_modified') == 2
+
+
+def test_chunk_pipe_streams_to_parser():
+    """异步采集器边接收边解析：解析线程在接收结束前就开始处理，队列有界；解析出错时接收方停止"""
+    async def stream(chunks: int, fail_at: int = None):
+        pipe = ChunkPipe(maxsize=2)
+        state = {'sent': 0, 'seen': [], 'max_pending': 0}
+
+        def consume():
+            try:
+                for chunk in pipe:
+                    if len(state['seen']) == fail_at:
+                        raise ValueError("解析失败")
+                    time.sleep(0.005)
+                    state['seen'].append((chunk, state['sent']))
+            finally:
+                pipe.finish()
+
+        parsing = asyncio.ensure_future(run_blocking(consume))
+        for index in range(chunks):
+            if not await pipe.put(index):
+                break
+            state['sent'] += 1
+            state['max_pending'] = max(state['max_pending'], state['sent'] - len(state['seen']))
+        pipe.close()
+        try:
+            await parsing
+        except ValueError:
+            state['failed'] = True
+        return state
+
+    state = asyncio.run(stream(20))
+    assert [chunk for chunk, _ in state['seen']] == list(range(20))
+    assert state['seen'][0][1] < 20 and state['max_pending'] <= 3
+    failed = asyncio.run(stream(20, fail_at=3))
+    assert failed.get('failed') and failed['sent'] < 20
+
+
+def test_collect_survives_injected_errors(tmp_path):
+    """注入 503 时按重试策略重试，最终采集到全部月份"""
+    with StubKpiServer(reports_per_month=4, error_rate=0.3, seed=7) as stub:
+        collector = make_collector(stub, str(tmp_path))
+        output_file = str(tmp_path / 'out.md')
+        result = asyncio.run(collector.collect('2024-01', '2024-06', output_file))
+        assert stub.stats.get('error', 0) > 0
+        assert '24 条日报' in result and '失败' not in result, result
+        lines = Path(output_file).read_text(encoding='utf-8').splitlines()
+        assert sum(line.startswith('## ') for line in lines) == 6
+
+
+def test_benchmark_suite_runs():
+    """以很小的配置运行全部基准"""
+    results = run_suite(QUICK_CONFIG)
+    expected = {'fetch_month_reports', 'collect.sync', 'collect.replay', 'markdown.write'}
+    expected.update(f"parse.{backend}" for backend in available_backends())
+    if httpx is not None:
+        expected.add('collect.async')
+    assert set(results) == expected
+    assert all(stat['median_ms'] > 0 for stat in results.values())
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="离线性能基准（本地模拟 KPI 服务器）")
+    parser.add_argument('--months', type=int, default=DEFAULT_CONFIG['months'], help="端到端采集的月份数")
+    parser.add_argument('--reports', type=int, default=DEFAULT_CONFIG['reports_per_month'], help="每个月份的日报条数")
+    parser.add_argument('--summary-size', type=int, default=DEFAULT_CONFIG['summary_size'], help="每条日报摘要的字符数")
+    parser.add_argument('--latency', type=float, default=DEFAULT_CONFIG['latency'], help="每个请求的延迟（秒）")
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_CONFIG['error_rate'], help="返回 503 的概率")
+    parser.add_argument('--workers', type=int, default=DEFAULT_CONFIG['max_workers'], help="采集并发数")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_CONFIG['repeat'], help="每项基准重复次数")
+    parser.add_argument('--cassette', help="录制目录：解析和回放基准使用其中录制的真实页面")
+    parser.add_argument('--output', default=str(RESULTS_FILE), help="结果文件（JSON Lines，追加写入）")
+    parser.add_argument('--check', action='store_true', help="比上一次相同配置的结果变慢超过阈值时返回非零退出码")
+    args = parser.parse_args(argv)
+
+    config = {
+        'months': args.months,
+        'reports_per_month': args.reports,
+        'summary_size': args.summary_size,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'max_workers': args.workers,
+        'repeat': args.repeat,
+        'cassette': os.path.abspath(args.cassette) if args.cassette else None,
+    }
+    results_file = Path(args.output)
+    print(f"基准配置: {json.dumps(config, ensure_ascii=False)}")
+    print(f"解析后端: {', '.join(available_backends())}\n")
+
+    previous = load_previous(config, results_file)
+    results = run_suite(config)
+    regressions = compare(results, previous)
+    save_record(config, results, results_file)
+
+    print(f"\n结果已追加到 {results_file}")
+    if previous:
+        print(f"对比的上一次记录: {previous['timestamp']}（提交 {previous.get('commit') or '未知'}）")
+    if regressions:
+        print(f"⚠ 以下基准比上一次慢了 {REGRESSION_THRESHOLD:.0%} 以上: {', '.join(regressions)}")
+        return 1 if args.check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+测试脚本 - 验证 HTTP 录制回放
+从本地模拟 KPI 服务器（kpi_stub_server.py）录制采集过程，检查录制内容不含 Cookie、CSRF 令牌和身份信息，
+再在服务器关闭后回放，结果与录制时一致
+不需要网络和 Cookie，可直接运行：python test_cassette.py（或 pytest test_cassette.py）
+"""
+import asyncio
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from async_collector import AsyncReportCollector, httpx
+from cassette import Cassette, CassetteMissError
+from kpi_stub_server import StubKpiServer
+from test_benchmark import make_collector
+
+MONTHS = ['2024-01', '2024-02', '2024-03']
+
+
+def record(stub: StubKpiServer, cassette_dir: Path, work_dir: Path) -> dict:
+    """用录制模式采集 MONTHS（包括详情页），返回 月份 -> (text, link) 列表"""
+    collector = make_collector(stub, str(work_dir), cassette=Cassette(str(cassette_dir), Cassette.RECORD))
+    assert collector.check_login_status(force=True)
+    fetched = collector.fetch_months(MONTHS)
+    collector.enrich_reports(fetched[MONTHS[0]])
+    return {month: [(r.text, r.link) for r in reports] for month, reports in fetched.items()}
+
+
+def replay_collector(cassette_dir: Path, work_dir: Path, cls=None, **kwargs):
+    """回放模式的采集器（不需要服务器和 Cookie）"""
+    options = dict(cassette=Cassette(str(cassette_dir), Cassette.REPLAY), **kwargs)
+    if cls is not None:
+        options['cls'] = cls
+    with StubKpiServer() as unused:
+        # 地址指向一个已关闭的端口：回放时任何真实请求都会失败
+        collector = make_collector(unused, str(work_dir), **options)
+    collector.session.cookies.clear()
+    return collector
+
+
+def test_recording_is_scrubbed(tmp_path):
+    """录制目录中不含会话 Cookie、CSRF 令牌、用户姓名和邮箱，也不保存 Set-Cookie"""
+    with StubKpiServer(reports_per_month=4) as stub:
+        record(stub, tmp_path / 'cassette', tmp_path)
+        secrets = [stub.session_id, stub.csrf_token, stub.USER_NAME, stub.USER_EMAIL, f"stub-{stub.seed}"]
+
+    files = list((tmp_path / 'cassette').iterdir())
+    assert any(f.suffix == '.html' for f in files) and any(f.suffix == '.json' for f in files)
+    for path in files:
+        content = path.read_text(encoding='utf-8')
+        for secret in secrets:
+            assert secret not in content, f"{path.name} 中包含未清除的敏感信息: {secret}"
+        assert 'Set-Cookie' not in content
+    assert not any(f.name.endswith('.tmp') for f in files)
+
+
+def test_scrub_keeps_issue_numbers(tmp_path):
+    """正文中半角的 “(#12)” 编号不会被当作姓名：日期和录制键中的数字保持不变，回放仍能找到该月份"""
+    cassette = Cassette(str(tmp_path / 'cassette'), Cassette.RECORD)
+    text = cassette.scrub_text('修复 (#12)，2025-12-01 上线（#郑潇）')
+    assert text == '修复 (#12)，2025-12-01 上线（#用户）'
+    assert cassette.identities == {'郑潇'}
+
+    url = 'http://example.invalid/report/report-daily/my-list?month=2025-12'
+    cassette.record('GET', url, 200, {'Content-Type': 'text/html'}, '<p>见 (#12)</p>'.encode('utf-8'))
+    replaying = Cassette(str(tmp_path / 'cassette'))
+    assert replaying.recorded_requests() == ['GET /report/report-daily/my-list?month=2025-12']
+    assert replaying.replay('GET', url)[2].decode('utf-8') == '<p>见 (#12)</p>'
+
+
+def test_replay_matches_recording(tmp_path):
+    """服务器关闭后回放，解析结果与录制时一致（署名替换为占位符）"""
+    with StubKpiServer(reports_per_month=4) as stub:
+        recorded = record(stub, tmp_path / 'cassette', tmp_path)
+
+    collector = replay_collector(tmp_path / 'cassette', tmp_path)
+    assert collector.check_login_status() is True
+    replayed = {month: [(r.text, r.link) for r in reports] for month, reports in collector.fetch_months(MONTHS).items()}
+    expected = {month: [(text.replace(StubKpiServer.USER_NAME, '用户'), link) for text, link in reports]
+                for month, reports in recorded.items()}
+    assert replayed == expected
+    assert collector.fetch_report_detail(recorded[MONTHS[0]][0][1]).startswith('编号')
+
+    # 没有录制过的月份直接失败，不会重试或访问网络
+    assert collector.fetch_months(['2030-01']) == {'2030-01': None}
+
+
+def test_replay_reproduces_error_sequence(tmp_path):
+    """录制时先 503 后 200 的请求，回放时按同样的顺序返回，采集器照常重试成功"""
+    with StubKpiServer(reports_per_month=2, error_rate=0.5, seed=3) as stub:
+        record(stub, tmp_path / 'cassette', tmp_path)
+        assert stub.stats.get('error', 0) > 0
+
+    cassette = Cassette(str(tmp_path / 'cassette'))
+    statuses = [
+        [response['status'] for response in entry['responses']]
+        for entry in (cassette._load_entries()[key] for key in cassette.recorded_requests())
+    ]
+    assert any(503 in sequence and sequence[-1] == 200 for sequence in statuses)
+
+    collector = replay_collector(tmp_path / 'cassette', tmp_path)
+    assert all(len(reports) == 2 for reports in collector.fetch_months(MONTHS).values())
+
+
+def test_replay_fallbacks(tmp_path):
+    """HEAD 没有录制时使用 GET 的响应头；If-None-Match 与录制的 ETag 相同时返回 304；未录制时抛出异常"""
+    with StubKpiServer(reports_per_month=1) as stub:
+        collector = make_collector(stub, str(tmp_path), cassette=Cassette(str(tmp_path / 'cassette'), Cassette.RECORD))
+        collector.fetch_month_reports('2024-05')
+
+    cassette = Cassette(str(tmp_path / 'cassette'))
+    url = 'http://example.invalid/report/report-daily/my-list?month=2024-05'
+    status, headers, body = cassette.replay('HEAD', url)
+    assert status == 200 and body == b'' and headers['ETag']
+    assert cassette.replay('GET', url, {'If-None-Match': headers['ETag']})[0] == 304
+    try:
+        cassette.replay('GET', url.replace('05', '06'))
+        raise AssertionError("未录制的请求应抛出 CassetteMissError")
+    except CassetteMissError:
+        pass
+
+
+def test_rerecording_replaces_old_responses(tmp_path):
+    """重新录制同一个请求时覆盖上次的录制，而不是追加"""
+    for _ in range(2):
+        with StubKpiServer(reports_per_month=1) as stub:
+            collector = make_collector(stub, str(tmp_path),
+                                       cassette=Cassette(str(tmp_path / 'cassette'), Cassette.RECORD))
+            collector.fetch_month_reports('2024-05')
+    cassette = Cassette(str(tmp_path / 'cassette'))
+    assert [len(cassette._load_entries()[key]['responses']) for key in cassette.recorded_requests()] == [1]
+    assert len(list((tmp_path / 'cassette').glob('*.html'))) == 1
+
+
+def test_async_collector_replay(tmp_path):
+    """异步采集器同样可以录制和回放"""
+    if httpx is None:
+        return
+
+    async def collect(collector):
+        async with collector:
+            return {month: [(r.text, r.link) for r in reports]
+                    for month, reports in (await collector.fetch_months(MONTHS)).items()}
+
+    with StubKpiServer(reports_per_month=3) as stub:
+        recorder = make_collector(stub, str(tmp_path), cls=AsyncReportCollector,
+                                  cassette=Cassette(str(tmp_path / 'cassette'), Cassette.RECORD))
+        recorded = asyncio.run(collect(recorder))
+
+    replayed = asyncio.run(collect(replay_collector(tmp_path / 'cassette', tmp_path, cls=AsyncReportCollector)))
+    assert replayed == {month: [(text.replace(StubKpiServer.USER_NAME, '用户'), link) for text, link in reports]
+                        for month, reports in recorded.items()}
+
+
+if __name__ == "__main__":
+    for test in (test_recording_is_scrubbed, test_scrub_keeps_issue_numbers, test_replay_matches_recording,
+                 test_replay_reproduces_error_sequence, test_replay_fallbacks, test_rerecording_replaces_old_responses,
+                 test_async_collector_replay):
+        with tempfile.TemporaryDirectory(prefix='yst-cassette-') as work_dir, redirect_stdout(io.StringIO()):
+            test(Path(work_dir))
+        print(f"✓ {test.__doc__.splitlines()[0]}")
@@ -54,9 +54,9 @@ async def test_fetch_one_month():
     if reports:
         print("\n前 3 条日报预览：")
         for i, report in enumerate(reports[:3], 1):
-            print(f"\n{i}. {report.get('text', '无标题')[:100]}")
-            if report.get('link'):
-                print(f"   链接: {report['link']}")
+            print(f"\n{i}. {report.text[:100]}")
+            if report.link:
+                print(f"   链接: {report.link}")
         return True
     else:
         print("未采集到数据（可能是该月份没有日报，或页面结构需要调整）")
@@ -0,0 +1,66 @@
+"""
+测试脚本 - 验证根据本地 Cookie 判断登录状态（未登录、无法判断、已过期、即将过期、有效）
+使用固定的当前时间，不需要网络和浏览器，可直接运行：python test_cookie_manager.py（或 pytest test_cookie_manager.py）
+"""
+from cookie_manager import CookieManager, CookieStatus
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+IDENTITY = CookieManager.IDENTITY_COOKIE_NAME
+
+
+def cookie(name: str, expires=None, **extra) -> dict:
+    """构造保存格式的 Cookie（expires=None 表示会话 Cookie）"""
+    saved = {'name': name, 'value': 'x', 'domain': 'example.com', 'path': '/', 'expires': expires}
+    saved.update(extra)
+    return saved
+
+
+def legacy_cookie(name: str) -> dict:
+    """旧版本保存的 Cookie（没有 expires 字段）"""
+    return {'name': name, 'value': 'x', 'domain': 'example.com', 'path': '/'}
+
+
+# (说明, Cookie 列表, 期望状态, 期望过期时间)
+CASES = [
+    ("没有 Cookie", [], CookieStatus.MISSING, None),
+    ("只有会话 Cookie", [cookie('PHPSESSID')], CookieStatus.UNKNOWN, None),
+    ("没有登录凭据", [cookie('other', NOW + 48 * HOUR)], CookieStatus.UNKNOWN, None),
+    ("旧版本文件缺少过期时间", [legacy_cookie(IDENTITY), cookie('PHPSESSID')], CookieStatus.UNKNOWN, None),
+    ("部分凭据缺少过期时间", [cookie(IDENTITY, NOW + 48 * HOUR), legacy_cookie('PHPSESSID')],
+     CookieStatus.UNKNOWN, None),
+    ("身份凭据已过期", [cookie(IDENTITY, NOW - HOUR)], CookieStatus.EXPIRED, NOW - HOUR),
+    ("恰好在当前时间过期", [cookie(IDENTITY, NOW)], CookieStatus.EXPIRED, NOW),
+    ("身份凭据已过期但有会话 Cookie", [cookie(IDENTITY, NOW - HOUR), cookie('PHPSESSID')],
+     CookieStatus.UNKNOWN, NOW - HOUR),
+    ("一小时后过期", [cookie(IDENTITY, NOW + HOUR), cookie('PHPSESSID')], CookieStatus.EXPIRING, NOW + HOUR),
+    ("差一秒满提示阈值", [cookie(IDENTITY, NOW + CookieManager.EXPIRY_WARNING - 1)],
+     CookieStatus.EXPIRING, NOW + CookieManager.EXPIRY_WARNING - 1),
+    ("恰好到提示阈值", [cookie(IDENTITY, NOW + CookieManager.EXPIRY_WARNING)],
+     CookieStatus.VALID, NOW + CookieManager.EXPIRY_WARNING),
+    ("两天后过期", [cookie(IDENTITY, NOW + 48 * HOUR), cookie('PHPSESSID')], CookieStatus.VALID, NOW + 48 * HOUR),
+    ("取最晚的过期时间", [cookie(IDENTITY, NOW - HOUR), cookie('PHPSESSID', NOW + 48 * HOUR)],
+     CookieStatus.VALID, NOW + 48 * HOUR),
+    ("忽略其他 Cookie 的过期时间", [cookie(IDENTITY, NOW - HOUR), cookie('other', NOW + 48 * HOUR)],
+     CookieStatus.EXPIRED, NOW - HOUR),
+]
+
+
+def test_evaluate_cookies_table():
+    """按过期时间判断登录状态：未登录、无法判断、已过期、即将过期、有效"""
+    for description, cookies, state, expires_at in CASES:
+        status = CookieManager.evaluate_cookies(cookies, now=NOW)
+        assert status == CookieStatus(state, expires_at), f"{description}: {status}"
+        assert status.is_valid == (state in (CookieStatus.VALID, CookieStatus.EXPIRING)), description
+
+
+def test_evaluate_cookies_defaults_to_current_time():
+    """不传 now 时使用当前时间"""
+    assert CookieManager.evaluate_cookies([cookie(IDENTITY, 1.0)]).state == CookieStatus.EXPIRED
+    assert CookieManager.evaluate_cookies([cookie(IDENTITY, 4_000_000_000.0)]).state == CookieStatus.VALID
+
+
+if __name__ == "__main__":
+    for test in (test_evaluate_cookies_table, test_evaluate_cookies_defaults_to_current_time):
+        test()
+        print(f"✓ {test.__doc__.splitlines()[0]}")
@@ -0,0 +1,117 @@
+"""
+测试脚本 - 验证各 HTML 解析后端的输出一致
+不需要网络和 Cookie，可直接运行：python test_parser.py（或 pytest test_parser.py）
+"""
+from report_collector import ReportCollector
+from report_parser import available_backends, get_backend
+
+# 模拟 my-list 页面结构的测试页面
+FIXTURES = {
+    'basic': """
+        <html><head><title>日报</title></head><body>
+        <div class="nav"><li>不在列表中的 li</li></div>
+        <ul id="report_list">
+          <li><a href="/report/report-daily/view?id=101">2025-07-30早报:09:41weather（#郑潇）</a></li>
+          <li><a href="/report/report-daily/view?id=102">2025-07-29晚报:18:30weather（#郑潇）</a></li>
+        </ul>
+        </body></html>
+    """,
+    'whitespace_and_entities': """
+        <ul id="report_list">
+          <li class="list-group-item">  <a href="/view?id=1&amp;month=2025-07">2025-07-01早报</a> <span>（#郑潇）</span>
+            <!-- 注释 --> <br/> 当前任务：&nbsp;线上 &lt;服务&gt;开发 </li>
+          <li>&nbsp;首尾不换行空格&nbsp;<b>　全角空格　</b>\t<i>\n</i></li>
+          <li>   </li>
+        </ul>
+    """,
+    'nested_and_scripts': """
+        <ul id="report_list">
+          <li><p>今日<b>计划</b></p>
+            <p>1. 冷备份数据继续处理</p><ul><li>嵌套条目 <a>无链接</a></li></ul></li>
+          <li><a href="">空链接</a><script>var x = 1;</script><style>.a { color: red; }</style></li>
+          <li><noscript>noscript 文本</noscript>正文</li>
+        </ul>
+    """,
+    'empty_list': """
+        <html><body><ul id="report_list"></ul><p>暂无数据</p></body></html>
+    """,
+    'missing_list': """
+        <html><body><form action="/site/login"><li>登录</li></form></body></html>
+    """,
+}
+
+
+# 模拟日报详情页结构的测试页面
+DETAIL_FIXTURE = """
+    <html><body><nav><a href="/">首页</a></nav>
+    <div class="box-body"><table class="table detail-view">
+      <tr><th>日期</th><td>2025-07-30</td></tr>
+      <tr><th>内容</th><td><p>1. 冷备份数据继续处理</p><script>var x = 1;</script>
+        <p>  2. 线上&nbsp;服务开发 </p><p>   </p></td></tr>
+    </table></div></body></html>
+"""
+
+
+def parse_with(backend_name: str, content: str):
+    """使用指定后端解析页面，返回 (text, link) 列表"""
+    collector = ReportCollector(use_cache=False, use_store=False, parser=backend_name)
+    assert collector.parser.name == backend_name
+    return [
+        (report.text, report.link)
+        for report in (collector._parse_report_item(li) for li in collector.parser.select_items(content))
+    ]
+
+
+def test_backends_match_html_parser():
+    """所有可用后端的 text / link 输出与 html.parser 完全一致"""
+    for fixture_name, content in FIXTURES.items():
+        expected = parse_with('html.parser', content)
+        for backend_name in available_backends():
+            actual = parse_with(backend_name, content)
+            assert actual == expected, f"{backend_name} 与 html.parser 在 {fixture_name} 上输出不一致:\n{actual}\n{expected}"
+
+
+def parse_streamed(backend_name: str, content: str, chunk_size: int):
+    """按指定块大小增量喂入页面，返回 (text, link) 列表"""
+    collector = ReportCollector(use_cache=False, use_store=False, parser=backend_name)
+    data = content.encode('utf-8')
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return [(report.text, report.link) for report in collector._parse_chunks(chunks)]
+
+
+def test_streamed_parse_matches_html_parser():
+    """增量解析（任意块大小，包括把多字节字符切开）与整页解析输出一致"""
+    for fixture_name, content in FIXTURES.items():
+        expected = parse_with('html.parser', content)
+        for backend_name in available_backends():
+            for chunk_size in (1, 7, 64 * 1024):
+                actual = parse_streamed(backend_name, content, chunk_size)
+                assert actual == expected, \
+                    f"{backend_name} 按 {chunk_size} 字节增量解析 {fixture_name} 输出不一致:\n{actual}\n{expected}"
+
+
+def test_detail_text_matches_html_parser():
+    """所有可用后端提取的详情页正文一致，且不包含页面导航和脚本"""
+    expected = get_backend('html.parser').detail_text(DETAIL_FIXTURE)
+    assert expected == '日期\n2025-07-30\n内容\n1. 冷备份数据继续处理\n2. 线上\xa0服务开发'
+    for backend_name in available_backends():
+        actual = get_backend(backend_name).detail_text(DETAIL_FIXTURE)
+        assert actual == expected, f"{backend_name} 详情页正文与 html.parser 不一致:\n{actual!r}\n{expected!r}"
+
+
+def test_basic_fixture_content():
+    """基础页面只解析 #report_list 中的条目"""
+    reports = parse_with('html.parser', FIXTURES['basic'])
+    assert reports == [
+        ('2025-07-30早报:09:41weather（#郑潇）', '/report/report-daily/view?id=101'),
+        ('2025-07-29晚报:18:30weather（#郑潇）', '/report/report-daily/view?id=102'),
+    ]
+
+
+if __name__ == "__main__":
+    print(f"可用解析后端: {', '.join(available_backends())}")
+    test_basic_fixture_content()
+    test_backends_match_html_parser()
+    test_streamed_parse_matches_html_parser()
+    test_detail_text_matches_html_parser()
+    print("✓ 所有后端输出一致")
@@ -0,0 +1,148 @@
+"""
+测试脚本 - 验证自适应限流（令牌桶、并发上限、AIMD 加速和减速、429 / Retry-After）
+使用手动推进的时钟，结果确定；不需要网络，可直接运行：python test_rate_limiter.py（或 pytest test_rate_limiter.py）
+"""
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+class FakeClock:
+    """手动推进的单调时钟"""
+
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_limiter(clock: FakeClock, **kwargs) -> AdaptiveRateLimiter:
+    options = dict(rate=4.0, min_rate=0.5, max_rate=8.0, burst=2, concurrency=4, min_concurrency=1,
+                   max_concurrency=8, backoff_cooldown=1.0, clock=clock)
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options)
+
+
+def try_acquire(limiter: AdaptiveRateLimiter):
+    """不等待地尝试占用名额：成功返回 None，否则返回建议的等待秒数"""
+    with limiter._cond:
+        return limiter._try_acquire()
+
+
+def test_token_bucket_refills_at_rate():
+    """令牌用完后按速率补充，补充量不超过桶容量"""
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=2.0, burst=2)
+    assert try_acquire(limiter) is None and try_acquire(limiter) is None
+    assert try_acquire(limiter) == 0.5  # 还差一个令牌，按 2 个/秒需要 0.5 秒
+    clock.advance(0.5)
+    assert try_acquire(limiter) is None
+
+    # 长时间空闲后最多攒下 burst 个令牌
+    for _ in range(3):
+        limiter.cancel()
+    clock.advance(60)
+    assert [try_acquire(limiter) for _ in range(3)] == [None, None, 0.5]
+    assert limiter.stats()['in_flight'] == 2
+
+
+def test_concurrency_limit_and_cancel():
+    """并发名额用完时等待；取消的请求释放名额，但不计入请求结果"""
+    clock = FakeClock()
+    limiter = make_limiter(clock, concurrency=1, burst=5)
+    assert try_acquire(limiter) is None
+    assert try_acquire(limiter) == 0.05
+    limiter.cancel()
+    assert try_acquire(limiter) is None
+    stats = limiter.stats()
+    assert stats['requests'] == 0 and stats['rate'] == 4.0 and stats['concurrency_limit'] == 1
+
+
+def test_additive_increase_on_success():
+    """成功的响应加性提高速率和并发（每次增加 1/当前值），不超过上限"""
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.release(200, 0.1)
+    stats = limiter.stats()
+    assert stats['rate'] == 4.25 and stats['concurrency_limit'] == 4
+    for _ in range(200):
+        limiter.release(200, 0.1)
+    stats = limiter.stats()
+    assert stats['rate'] == 8.0 and stats['concurrency_limit'] == 8 and stats['backoffs'] == 0
+
+    # 4xx（非 429）既不加速也不减速
+    limiter.release(404, 0.1)
+    assert limiter.stats()['rate'] == 8.0
+
+
+def test_multiplicative_decrease_with_cooldown():
+    """5xx 和请求异常时速率和并发减半；冷却时间内的连续失败只减一次，且不低于下限"""
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.release(503, 0.1)
+    stats = limiter.stats()
+    assert (stats['rate'], stats['concurrency_limit'], stats['errors'], stats['backoffs']) == (2.0, 2, 1, 1)
+
+    limiter.release(None, 0.1)  # 同一批失败
+    assert limiter.stats()['rate'] == 2.0 and limiter.stats()['errors'] == 2
+
+    clock.advance(1.0)
+    limiter.release(None, 0.1)
+    assert limiter.stats()['rate'] == 1.0 and limiter.stats()['concurrency_limit'] == 1
+    for _ in range(5):
+        clock.advance(1.0)
+        limiter.release(500, 0.1)
+    stats = limiter.stats()
+    assert stats['rate'] == 0.5 and stats['concurrency_limit'] == 1 and stats['backoffs'] == 7
+
+
+def test_throttled_response_pauses_for_retry_after():
+    """429 时减速，并在 Retry-After 指定的时间内暂停发出请求"""
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.release(429, 0.1, retry_after=3.0)
+    stats = limiter.stats()
+    assert stats['throttled'] == 1 and stats['rate'] == 2.0 and stats['paused_for'] == 3.0
+    assert try_acquire(limiter) == 3.0
+    clock.advance(2.0)
+    assert try_acquire(limiter) == 1.0
+    clock.advance(1.0)
+    assert try_acquire(limiter) is None
+
+    # 5xx 的 Retry-After 不会暂停（只有 429 表示需要等待）
+    clock.advance(1.0)
+    limiter.release(503, 0.1, retry_after=30.0)
+    assert limiter.stats()['paused_for'] == 0
+
+
+def test_latency_spike_backs_off():
+    """延迟超过平均延迟的 latency_spike_factor 倍（且超过 min_spike_latency）时减速"""
+    clock = FakeClock()
+    limiter = make_limiter(clock, latency_spike_factor=2.0, min_spike_latency=1.0)
+    for _ in range(5):
+        limiter.release(200, 0.6)
+    rate = limiter.stats()['rate']
+    limiter.release(200, 1.1)  # 低于平均延迟的 2 倍
+    assert limiter.stats()['slow'] == 0 and limiter.stats()['rate'] > rate
+    limiter.release(200, 3.0)
+    stats = limiter.stats()
+    assert stats['slow'] == 1 and stats['backoffs'] == 1 and stats['rate'] < rate
+
+
+def test_parse_retry_after():
+    """Retry-After 只支持秒数，负数按 0 处理，无法解析时为 None"""
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') is None
+
+
+if __name__ == "__main__":
+    for test in (test_token_bucket_refills_at_rate, test_concurrency_limit_and_cancel,
+                 test_additive_increase_on_success, test_multiplicative_decrease_with_cooldown,
+                 test_throttled_response_pauses_for_retry_after, test_latency_spike_backs_off,
+                 test_parse_retry_after):
+        test()
+        print(f"✓ {test.__doc__.splitlines()[0]}")
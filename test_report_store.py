@@ -0,0 +1,61 @@
+"""
+测试脚本 - 验证本地日报库
+不需要网络和 Cookie，可直接运行：python test_report_store.py（或 pytest test_report_store.py）
+"""
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from report_record import Report
+from report_store import ReportStore
+
+# 链接相同（同一条日报出现两次）和内容相同、没有链接的日报
+DUPLICATES = [
+    Report(text='2025-07-01早报（#郑潇）', link='/report/report-daily/view?id=1'),
+    Report(text='2025-07-01早报（#郑潇）', link='/report/report-daily/view?id=1'),
+    Report(text='请假'),
+    Report(text='请假'),
+    Report(text='2025-07-02早报（#郑潇）', link='/report/report-daily/view?id=2'),
+]
+
+
+def test_duplicate_reports_round_trip(tmp_path):
+    """链接或内容相同的日报各自保存，按原顺序读出，条数与同步记录一致"""
+    store = ReportStore(str(tmp_path / 'reports.db'))
+    store.save_month('2025-07', DUPLICATES)
+    assert store.load_month('2025-07') == DUPLICATES
+
+    # 保存详情正文时，链接相同的日报一并更新；重新同步时沿用已保存的正文
+    store.save_contents('2025-07', [Report(text=DUPLICATES[0].text, link=DUPLICATES[0].link, content='正文')])
+    store.save_month('2025-07', DUPLICATES)
+    assert [r.content for r in store.load_month('2025-07')] == ['正文', '正文', None, None, None]
+    assert store.missing_content_count(['2025-07']) == 1
+
+
+def test_migrates_report_key_primary_key(tmp_path):
+    """旧版本（以日报键为主键）的数据库升级后保留数据；丢失过日报的月份标记为未同步"""
+    db_path = tmp_path / 'reports.db'
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.executescript("""
+            CREATE TABLE months (month TEXT PRIMARY KEY, synced_at REAL NOT NULL, report_count INTEGER NOT NULL);
+            CREATE TABLE reports (month TEXT NOT NULL, report_key TEXT NOT NULL, position INTEGER NOT NULL,
+                                  text TEXT NOT NULL, link TEXT NOT NULL DEFAULT '',
+                                  PRIMARY KEY (month, report_key));
+            INSERT INTO months VALUES ('2025-06', 1, 1), ('2025-07', 1, 3);
+            INSERT INTO reports VALUES ('2025-06', '/v?id=9', 0, '六月', '/v?id=9');
+            INSERT INTO reports VALUES ('2025-07', '/v?id=1', 1, '七月', '/v?id=1');
+        """)
+    conn.close()
+
+    store = ReportStore(str(db_path))
+    assert store.load_month('2025-06') == [Report(text='六月', link='/v?id=9')]
+    assert store.synced_at(['2025-06', '2025-07']) == {'2025-06': 1, '2025-07': None}
+    store.save_month('2025-07', DUPLICATES)
+    assert store.load_month('2025-07') == DUPLICATES
+
+
+if __name__ == "__main__":
+    for test in (test_duplicate_reports_round_trip, test_migrates_report_key_primary_key):
+        with tempfile.TemporaryDirectory(prefix='yst-store-') as work_dir:
+            test(Path(work_dir))
+        print(f"✓ {test.__doc__.splitlines()[0]}")
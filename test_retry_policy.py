@@ -0,0 +1,133 @@
+"""
+测试脚本 - 验证重试与熔断（退避抖动范围、熔断器状态切换、请求取消）
+使用手动推进的时钟，结果确定；不需要网络，可直接运行：python test_retry_policy.py（或 pytest test_retry_policy.py）
+"""
+import random
+
+from retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class FakeClock:
+    """手动推进的单调时钟"""
+
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def rejected(breaker: CircuitBreaker) -> bool:
+    """before_call 是否拒绝请求"""
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        return True
+    return False
+
+
+def open_breaker(clock: FakeClock) -> CircuitBreaker:
+    """创建一个已熔断的熔断器（连续失败 3 次，熔断 10 秒）"""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record(None)
+    return breaker
+
+
+def test_retry_delay_within_jitter_bounds():
+    """退避时间在 [0, min(max_delay, base_delay * 2^(attempt-1))] 内随机取值"""
+    random.seed(12345)
+    policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=3.0)
+    for attempt, cap in ((1, 0.5), (2, 1.0), (3, 2.0), (4, 3.0), (8, 3.0)):
+        delays = [policy.delay(attempt) for _ in range(500)]
+        assert all(0 <= d <= cap for d in delays)
+        assert max(delays) > cap * 0.9 and min(delays) < cap * 0.1  # 覆盖整个区间，而不是固定值
+    assert RetryPolicy(max_attempts=0).max_attempts == 1
+
+
+def test_opens_after_consecutive_failures():
+    """连续失败达到阈值后熔断；中间的成功会清零失败计数，非重试状态码计为成功"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    for status in (503, None, 404, 500, 429):
+        breaker.before_call()
+        breaker.record(status)
+    stats = breaker.stats()
+    assert stats['state'] == CircuitBreaker.CLOSED and stats['consecutive_failures'] == 2
+
+    breaker.before_call()
+    breaker.record(502)
+    assert breaker.stats()['state'] == CircuitBreaker.OPEN and breaker.stats()['open_count'] == 1
+    assert rejected(breaker)
+
+
+def test_half_open_allows_single_trial():
+    """熔断 reset_timeout 秒后进入半开状态，只放行一个试探请求；试探成功则关闭"""
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.advance(9.5)
+    assert rejected(breaker)
+    clock.advance(0.5)
+    assert breaker.stats()['state'] == CircuitBreaker.HALF_OPEN
+
+    breaker.before_call()
+    assert rejected(breaker)  # 试探请求还没有结果
+    breaker.record(200)
+    stats = breaker.stats()
+    assert stats['state'] == CircuitBreaker.CLOSED and stats['consecutive_failures'] == 0
+    assert not rejected(breaker) and not rejected(breaker)
+
+
+def test_failed_trial_reopens():
+    """试探请求失败时重新熔断，再等待 reset_timeout 秒"""
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.advance(10.0)
+    breaker.before_call()
+    breaker.record(None)
+    stats = breaker.stats()
+    assert stats['state'] == CircuitBreaker.OPEN and stats['open_count'] == 2
+    clock.advance(5.0)
+    assert rejected(breaker)
+    clock.advance(5.0)
+    assert not rejected(breaker)
+
+
+def test_cancelled_trial_releases_probe():
+    """试探请求被取消时不计为成功或失败，下一个请求可以继续试探"""
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.advance(10.0)
+    token = breaker.before_call()
+    breaker.record_cancelled(token)
+    assert breaker.stats()['state'] == CircuitBreaker.HALF_OPEN
+    assert not rejected(breaker)
+    assert rejected(breaker)
+
+
+def test_late_cancel_does_not_release_trial():
+    """熔断前发出、试探期间才被取消的请求不会放行第二个试探请求"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    stale = breaker.before_call()  # 熔断前发出，一直没有结果
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record(None)
+    clock.advance(10.0)
+
+    breaker.before_call()  # 试探请求
+    breaker.record_cancelled(stale)
+    assert rejected(breaker)
+    assert breaker.stats()['state'] == CircuitBreaker.HALF_OPEN
+
+
+if __name__ == "__main__":
+    for test in (test_retry_delay_within_jitter_bounds, test_opens_after_consecutive_failures,
+                 test_half_open_allows_single_trial, test_failed_trial_reopens,
+                 test_cancelled_trial_releases_probe, test_late_cancel_does_not_release_trial):
+        test()
+        print(f"✓ {test.__doc__.splitlines()[0]}")
@@ -0,0 +1,142 @@
+"""
+测试脚本 - 服务启动耗时基准
+启动 server.py，按 MCP stdio 协议完成握手并请求 tools/list，测量从启动进程到收到工具列表的耗时；
+同时检查启动时没有导入 Playwright、requests、BeautifulSoup 等重量级依赖（导入时间回退时失败）
+
+不需要网络和 Cookie，可直接运行：python test_startup.py（或 pytest test_startup.py）
+环境变量 YST_STARTUP_BUDGET 可调整耗时预算（秒，在空 FastMCP 服务的启动耗时之上额外允许的时间）
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).parent
+
+# 服务启动时不应导入的模块：只在采集或打开浏览器时才需要
+HEAVY_MODULES = (
+    'playwright', 'requests', 'bs4', 'lxml', 'selectolax', 'httpx', 'dateutil',
+    'report_collector', 'async_collector', 'browser_login', 'report_parser', 'report_store', 'http_cache',
+)
+
+# 在空 FastMCP 服务的启动耗时之上，允许本服务额外花费的时间（秒）
+STARTUP_BUDGET = float(os.environ.get('YST_STARTUP_BUDGET', '0.5'))
+
+# 只注册一个工具的空 FastMCP 服务，作为当前机器上启动耗时的下限
+BARE_SERVER = '''
+from fastmcp import FastMCP
+mcp = FastMCP("bare")
+
+@mcp.tool()
+def ping() -> str:
+    return "pong"
+
+mcp.run()
+'''
+
+# 等待服务响应的最长时间（秒）
+RESPONSE_TIMEOUT = 30
+
+
+def _run_python(code: str) -> str:
+    """在服务目录中用新进程执行代码，返回标准输出"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=SERVER_DIR, capture_output=True, text=True,
+                            timeout=RESPONSE_TIMEOUT, check=True)
+    return result.stdout
+
+
+def startup_imports() -> list:
+    """导入 server 后已加载的重量级模块"""
+    code = (
+        "import json, sys, server\n"
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    return json.loads(_run_python(code).strip().splitlines()[-1])
+
+
+def _read_response(process: subprocess.Popen, request_id: int) -> dict:
+    """读取指定 id 的 JSON-RPC 响应（跳过日志等非协议输出）"""
+    deadline = time.monotonic() + RESPONSE_TIMEOUT
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"服务已退出: {process.stderr.read()}")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(message, dict) and message.get('id') == request_id:
+            return message
+    raise TimeoutError(f"{RESPONSE_TIMEOUT} 秒内未收到响应")
+
+
+def time_to_tools_list(args: list = None) -> tuple:
+    """
+    启动服务并完成 initialize + tools/list
+
+    Args:
+        args: 服务的启动参数（默认启动 server.py）
+
+    Returns:
+        (从启动进程到收到工具列表的秒数, 工具名称列表)
+    """
+    def send(message: dict):
+        process.stdin.write(json.dumps(message) + "\n")
+        process.stdin.flush()
+
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable] + (args or ['server.py']), cwd=SERVER_DIR, text=True, encoding='utf-8',
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        send({'jsonrpc': '2.0', 'id': 1, 'method': 'initialize', 'params': {
+            'protocolVersion': '2025-06-18',
+            'capabilities': {},
+            'clientInfo': {'name': 'test_startup', 'version': '1.0'},
+        }})
+        _read_response(process, 1)
+        send({'jsonrpc': '2.0', 'method': 'notifications/initialized'})
+        send({'jsonrpc': '2.0', 'id': 2, 'method': 'tools/list'})
+        tools = _read_response(process, 2)['result']['tools']
+        elapsed = time.perf_counter() - started
+    finally:
+        process.kill()
+        process.wait()
+        process.stdin.close()
+        process.stdout.close()
+        process.stderr.close()
+    return elapsed, [tool['name'] for tool in tools]
+
+
+def test_no_heavy_imports_at_startup():
+    """导入 server 时不加载 Playwright / requests / BeautifulSoup 等依赖"""
+    loaded = startup_imports()
+    assert loaded == [], f"服务启动时导入了重量级模块: {', '.join(loaded)}"
+
+
+def best_of(runs: int, args: list = None) -> tuple:
+    """启动多次取最快的一次（减少机器负载波动的影响）"""
+    return min((time_to_tools_list(args) for _ in range(runs)), key=lambda result: result[0])
+
+
+def test_time_to_first_tools_list():
+    """从启动进程到收到 tools/list 响应的耗时不超过空 FastMCP 服务的耗时 + 预算"""
+    baseline, _ = best_of(2, ['-c', BARE_SERVER])
+    elapsed, tools = best_of(2)
+    assert 'collect_reports' in tools and 'browser_login' in tools
+    assert elapsed <= baseline + STARTUP_BUDGET, \
+        f"启动耗时 {elapsed:.2f}s 超过预算（空 FastMCP 服务 {baseline:.2f}s + {STARTUP_BUDGET:.2f}s）"
+
+
+if __name__ == "__main__":
+    baseline = sorted(time_to_tools_list(['-c', BARE_SERVER])[0] for _ in range(3))
+    runs = [time_to_tools_list() for _ in range(3)]
+    elapsed = sorted(run[0] for run in runs)
+    print(f"空 FastMCP 服务启动到 tools/list 响应: 最快 {baseline[0] * 1000:.0f} ms，中位数 {baseline[1] * 1000:.0f} ms")
+    print(f"启动到 tools/list 响应: 最快 {elapsed[0] * 1000:.0f} ms，中位数 {elapsed[1] * 1000:.0f} ms"
+          f"（{len(runs[0][1])} 个工具）")
+    print(f"启动时导入的重量级模块: {', '.join(startup_imports()) or '无'}")
+    test_no_heavy_imports_at_startup()
+    test_time_to_first_tools_list()
+    print("✓ 启动耗时在预算内")
@@ -0,0 +1,30 @@
+"""
+文本输出工具模块
+不依赖第三方库，服务启动时即可导入
+"""
+import platform
+
+
+# Windows 兼容：emoji 字符映射
+def safe_text(text: str) -> str:
+    """
+    Windows 兼容的安全输出
+    在 Windows 下，将 emoji 替换为文本符号
+    """
+    if platform.system() == 'Windows':
+        # 替换常用 emoji 为文本符号
+        replacements = {
+            '✓': '[OK]',
+            '✅': '[OK]',
+            '❌': '[X]',
+            '⚠': '[!]',
+            '⏳': '[...]',
+            '🌐': '[*]',
+            '📍': '[*]',
+            '💡': '[*]',
+            '⏱': '[*]',
+            '🔒': '[*]',
+        }
+        for emoji, replacement in replacements.items():
+            text = text.replace(emoji, replacement)
+    return text